@@ -0,0 +1,137 @@
+"""
+Analytics database for leaderboard builds (opt-in with ``ANALYTICS_DATABASE``).
+
+A leaderboard rebuild deletes and bulk-inserts every entry and runs the
+heaviest aggregates in the app. With ``ANALYTICS_DATABASE`` set, all of that
+moves to a SQLite file of its own (alias ``analytics``). ``AnalyticsRouter``
+sends ``Leaderboard`` and ``LeaderboardEntry`` there. Snapshots are built
+from copies of the users, profile totals and daily rollups kept in the same
+file, so a build never reads from or locks the primary database (or its
+shards) and activity writes never wait on one.
+
+``sync_analytics`` brings the copies up to date incrementally. Every write
+to a user's data bumps ``UserProfile.data_version``, so one pass over
+``(user_id, data_version)`` on each side finds the users whose data moved,
+and only their rows are copied again; users whose profile has gone are
+dropped. ``build_leaderboards`` syncs before every pass, and the
+``sync_analytics`` command runs the sync on its own.
+
+The in-memory rank indexes (``ranking``) keep reading the primary: they fold
+in live writes as they commit and must not be rebuilt from an older copy.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import CharField, Q, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import DailyActivityRollup, UserProfile
+from .sharding import shard_aliases
+
+ANALYTICS_DB = 'analytics'
+
+# models that live only in the analytics database
+ANALYTICS_MODELS = ['activities.Leaderboard', 'activities.LeaderboardEntry']
+
+# users copied per transaction
+SYNC_BATCH_SIZE = 500
+
+
+def analytics_enabled():
+    return bool(getattr(settings, 'ANALYTICS_DATABASE', None))
+
+
+def source_aliases():
+    """The databases leaderboard builds read totals and rollups from"""
+    return [ANALYTICS_DB] if analytics_enabled() else shard_aliases()
+
+
+class AnalyticsRouter:
+    """Leaderboards go to the analytics database; everything else is left to the next router"""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.label in ANALYTICS_MODELS:
+            return ANALYTICS_DB
+        return None
+
+    db_for_write = db_for_read
+
+
+def sync_analytics(batch_size=SYNC_BATCH_SIZE):
+    """Copy every user whose data changed since the last sync, drop the ones that are gone; returns how many"""
+    copied = dict(UserProfile.objects.using(ANALYTICS_DB).values_list('user_id', 'data_version'))
+    changed = defaultdict(list)
+    for alias in shard_aliases():
+        for user_id, version in UserProfile.objects.using(alias).values_list('user_id', 'data_version').iterator():
+            if copied.pop(user_id, None) != version:
+                changed[alias].append(user_id)
+
+    # whatever is left has no profile on the primary any more
+    dropped = list(copied)
+    if dropped:
+        _drop_users(dropped)
+    for alias, user_ids in changed.items():
+        for start in range(0, len(user_ids), batch_size):
+            _copy_users(alias, user_ids[start:start + batch_size])
+    return len(dropped) + sum(len(user_ids) for user_ids in changed.values())
+
+
+def _copy_users(alias, user_ids):
+    User = get_user_model()
+    # profiles before rollups: a write landing in between leaves the copied data_version
+    # behind the copied rollups, never ahead of them, so the next sync copies the user again
+    profiles = list(UserProfile.objects.using(alias).filter(user_id__in=user_ids))
+    rollups = list(DailyActivityRollup.objects.using(alias).filter(user_id__in=user_ids))
+    users = list(User._base_manager.using(DEFAULT_DB_ALIAS).filter(pk__in=user_ids))
+
+    with transaction.atomic(using=ANALYTICS_DB):
+        _upsert_users(users)
+        for model, rows in [(UserProfile, profiles), (DailyActivityRollup, rollups)]:
+            model._base_manager.using(ANALYTICS_DB).filter(user_id__in=user_ids).delete()
+            model._base_manager.using(ANALYTICS_DB).bulk_create(rows)
+
+
+def _upsert_users(users):
+    """
+    Bring the copies of ``users`` up to date; upserted rather than replaced, since
+    published entries point at them. A username or email can have moved to another
+    user since that user was last copied, so copies holding a value that is about
+    to be inserted are parked on a per-pk placeholder and copied again in turn
+    """
+    User = get_user_model()
+    unique = [field for field in User._meta.concrete_fields if field.unique and not field.primary_key]
+    copies = User._base_manager.using(ANALYTICS_DB)
+    copied = set()
+    while users:
+        ids = {user.pk for user in users}
+        copied |= ids
+        taken = Q()
+        for field in unique:
+            values = {getattr(user, field.attname) for user in users} - {None}
+            taken |= Q(**{f'{field.attname}__in': values})
+        displaced = set(copies.filter(taken).exclude(pk__in=ids).values_list('pk', flat=True))
+        # no real username or email starts with '#'
+        placeholder = Concat(Value('#'), Cast('pk', output_field=CharField()))
+        copies.filter(pk__in=ids | displaced).update(
+            **{field.attname: None if field.null else placeholder for field in unique}
+        )
+        copies.bulk_create(
+            users,
+            update_conflicts=True,
+            unique_fields=[User._meta.pk.name],
+            update_fields=[field.name for field in User._meta.concrete_fields if not field.primary_key],
+        )
+        users = list(User._base_manager.using(DEFAULT_DB_ALIAS).filter(pk__in=displaced - copied))
+
+
+def _drop_users(user_ids):
+    User = get_user_model()
+    existing = User._base_manager.using(DEFAULT_DB_ALIAS).filter(pk__in=user_ids).values_list('pk', flat=True)
+    gone = set(user_ids) - set(existing)
+    with transaction.atomic(using=ANALYTICS_DB):
+        for model in (DailyActivityRollup, UserProfile):
+            model._base_manager.using(ANALYTICS_DB).filter(user_id__in=user_ids).delete()
+        # users deleted on the primary take their entries in old snapshots with them, as they did there
+        User._base_manager.using(ANALYTICS_DB).filter(pk__in=gone).delete()
@@ -1,8 +1,11 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 class ActivitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'activities'
     
     def ready(self):
-        import activities.signals
\ No newline at end of file
+        import activities.signals
+        from .sharding import reserve_initial_id_band
+        post_migrate.connect(reserve_initial_id_band, sender=self)
@@ -0,0 +1,177 @@
+"""
+Async versions of the hot read endpoints, served when ``ASYNC_READ_VIEWS`` is on.
+
+Under an ASGI server a request waiting here holds no thread. In Django 4.2,
+though, the async ORM and cache methods are ``sync_to_async`` wrappers that
+run on the worker's one ``thread_sensitive`` thread, as do the sync views and
+middleware, so a worker still executes one query at a time; measured against
+a 4-thread WSGI worker this mode is slower (``benchmarks.async_reads``) and
+gunicorn.conf.py does not use it. DRF's ``api_view`` cannot wrap coroutines, so these
+are plain Django views doing the same work as their namesakes in ``views``:
+JWT authentication (``CachedJWTAuthentication.aauthenticate``) falling back to
+the session as DRF's ``SessionAuthentication`` does, the per-user response
+cache and ETags, and the same response bodies. Queries use the async ORM; the few
+steps Django 4.2 has no async form for (prefetching, stats rebuilds, rank
+index rebuilds) run through ``sync_to_async``.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework import exceptions
+
+from users.authentication import CachedJWTAuthentication
+
+from . import caching, views
+from .caching import DataResponse, acached_per_user, arequest_data_version
+from .leaderboard import published_snapshots
+from .models import FitnessActivity, LeaderboardEntry, UserProfile
+from .ranking import rank_indexes
+from .serializers import FitnessActivitySerializer, LeaderboardSerializer, UserProfileSeriallizer
+
+
+def async_api_view(view):
+    """GET/HEAD only, JWT- or session-authenticated, with ``request.user`` and ``request.query_params`` set like DRF's"""
+    authenticator = CachedJWTAuthentication()
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return DataResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+        try:
+            authenticated = await authenticator.aauthenticate(request) or await session_user(request)
+            if authenticated is None:
+                raise exceptions.NotAuthenticated()
+        except exceptions.APIException as exc:
+            detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = DataResponse(detail, status=401)
+            response.headers['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+
+        request.user, request.auth = authenticated
+        request.query_params = request.GET
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def session_user(request):
+    """DRF's ``SessionAuthentication`` for safe methods (no CSRF check to make)"""
+    if not hasattr(request, 'session'):
+        return None
+    user = await sync_to_async(get_user)(request)
+    if not user.is_active:
+        return None
+    return user, None
+
+
+def async_condition(etag_func):
+    """Django's ``condition(etag_func=...)`` for coroutine views and an async ``etag_func``"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            etag = await etag_func(request)
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and not response.has_header('ETag'):
+                response.headers['ETag'] = etag
+            return response
+        return wrapper
+    return decorator
+
+
+async def user_data_etag(request):
+    await arequest_data_version(request)
+    return caching.user_data_etag(request)
+
+
+async def profile_etag(request):
+    if request.GET.get('refresh'):
+        return None
+    return await user_data_etag(request)
+
+
+async def leaderboard_etag(request):
+    if not hasattr(request, '_leaderboard_snapshot'):
+        period = request.GET.get('period', 'weekly')
+        request._leaderboard_snapshot = await published_snapshots(period).afirst()
+    return views.leaderboard_etag(request)
+
+
+@async_api_view
+@async_condition(user_data_etag)
+@acached_per_user('metrics')
+async def activity_metrics(request):
+    queryset = views.metrics_queryset(request.user, request.GET.get('period', 'all'))
+    return DataResponse(views.metrics_data(await queryset.aaggregate(**views.METRIC_TOTALS)))
+
+
+@async_api_view
+@async_condition(user_data_etag)
+@acached_per_user('recent')
+async def recent_activities(request):
+    user = request.user
+    limit = int(request.GET.get('limit', 10))
+    activities = [activity async for activity in FitnessActivity.objects.for_user(user).order_by('-date')[:limit]]
+    for activity in activities:
+        activity.user = user  # the serializer prints it; don't load it per row
+    return DataResponse({
+        'recent_activities': FitnessActivitySerializer(activities, many=True).data,
+        'total_count': await FitnessActivity.objects.for_user(user).acount(),
+    })
+
+
+def _serialize_leaderboard(leaderboard_obj):
+    prefetch_related_objects(
+        [leaderboard_obj],
+        Prefetch('entries', queryset=LeaderboardEntry.objects.select_related('user'))
+    )
+    return LeaderboardSerializer(leaderboard_obj).data
+
+
+@async_api_view
+@async_condition(leaderboard_etag)
+async def leaderboard(request):
+    await leaderboard_etag(request)
+    leaderboard_obj = request._leaderboard_snapshot
+    if leaderboard_obj is None:
+        return DataResponse({'error': 'Leaderboard not found'}, status=404)
+    # prefetch_related_objects has no async form before Django 5.0
+    return DataResponse(await sync_to_async(_serialize_leaderboard)(leaderboard_obj))
+
+
+@async_api_view
+async def my_ranking(request):
+    user = request.user
+    period = request.GET.get('period', 'weekly')
+    if period not in rank_indexes.indexes:
+        return DataResponse({'error': 'Leaderboard not found'}, status=404)
+
+    # only the very first build reads the database; later ones run in the background
+    index = await sync_to_async(rank_indexes.get)(period)
+    data = views.ranking_data(user, index.standing(user.pk))
+
+    try:
+        radius = views.ranking_radius(request.GET)
+    except ValueError:
+        return DataResponse({'error': 'around must be an integer'}, status=400)
+    if radius is not None:
+        data['around'] = views.around_data(index.around(user.pk, radius))
+
+    return DataResponse(data)
+
+
+@async_api_view
+@async_condition(profile_etag)
+@acached_per_user('profile', bypass_params=['refresh'])
+async def user_profile(request):
+    profile, created = await UserProfile.objects.for_user(request.user).aget_or_create(user=request.user)
+    profile.user = request.user
+
+    if created or request.GET.get('refresh'):
+        await sync_to_async(profile.update_stats)()
+
+    return DataResponse(UserProfileSeriallizer(profile).data)
@@ -0,0 +1,149 @@
+"""
+Per-user response cache for the dashboard endpoints.
+
+Cache keys carry the user's ``UserProfile.data_version``, which every write to
+their activities, goals or profile bumps in the same statement as the write.
+A stale entry is therefore never read again: invalidation is one integer
+increment, exact, and needs no key bookkeeping; old entries simply age out.
+Keys also carry the user's local day, because "this week" and streaks move at
+midnight without any write.
+
+The same version feeds ``user_data_etag``, used with Django's ``condition``
+decorator so a client that already holds the current payload gets a 304
+after one indexed lookup, before any aggregate or serializer runs.
+
+Hit and miss counts are kept per process and served by ``cache_stats``.
+The ``a``-prefixed helpers are the same for the async views in ``async_views``.
+"""
+import hashlib
+import threading
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import UserProfile
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def _count(name, outcome):
+    with _counts_lock:
+        _counts[(name, outcome)] += 1
+
+
+def cache_counts():
+    """``{endpoint: {'hits': n, 'misses': n}}`` for this process"""
+    with _counts_lock:
+        counts = dict(_counts)
+    endpoints = sorted({name for name, _ in counts})
+    return {
+        name: {'hits': counts.get((name, 'hit'), 0), 'misses': counts.get((name, 'miss'), 0)}
+        for name in endpoints
+    }
+
+
+def reset_cache_counts():
+    with _counts_lock:
+        _counts.clear()
+
+
+def data_version(user_id):
+    return UserProfile.objects.for_user(user_id).values_list('data_version', flat=True).first() or 0
+
+
+def request_data_version(request):
+    """The user's data version, read once per request however many layers ask for it"""
+    if not hasattr(request, '_data_version'):
+        request._data_version = data_version(request.user.pk)
+    return request._data_version
+
+
+async def arequest_data_version(request):
+    if not hasattr(request, '_data_version'):
+        request._data_version = await (
+            UserProfile.objects.for_user(request.user).values_list('data_version', flat=True).afirst()
+        ) or 0
+    return request._data_version
+
+
+def _fingerprint(user, version, *parts):
+    # date_joined keeps a reused user id (e.g. after a database reset) from matching old entries
+    owner = f'{user.pk}:{user.date_joined.timestamp()}'
+    return hashlib.sha1('|'.join([owner, str(version), str(user.local_day()), *parts]).encode()).hexdigest()
+
+
+def cache_key(name, user, version, params):
+    query = '&'.join(f'{key}={value}' for key, value in sorted(params.items()))
+    return f'response:{name}:{user.pk}:{_fingerprint(user, version, query)}'
+
+
+def user_data_etag(request, *args, **kwargs):
+    """ETag for a read of the requesting user's own data: one version lookup, no aggregates"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return _fingerprint(
+        request.user, request_data_version(request),
+        request.get_full_path(), renderer.format if renderer else '',
+    )
+
+
+def cached_per_user(name, bypass_params=()):
+    """
+    Cache a function view's successful responses per user and data version.
+    Requests carrying any of ``bypass_params`` (e.g. a forced refresh) skip the cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if any(param in request.query_params for param in bypass_params):
+                return view(request, *args, **kwargs)
+
+            key = cache_key(name, request.user, request_data_version(request), request.query_params)
+            data = cache.get(key)
+            if data is not None:
+                _count(name, 'hit')
+                return Response(data)
+
+            _count(name, 'miss')
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            return response
+        return wrapper
+    return decorator
+
+
+class DataResponse(JsonResponse):
+    """JSON response that keeps its payload on ``.data``, like DRF's ``Response``, so it can be cached"""
+
+    def __init__(self, data, status=200):
+        super().__init__(data, encoder=JSONEncoder, safe=False, status=status)
+        self.data = data
+
+
+def acached_per_user(name, bypass_params=()):
+    """``cached_per_user`` for async views returning a ``DataResponse``; entries are shared with the sync views"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if any(param in request.GET for param in bypass_params):
+                return await view(request, *args, **kwargs)
+
+            key = cache_key(name, request.user, await arequest_data_version(request), request.GET)
+            data = await cache.aget(key)
+            if data is not None:
+                _count(name, 'hit')
+                return DataResponse(data)
+
+            _count(name, 'miss')
+            response = await view(request, *args, **kwargs)
+            if response.status_code == 200:
+                await cache.aset(key, response.data, getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300))
+            return response
+        return wrapper
+    return decorator
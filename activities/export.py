@@ -0,0 +1,51 @@
+"""
+Streaming activity export.
+
+Rows are read with ``values_list().iterator()`` so only one chunk is held in
+memory at a time, and each row is encoded and handed to the
+``StreamingHttpResponse`` as soon as it is read.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_FIELDS = [
+    'id', 'activity_type', 'duration', 'distance', 'calories_burned',
+    'date', 'intensity', 'notes', 'created_at', 'updated_at',
+]
+
+CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """File-like object whose write() just returns the value, for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset):
+    return queryset.order_by('-date', '-id').values_list(*EXPORT_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([value.isoformat() if hasattr(value, 'isoformat') else value for value in row])
+
+
+def stream_ndjson(rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n'
+
+
+STREAMERS = {
+    'csv': stream_csv,
+    'ndjson': stream_ndjson,
+}
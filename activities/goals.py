@@ -0,0 +1,105 @@
+"""
+Goal progress evaluation after activity writes.
+
+All of a user's goals are evaluated together: every (goal type, period,
+activity type) window becomes one conditional ``Sum`` over the daily rollups,
+so the whole set is answered by a single aggregate query bounded to the
+widest window, streak goals share one streak lookup, and the changed goals
+are written back with one ``bulk_update``.
+"""
+from collections import defaultdict
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import DailyActivityRollup, WorkoutGoal
+from .sharding import shard_for
+from .stats import bump_data_version
+from .streaks import compute_streak
+
+# goal type -> rollup column its progress is summed from
+ROLLUP_COLUMNS = {
+    'duration': 'total_duration',
+    'calories': 'total_calories',
+    'frequency': 'activity_count',
+    'distance': 'total_distance',
+}
+
+GOAL_FIELDS = ['current_value', 'status', 'updated_at']
+
+
+def _window_key(goal, today):
+    start_date, end_date = goal.period_bounds(today)
+    return ROLLUP_COLUMNS[goal.goal_type], start_date, end_date, goal.activity_type or None
+
+
+def _window_totals(user_id, keys):
+    """Sum every ``(column, start, end, activity_type)`` window for one user in one query"""
+    aggregates = {}
+    for i, (column, start_date, end_date, activity_type) in enumerate(keys):
+        window = Q(day__gte=start_date, day__lte=end_date)
+        if activity_type:
+            window &= Q(activity_type=activity_type)
+        aggregates[f'w{i}'] = Sum(column, filter=window)
+
+    totals = DailyActivityRollup.objects.for_user(user_id).filter(
+        day__gte=min(key[1] for key in keys),
+        day__lte=max(key[2] for key in keys),
+    ).aggregate(**aggregates)
+    return {key: totals[f'w{i}'] or 0 for i, key in enumerate(keys)}
+
+
+def _evaluate_user_goals(user_id, goals):
+    today = goals[0].user.local_day()
+    keys = {goal.pk: _window_key(goal, today) for goal in goals if goal.goal_type in ROLLUP_COLUMNS}
+    totals = _window_totals(user_id, list(dict.fromkeys(keys.values()))) if keys else {}
+    streak = None
+
+    changed = []
+    for goal in goals:
+        previous = (goal.current_value, goal.status)
+        if goal.pk in keys:
+            goal.current_value = totals[keys[goal.pk]]
+        elif goal.goal_type == 'streak':
+            if streak is None:
+                streak = compute_streak(user_id).current
+            goal.current_value = streak
+
+        if goal.current_value >= goal.target_value:
+            goal.status = 'completed'
+        elif today > goal.end_date and goal.status == 'active':
+            goal.status = 'failed'
+
+        if (goal.current_value, goal.status) != previous:
+            changed.append(goal)
+    return changed
+
+
+def evaluate_goals(goals):
+    """Recompute progress and status of ``goals`` (any users) and save the ones that changed"""
+    per_user = defaultdict(list)
+    for goal in goals:
+        per_user[goal.user_id].append(goal)
+
+    changed = []
+    for user_id, user_goals in per_user.items():
+        changed += _evaluate_user_goals(user_id, user_goals)
+
+    now = timezone.now()
+    for goal in changed:
+        goal.updated_at = now
+    per_shard = defaultdict(list)
+    for goal in changed:
+        per_shard[shard_for(goal.user_id)].append(goal)
+    for alias, shard_goals in per_shard.items():
+        WorkoutGoal.objects.using(alias).bulk_update(shard_goals, GOAL_FIELDS)
+    if changed:
+        bump_data_version({goal.user_id for goal in changed})
+    return changed
+
+
+def update_active_goals(user_id):
+    """Re-evaluate every active goal of one user"""
+    return evaluate_goals(list(
+        WorkoutGoal.objects.for_user(user_id).filter(status='active').select_related('user')
+    ))
@@ -0,0 +1,126 @@
+"""
+Group commit for single activity inserts (opt-in with ``ACTIVITY_GROUP_COMMIT``).
+
+SQLite has one writer at a time and every commit is its own fsync, so
+concurrent POSTs queue for the write lock and each pays for a commit. Here the
+request threads hand their validated activity to one writer thread per
+process and wait. The writer takes whatever has queued within
+``ACTIVITY_GROUP_COMMIT_WINDOW_MS`` of the first arrival, inserts it with one
+``bulk_create``, folds it into the derived state the way a batch ingest does,
+commits once, and only then releases the waiting requests. A batch that fails
+is retried one activity at a time, so a bad row only fails its own request.
+A request that gives up waiting cancels its activity, which the writer then
+skips, so the client can retry without creating a duplicate.
+"""
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, TimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from rest_framework.exceptions import APIException
+
+from .ingest import MAX_BATCH_SIZE, apply_created_activities
+from .models import FitnessActivity
+from .sharding import shard_for
+
+logger = logging.getLogger(__name__)
+
+# seconds a request waits for its batch before giving up
+SUBMIT_TIMEOUT = 30
+
+
+class WriterTimeout(APIException):
+    """The activity was not written within ``SUBMIT_TIMEOUT`` and has been withdrawn"""
+    status_code = 503
+    default_detail = "The activity could not be saved in time and was not recorded; please retry."
+    default_code = 'write_timeout'
+
+
+class ActivityWriter:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def submit(self, activity):
+        """Queue an unsaved activity, block until its batch commits, and return it saved"""
+        activity.fill_derived_fields()
+        future = Future()
+        self.queue.put((activity, future))
+        self.ensure_running()
+        try:
+            return future.result(timeout=SUBMIT_TIMEOUT)
+        except TimeoutError:
+            if future.cancel():
+                raise WriterTimeout() from None
+        # the writer already has it in a transaction, so it will be resolved shortly
+        return future.result()
+
+    def ensure_running(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='activity-writer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            # requests that gave up waiting have cancelled theirs
+            batch = [item for item in self.next_batch() if item[1].set_running_or_notify_cancel()]
+            try:
+                close_old_connections()
+                # a transaction cannot span shards, so each shard's share commits on its own
+                per_shard = defaultdict(list)
+                for activity, future in batch:
+                    per_shard[shard_for(activity.user_id)].append((activity, future))
+                for shard_batch in per_shard.values():
+                    self.commit(shard_batch)
+            except Exception as exc:
+                # the thread keeps going; nobody in this batch is left waiting
+                logger.exception("activity writer failed on a batch of %d", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + getattr(settings, 'ACTIVITY_GROUP_COMMIT_WINDOW_MS', 2) / 1000
+        while len(batch) < MAX_BATCH_SIZE:
+            try:
+                batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return batch
+
+    def commit(self, batch):
+        """Insert ``batch`` (all on one shard) in one transaction and resolve its futures"""
+        alias = shard_for(batch[0][0].user_id)
+        committed = []
+        try:
+            with transaction.atomic(using=alias):
+                # registered first, so it runs before the hooks below and tells a failed
+                # commit apart from a failing post-commit hook
+                transaction.on_commit(lambda: committed.append(True), using=alias)
+                created = FitnessActivity.objects.using(alias).bulk_create([activity for activity, _ in batch])
+                apply_created_activities(created)
+        except Exception as exc:
+            if committed:
+                logger.exception("post-commit hook failed after writing %d activities", len(batch))
+            elif len(batch) > 1:
+                for activity, future in batch:
+                    activity.pk = None
+                    activity._state.adding = True
+                    self.commit([(activity, future)])
+                return
+            else:
+                batch[0][1].set_exception(exc)
+                return
+
+        for activity, future in batch:
+            future.set_result(activity)
+
+
+writer = ActivityWriter()
@@ -0,0 +1,64 @@
+"""
+Batch activity ingest.
+
+Wearable syncs arrive as dozens to hundreds of workouts at once. They are
+inserted with one ``bulk_create`` and the derived state (profile totals,
+rollups, streaks, goals, rank indexes) is brought up to date once per
+affected user rather than once per row. ``bulk_create`` does not send the
+model signals, so ``apply_created_activities`` does their job in aggregate.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import jobs, rollups, stats
+from .models import FitnessActivity
+from .ranking import rank_indexes
+from .sharding import shard_for
+
+MAX_BATCH_SIZE = 1000
+
+
+def apply_created_activities(activities):
+    """Fold freshly inserted activities into every piece of derived state, grouped per user"""
+    snapshots = []
+    for activity in activities:
+        activity._stored_snapshot = activity.snapshot()
+        snapshots.append(activity._stored_snapshot)
+
+    per_user = defaultdict(lambda: [0, 0, 0])
+    per_rollup = defaultdict(lambda: [0, 0.0, 0, 0])
+    for snapshot in snapshots:
+        totals = per_user[snapshot.user_id]
+        totals[0] += snapshot.calories_burned
+        totals[1] += snapshot.duration
+        totals[2] += 1
+
+        rollup = per_rollup[(snapshot.user_id, snapshot.day, snapshot.activity_type)]
+        rollup[0] += snapshot.duration
+        rollup[1] += snapshot.distance
+        rollup[2] += snapshot.calories_burned
+        rollup[3] += 1
+
+    for user_id, (calories, duration, workouts) in per_user.items():
+        stats.apply_stats_delta(user_id, calories=calories, duration=duration, workouts=workouts)
+    for (user_id, day, activity_type), (duration, distance, calories, count) in per_rollup.items():
+        rollups.apply_rollup_delta(user_id, day, activity_type, duration=duration,
+                                   distance=distance, calories=calories, count=count)
+    jobs.schedule(jobs.STREAK, per_user)
+    jobs.schedule(jobs.GOALS, per_user)
+
+    rank_indexes.apply_activity_changes([(None, snapshot) for snapshot in snapshots])
+
+
+def ingest_activities(user, items):
+    """Insert validated activity dicts for ``user`` in one transaction and return the new rows"""
+    activities = [FitnessActivity(user=user, **item) for item in items]
+    for activity in activities:
+        activity.fill_derived_fields()
+
+    alias = shard_for(user)
+    with transaction.atomic(using=alias):
+        created = FitnessActivity.objects.using(alias).bulk_create(activities)
+        apply_created_activities(created)
+    return created
@@ -0,0 +1,118 @@
+"""
+Deferred activity side effects.
+
+Totals and rollups are cheap F() deltas and stay in the request, but streak
+refreshes and goal evaluation re-read the user's history, so they are queued
+instead. ``schedule`` registers them with ``transaction.on_commit``; once the
+write commits they land in the ``ActivityJob`` table, where the unique
+``(user, kind)`` constraint folds every further write inside the coalescing
+window into the one pending row. The ``run_activity_jobs`` command claims
+due rows and runs them; a row is only deleted once its recompute succeeded.
+
+With ``ACTIVITY_JOBS_INLINE`` (the default, and what the tests use) the work
+runs straight away in the request, exactly as if a worker had picked it up.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import stats
+from .goals import update_active_goals
+from .models import ActivityJob
+from .sharding import shard_aliases, shards_for
+
+logger = logging.getLogger(__name__)
+
+STREAK = 'streak'
+GOALS = 'goals'
+
+# streaks first: the profile's streak should be current by the time goals are looked at
+HANDLERS = {
+    STREAK: stats.refresh_streak,
+    GOALS: update_active_goals,
+}
+
+RETRY_SECONDS = 60
+
+# how long a claimed job is left alone; a worker that dies mid-run has its jobs picked up after this
+LEASE_SECONDS = 300
+
+
+def schedule(kind, user_ids):
+    """Recompute ``kind`` for ``user_ids`` after the current transaction commits"""
+    user_ids = set(user_ids)
+    if getattr(settings, 'ACTIVITY_JOBS_INLINE', True):
+        run_jobs(kind, user_ids)
+        return
+    # each user's jobs queue on their own shard, after that shard's transaction commits
+    for alias, ids in shards_for(user_ids).items():
+        transaction.on_commit(partial(enqueue, kind, ids), using=alias)
+
+
+def enqueue(kind, user_ids, delay=None):
+    """Insert pending jobs; users that already have one queued keep the earlier run time"""
+    if delay is None:
+        delay = getattr(settings, 'ACTIVITY_JOBS_COALESCE_SECONDS', 5)
+    run_after = timezone.now() + timedelta(seconds=delay)
+    for alias, ids in shards_for(user_ids).items():
+        jobs = ActivityJob.objects.using(alias)
+        jobs.bulk_create(
+            [ActivityJob(user_id=user_id, kind=kind, run_after=run_after) for user_id in ids],
+            ignore_conflicts=True,
+        )
+        # a job claimed by a running worker sits at its lease; pulling it back means the
+        # worker will not delete it, so this write gets its own run
+        jobs.filter(user_id__in=ids, kind=kind, run_after__gt=run_after).update(run_after=run_after)
+
+
+def run_jobs(kind, user_ids):
+    handler = HANDLERS[kind]
+    failed = []
+    for user_id in user_ids:
+        try:
+            handler(user_id)
+        except Exception:
+            logger.exception("%s recompute failed for user %s", kind, user_id)
+            failed.append(user_id)
+    return failed
+
+
+def run_due_jobs(limit=500, now=None):
+    """
+    Claim up to ``limit`` due jobs and run them, returning how many ran.
+    Claiming leases a job (its ``run_after`` moves ``LEASE_SECONDS`` ahead)
+    and the row is deleted only after its handler succeeded, so jobs held by a
+    worker that crashes are run again once the lease runs out. A write arriving
+    mid-run pulls the row off the lease (see ``enqueue``) and it is kept for
+    another run rather than deleted with the one being processed.
+    """
+    now = now or timezone.now()
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    jobs = []
+    for alias in shard_aliases():
+        if len(jobs) >= limit:
+            break
+        due = ActivityJob.objects.using(alias).filter(run_after__lte=now)
+        with transaction.atomic(using=alias):
+            claimed = list(due.values_list('pk', 'kind', 'user_id')[:limit - len(jobs)])
+            due.filter(pk__in=[pk for pk, _, _ in claimed]).update(run_after=lease)
+        jobs += [(alias, *job) for job in claimed]
+
+    done, failed = defaultdict(list), defaultdict(list)
+    for kind in HANDLERS:
+        kind_jobs = [job for job in jobs if job[2] == kind]
+        failed_users = set(run_jobs(kind, [user_id for _, _, _, user_id in kind_jobs]))
+        for alias, pk, _, user_id in kind_jobs:
+            (failed if user_id in failed_users else done)[alias].append(pk)
+
+    # rows no longer on this run's lease were queued again mid-run and stay as they are
+    for alias in done.keys() | failed.keys():
+        leased = ActivityJob.objects.using(alias).filter(run_after=lease)
+        leased.filter(pk__in=done[alias]).delete()
+        leased.filter(pk__in=failed[alias]).update(run_after=timezone.now() + timedelta(seconds=RETRY_SECONDS))
+    return len(jobs)
@@ -0,0 +1,148 @@
+"""
+Set-based leaderboard builder.
+
+Every user's period totals come out of one grouped query over the daily
+rollups, points and ranks are computed in the same statement (``RANK()``
+window, so tied users share a rank and the next rank is skipped), streaks
+come from one streak-engine query, and the entries are written back with a
+single ``bulk_create``. The number of queries does not depend on the number
+of users. With user sharding the totals and streaks are gathered from every
+shard in parallel and ranked over the merged rows. With an analytics
+database (see ``analytics``) the build reads that database's synced copies
+instead and writes its entries there, so it never touches the primary.
+
+Snapshots are built off the request path (``build_leaderboards`` command)
+and published by stamping ``published_at`` once all entries are in, so the
+read endpoint only ever sees complete snapshots.
+"""
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Q, Sum, Window
+from django.db.models.functions import Coalesce, Rank
+from django.utils import timezone
+
+from .analytics import source_aliases
+from .models import Leaderboard, LeaderboardEntry, UserProfile
+from .sharding import scatter, shard_aliases
+from .streaks import compute_streaks
+
+
+def period_start(period, today):
+    # a shared board needs one clock, so windows follow the server's day; each activity
+    # still lands in the window by its stored (user-local) activity_day
+    if period == "daily":
+        return today
+    if period == "weekly":
+        return today - timedelta(days=7)
+    if period == "monthly":
+        return today - timedelta(days=30)
+    return None
+
+
+def _standings(alias, start_date):
+    profiles = UserProfile.objects.using(alias)
+    if start_date:
+        in_period = Q(user__daily_rollups__day__gte=start_date)
+        return profiles.annotate(
+            calories=Coalesce(Sum('user__daily_rollups__total_calories', filter=in_period), 0),
+            workouts=Coalesce(Sum('user__daily_rollups__activity_count', filter=in_period), 0),
+        ).annotate(
+            # integer division on the database side, same formula as stats.points_for
+            score=F('calories') / 100 + F('workouts'),
+        )
+    return profiles.annotate(
+        calories=F('total_calories_burned'),
+        workouts=F('total_workouts'),
+        score=F('points'),
+    )
+
+
+def _shard_standings(alias, start_date):
+    return list(_standings(alias, start_date).values('user_id', 'calories', 'workouts', 'score'))
+
+
+def ranked_standings(period, today=None, aliases=None):
+    """One row per profile with calories, workouts, points and rank, best first (from ``aliases``, default the shards)"""
+    start_date = period_start(period, today or timezone.now().date())
+    aliases = shard_aliases() if aliases is None else aliases
+
+    if len(aliases) == 1:
+        return (
+            _standings(aliases[0], start_date)
+            .annotate(rank=Window(expression=Rank(), order_by=[F('score').desc()]))
+            .order_by('rank', 'user_id')
+            .values('user_id', 'calories', 'workouts', 'score', 'rank')
+        )
+
+    # sharded: every shard totals its own users in parallel and the ranks are dealt
+    # over the merged rows, with the same RANK() semantics as above
+    rows = sorted(
+        chain.from_iterable(scatter(lambda alias: _shard_standings(alias, start_date), aliases)),
+        key=lambda row: (-row['score'], row['user_id']),
+    )
+    for position, row in enumerate(rows):
+        tied = position and row['score'] == rows[position - 1]['score']
+        row['rank'] = rows[position - 1]['rank'] if tied else position + 1
+    return rows
+
+
+def update_leaderboard(leaderboard_obj, period):
+    leaderboard_obj.entries.all().delete()
+    aliases = source_aliases()
+    streaks = compute_streaks(aliases=aliases)
+
+    LeaderboardEntry.objects.bulk_create([
+        LeaderboardEntry(
+            leaderboard=leaderboard_obj,
+            user_id=row['user_id'],
+            rank=row['rank'],
+            points=row['score'],
+            calories_burned=row['calories'],
+            workout_count=row['workouts'],
+            streak=streaks[row['user_id']].current,
+        )
+        for row in ranked_standings(period, aliases=aliases)
+    ])
+
+
+def published_snapshots(period):
+    """Published snapshots for ``period``, newest first"""
+    return (
+        Leaderboard.objects
+        .filter(period=period, published_at__isnull=False)
+        .order_by('-published_at')
+    )
+
+
+def published_snapshot(period):
+    return published_snapshots(period).first()
+
+
+def build_snapshot(period, keep=2):
+    """
+    Build a complete snapshot for ``period``, then publish it. The previous
+    ``keep - 1`` published snapshots are kept so in-flight readers can finish.
+    """
+    with transaction.atomic(using=router.db_for_write(Leaderboard)):
+        leaderboard_obj = Leaderboard.objects.create(period=period, snapshot_date=timezone.now())
+        update_leaderboard(leaderboard_obj, period)
+
+    # the pointer flip: one small UPDATE after the entries are committed
+    leaderboard_obj.published_at = timezone.now()
+    leaderboard_obj.save(update_fields=['published_at'])
+
+    stale_published = published_snapshots(period).values_list('pk', flat=True)[keep:]
+    # unpublished rows left behind by a crashed build; only old ones, since a younger one
+    # may be another builder (a manual run next to the --loop process) still at work
+    abandoned_before = leaderboard_obj.snapshot_date - timedelta(
+        seconds=getattr(settings, 'LEADERBOARD_ABANDONED_AFTER', 3600)
+    )
+    abandoned = Leaderboard.objects.filter(
+        period=period, published_at__isnull=True, snapshot_date__lt=abandoned_before
+    )
+    Leaderboard.objects.filter(pk__in=list(stale_published)).delete()
+    abandoned.delete()
+    return leaderboard_obj
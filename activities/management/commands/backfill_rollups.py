@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from activities.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyActivityRollup rows from the activity table"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only backfill this user id (can be repeated)")
+
+    def handle(self, *args, **options):
+        count = rebuild_rollups(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} rollup row(s)"))
@@ -0,0 +1,52 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from activities.analytics import analytics_enabled, sync_analytics
+from activities.leaderboard import build_snapshot
+from activities.models import Leaderboard
+
+logger = logging.getLogger(__name__)
+
+PERIODS = [period for period, _ in Leaderboard.PERIOD_CHOICES]
+
+
+class Command(BaseCommand):
+    help = "Build and publish leaderboard snapshots off the request path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', action='append', choices=PERIODS, dest='periods',
+                            help="Only build this period (can be repeated, default: all)")
+        parser.add_argument('--keep', type=int, default=2,
+                            help="Published snapshots to keep per period (default: 2)")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep rebuilding every --interval seconds")
+        parser.add_argument('--interval', type=int, default=300,
+                            help="Seconds between rebuilds with --loop (default: 300)")
+
+    def handle(self, *args, **options):
+        periods = options['periods'] or PERIODS
+        while True:
+            if not options['loop']:
+                self.build(periods, options['keep'])
+                break
+            try:
+                self.build(periods, options['keep'])
+            except Exception:
+                # one failed pass must not stop the background builder for good
+                logger.exception("Leaderboard build failed; retrying in %ss", options['interval'])
+            time.sleep(options['interval'])
+
+    def build(self, periods, keep):
+        if analytics_enabled():
+            # the builds read the analytics copies, so bring them up to date first
+            synced = sync_analytics()
+            self.stdout.write(f"Synced {synced} user(s) to the analytics database")
+        for period in periods:
+            started = time.monotonic()
+            snapshot = build_snapshot(period, keep=max(keep, 1))
+            self.stdout.write(
+                f"Published {period} leaderboard #{snapshot.pk} "
+                f"({snapshot.entries.count()} entries, {time.monotonic() - started:.2f}s)"
+            )
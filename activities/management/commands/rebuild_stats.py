@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from activities.models import UserProfile
+from activities.sharding import shard_aliases, shards_for
+from activities.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute UserProfile stats from the activity table (reconciles drift from bulk writes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help="Only rebuild this user id (can be repeated)")
+
+    def handle(self, *args, **options):
+        if options['user_ids']:
+            shards = shards_for(options['user_ids']).items()
+        else:
+            shards = [(alias, None) for alias in shard_aliases()]
+
+        count = 0
+        for alias, user_ids in shards:
+            profiles = UserProfile.objects.using(alias)
+            if user_ids is not None:
+                profiles = profiles.filter(user_id__in=user_ids)
+            for profile in profiles.iterator():
+                rebuild_user_stats(profile)
+                count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt stats for {count} profile(s)"))
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from activities.sharding import (
+    highest_id_band, move_user, register_shard, reserve_id_band, shard_aliases, shard_count, shard_for,
+)
+
+
+class Command(BaseCommand):
+    help = ("Move per-user rows from an old ACTIVITY_SHARDS layout into the current one. "
+            "Stop the web and job workers first: writes made during the move would land on the new shards "
+            "and be overwritten.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', type=int, required=True, dest='old_count',
+                            help="ACTIVITY_SHARDS the data is laid out for now (0: everything in default)")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report how many users would move")
+
+    def handle(self, *args, **options):
+        old_count, new_count = options['old_count'], shard_count()
+        if old_count < 0:
+            raise CommandError("--from must be 0 or more")
+        if old_count == new_count:
+            raise CommandError(f"The data is already laid out for ACTIVITY_SHARDS={new_count}")
+
+        # shrinking drains shards the current settings no longer list
+        for index in range(old_count):
+            register_shard(index)
+
+        users = get_user_model()._base_manager.using(DEFAULT_DB_ALIAS).order_by('pk')
+        moved = 0
+        for user in users.iterator():
+            source, target = shard_for(user, old_count), shard_for(user, new_count)
+            if source == target:
+                continue
+            if options['dry_run'] or move_user(user, source, target):
+                moved += 1
+
+        if options['dry_run']:
+            self.stdout.write(f"{moved} user(s) would move from {old_count} to {new_count} shard(s)")
+            return
+
+        # every shard continues from a band nothing has used yet, above the ids that just moved
+        aliases = shard_aliases(new_count)
+        band = max(highest_id_band(alias) for alias in {*shard_aliases(old_count), *aliases}) + 1
+        for offset, alias in enumerate(aliases):
+            reserve_id_band(alias, band + offset)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} user(s) from {old_count} to {new_count} shard(s); new ids start in band {band}"
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from activities.jobs import run_due_jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued streak and goal recomputes (used when ACTIVITY_JOBS_INLINE is off)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500,
+                            help="Jobs to claim per pass (default: 500)")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep polling every --interval seconds")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds between polls with --loop when the queue is empty (default: 1)")
+
+    def handle(self, *args, **options):
+        while True:
+            ran = run_due_jobs(limit=options['batch'])
+            if ran:
+                self.stdout.write(f"Ran {ran} activity jobs")
+            if not options['loop']:
+                break
+            # drain a backlog without pausing; sleep once the queue is caught up
+            if ran < options['batch']:
+                time.sleep(options['interval'])
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from activities.analytics import SYNC_BATCH_SIZE, analytics_enabled, sync_analytics
+
+
+class Command(BaseCommand):
+    help = "Copy the users whose profile totals or rollups changed into the analytics database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=SYNC_BATCH_SIZE,
+                            help=f"Users copied per transaction (default: {SYNC_BATCH_SIZE})")
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep syncing every --interval seconds")
+        parser.add_argument('--interval', type=float, default=60,
+                            help="Seconds between syncs with --loop (default: 60)")
+
+    def handle(self, *args, **options):
+        if not analytics_enabled():
+            raise CommandError("ANALYTICS_DATABASE is not set, so there is nothing to sync to")
+        while True:
+            synced = sync_analytics(batch_size=max(options['batch'], 1))
+            self.stdout.write(f"Synced {synced} user(s) to the analytics database")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
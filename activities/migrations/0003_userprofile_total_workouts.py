@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:27
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_total_workouts(apps, schema_editor):
+    UserProfile = apps.get_model('activities', 'UserProfile')
+    FitnessActivity = apps.get_model('activities', 'FitnessActivity')
+    db = schema_editor.connection.alias
+    workouts = (
+        FitnessActivity.objects.using(db).filter(user_id=OuterRef('user_id'))
+        .order_by()
+        .values('user_id')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    UserProfile.objects.using(db).update(total_workouts=Coalesce(Subquery(workouts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='total_workouts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_total_workouts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    FitnessActivity = apps.get_model('activities', 'FitnessActivity')
+    DailyActivityRollup = apps.get_model('activities', 'DailyActivityRollup')
+    db = schema_editor.connection.alias
+    grouped = (
+        FitnessActivity.objects.using(db).annotate(day=TruncDate('date'))
+        .order_by()
+        .values('user_id', 'day', 'activity_type')
+        .annotate(
+            total_duration=Sum('duration'),
+            total_distance=Sum('distance'),
+            total_calories=Sum('calories_burned'),
+            activity_count=Count('id'),
+        )
+    )
+    DailyActivityRollup.objects.using(db).bulk_create(DailyActivityRollup(**row) for row in grouped.iterator())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0003_userprofile_total_workouts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('activity_type', models.CharField(choices=[('running', 'Running'), ('cycling', 'Cycling'), ('swimming', 'Swimming'), ('walking', 'Walking'), ('weightlifting', 'Weightlifting'), ('yoga', 'Yoga'), ('pilates', 'Pilates'), ('hiit', 'HIIT'), ('dancing', 'Dancing'), ('hiking', 'Hiking'), ('boxing', 'Boxing'), ('rowing', 'Rowing'), ('skipping', 'Skipping'), ('elliptical', 'Elliptical'), ('stair_climbing', 'Stair Climbing')], max_length=20)),
+                ('total_duration', models.IntegerField(default=0)),
+                ('total_distance', models.FloatField(default=0)),
+                ('total_calories', models.IntegerField(default=0)),
+                ('activity_count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactivityrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'day', 'activity_type'), name='unique_daily_rollup'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0004_dailyactivityrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboard',
+            name='published_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_activity_day(apps, schema_editor):
+    FitnessActivity = apps.get_model('activities', 'FitnessActivity')
+    FitnessActivity.objects.using(schema_editor.connection.alias).update(activity_day=TruncDate('date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activities', '0005_leaderboard_published_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fitnessactivity',
+            name='activity_day',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_activity_day, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='fitnessactivity',
+            name='activity_day',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessactivity',
+            index=models.Index(fields=['user', 'activity_day'], name='activity_user_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessactivity',
+            index=models.Index(fields=['user', '-date', '-id'], name='activity_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutgoal',
+            index=models.Index(fields=['user', 'status'], name='goal_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['period', 'published_at'], name='leaderboard_period_pub_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['leaderboard', 'rank'], name='entry_board_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('activities', '0006_activity_day_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('streak', 'Streak'), ('goals', 'Goals')], max_length=10)),
+                ('run_after', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['run_after'],
+                'indexes': [models.Index(fields=['run_after'], name='activity_job_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activityjob',
+            constraint=models.UniqueConstraint(fields=('user', 'kind'), name='unique_activity_job'),
+        ),
+    ]
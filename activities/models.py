@@ -2,7 +2,12 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Sum , Count
+from collections import namedtuple
+
+from .sharding import UserShardedQuerySet
+
+# the parts of an activity that feed into profile totals, used to work out deltas on update/delete
+ActivitySnapshot = namedtuple('ActivitySnapshot', ['user_id', 'activity_type', 'day', 'duration', 'distance', 'calories_burned'])
 # Create your models here.
 class FitnessActivity(models.Model):
     ACTIVITY_TYPES = [
@@ -33,22 +38,72 @@ class FitnessActivity(models.Model):
     calories_burned = models.IntegerField()
     distance = models.FloatField()
     date = models.DateTimeField(default = timezone.now)
+    # calendar day of ``date`` in the owner's timezone, worked out once on save so day filters and
+    # groupings hit an index instead of converting ``date`` in every query
+    activity_day = models.DateField(editable = False)
     notes = models.TextField(blank = True)
     intensity = models.CharField(max_length = 10 , choices = Intensity , default = "medium")
     created_at = models.DateTimeField(auto_now_add = True)
     updated_at = models.DateTimeField(auto_now = True)
+
+    objects = UserShardedQuerySet.as_manager()
     #  now we have created the activity what will be added to the database you can make it this is all baout models
     class Meta:
         ordering = ['-date']
         # to make sorted order when we call the FitnessActivity.objects.all() => sorted order this also can be 
         verbose_name_plural = "Fitness Activities"
         # making model plural naming in django for models
+        indexes = [
+            models.Index(fields = ['user', 'activity_day'], name = 'activity_user_day_idx'),
+            models.Index(fields = ['user', '-date', '-id'], name = 'activity_user_date_idx'),
+        ]
     def __str__(self):
         return f"{self.user.email} - {self.activity_type} - {self.date.strftime('%Y-%m-%d')}"
+    # state as last loaded from / written to the database, None for unsaved or partially loaded rows
+    _stored_snapshot = None
+    # ActivitySnapshot field -> model column
+    SNAPSHOT_COLUMNS = {
+        'user_id': 'user_id', 'activity_type': 'activity_type', 'day': 'activity_day',
+        'duration': 'duration', 'distance': 'distance', 'calories_burned': 'calories_burned',
+    }
+    SNAPSHOT_FIELDS = set(SNAPSHOT_COLUMNS.values())
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remember what is stored so the stats signals can apply a delta instead of re-aggregating
+        if not cls.SNAPSHOT_FIELDS & instance.get_deferred_fields():
+            instance._stored_snapshot = instance.snapshot()
+        return instance
     def save(self,*args,**kwargs):
+        self.fill_derived_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'date' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'activity_day'}
+        super().save(*args , **kwargs)
+    def fill_derived_fields(self):
+        # also called for rows written with bulk_create, which skips save()
+        self.activity_day = self.user.local_day(self.date)
         if not self.calories_burned:
             self.calories_burned = self.estimate_calories()
-        super().save(*args , **kwargs)
+    def snapshot(self):
+        return ActivitySnapshot(
+            user_id=self.user_id,
+            activity_type=self.activity_type,
+            day=self.activity_day,
+            duration=self.duration or 0,
+            distance=self.distance or 0,
+            calories_burned=self.calories_burned or 0,
+        )
+    def saved_snapshot(self, update_fields=None):
+        """What the row holds after a save: with ``update_fields`` only those columns moved past the stored state"""
+        current = self.snapshot()
+        if update_fields is None or self._stored_snapshot is None:
+            return current
+        saved = {self._meta.get_field(name).attname for name in update_fields}
+        return self._stored_snapshot._replace(
+            **{name: getattr(current, name) for name, column in self.SNAPSHOT_COLUMNS.items() if column in saved}
+        )
     def estimate_calories(self):
         calorie_rates = {
             'running': 10,
@@ -112,8 +167,13 @@ class WorkoutGoal(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserShardedQuerySet.as_manager()
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields = ['user', 'status'], name = 'goal_user_status_idx'),
+        ]
     def __str__(self):
         return f"{self.user.email} - {self.title}"
     
@@ -122,14 +182,15 @@ class WorkoutGoal(models.Model):
             return min(100 , (self.current_value / self.target_value) * 100)
         return 0
     def days_remaining(self):
-        today = timezone.now().date()
+        today = self.user.local_day()
         remaining = (self.end_date - today).days
         return max(remaining , 0)
     def is_expired(self):
-        return timezone.now().date() > self.end_date
+        return self.user.local_day() > self.end_date
     
-    def update_progress(self):
-        today = timezone.now().date()
+    def period_bounds(self, today=None):
+        # the goal's period follows the owner's calendar, matching how activity_day is bucketed
+        today = today or self.user.local_day()
         if self.duration_type == 'daily':
             start_date = today
             end_date = today
@@ -138,46 +199,20 @@ class WorkoutGoal(models.Model):
             end_date = start_date + timedelta(days=6)
         elif self.duration_type == 'monthly':
             start_date = today.replace(day = 1)
-            end_date = (start_date + timedelta(day = 32)).replace(day = 1) - timedelta(days = 1)
+            end_date = (start_date + timedelta(days = 32)).replace(day = 1) - timedelta(days = 1)
         else:
             start_date = today.replace(month = 1 , day = 1)
             end_date = today.replace(month = 12 , day = 31)
-        activities = FitnessActivity.objects.filter(
-            user=self.user,
-            date__date__range=[start_date, end_date]
-        )
-        if self.activity_type:
-            activities = activities.filter(activity_type=self.activity_type)
-        
-        if self.goal_type == 'duration':
-            self.current_value = activities.aggregate(total = Sum('duartion'))['total'] or 0
-        elif self.goal_type == "calories":
-            self.current_value = activities.aggregate(total = Sum('calories_burned'))['total'] or 0
-        elif self.goal_type == 'frequency':
-            self.current_value = activities.count()
-        elif self.goal_type == 'distance':
-            self.current_value = activities.aggregate(total=Sum('distance'))['total'] or 0
-        elif self.goal_type == 'streak':
-            self.current_value = self.calculate_streak()
-        
-        # Update status for the profile
-        if self.current_value >= self.target_value:
-            self.status = 'completed'
-        elif self.is_expired() and self.status == 'active':
-            self.status = 'failed'
-        
-        self.save()
+        return start_date, end_date
+
+    def update_progress(self):
+        """Recompute current_value and status from the rollups and save; see goals.evaluate_goals"""
+        from .goals import evaluate_goals
+        evaluate_goals([self])
     #  counting streaks for the app 
     def calculate_streak(self):
-        today = timezone.now().date()
-        streak = 0
-        for i in range(365):
-            check_date = today - timedelta(day = i)
-            if FitnessActivity.objects.filter(user = self.user , date_date = check_date).exists():
-                streak += 1
-            else:
-                break
-        return streak
+        from .streaks import compute_streak
+        return compute_streak(self.user_id).current
 class UserProfile(models.Model):
     # we are going to use one profile for one user
     user = models.OneToOneField(settings.AUTH_USER_MODEL , on_delete = models.CASCADE , related_name = 'profile')
@@ -187,39 +222,23 @@ class UserProfile(models.Model):
     longest_streak = models.IntegerField(default = 0)
     level = models.IntegerField(default = 1)
     points = models.IntegerField(default = 0)
+    total_workouts = models.IntegerField(default = 0)
     last_activity = models.DateField(null = True , blank = True)
+    # bumped on every write to the user's activities, goals or profile; part of every response cache key
+    data_version = models.IntegerField(default = 0)
+
+    objects = UserShardedQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.user.email} -Level {self.level}"
     def update_stats(self):
-        activities = FitnessActivity.objects.filter(user=self.user)
-        
-        self.total_calories_burned = activities.aggregate(total=Sum('calories_burned'))['total'] or 0
-        self.total_workout_time = activities.aggregate(total=Sum('duration'))['total'] or 0
-        self.total_workouts = activities.count()
-
-        self.current_streak = self.calculate_current_streak()
-        self.longest_streak = max(self.longest_streak, self.current_streak)
-
-        self.points = (self.total_calories_burned // 100) + self.total_workouts
-        
-
-        self.level = (self.points // 100) + 1
-        
-        self.save()
+        """Full recompute of the profile from the activity table (reconciliation path)"""
+        from .stats import rebuild_user_stats
+        rebuild_user_stats(self)
     def calculate_current_streak(self):
         """Calculate current consecutive days with workouts"""
-        today = timezone.now().date()
-        streak = 0
-        
-        for i in range(365):
-            check_date = today - timedelta(days=i)
-            if FitnessActivity.objects.filter(user=self.user, date__date=check_date).exists():
-                streak += 1
-            else:
-                break
-        
-        return streak
+        from .streaks import compute_streak
+        return compute_streak(self.user_id).current
 class Leaderboard(models.Model):
     PERIOD_CHOICES = [
         ('daily', 'Daily'),
@@ -229,9 +248,14 @@ class Leaderboard(models.Model):
     ]
     period = models.CharField(max_length= 10 , choices = PERIOD_CHOICES)
     snapshot_date = models.DateTimeField(default = timezone.now)
+    # set once every entry has been written; readers only ever see published snapshots
+    published_at = models.DateTimeField(null = True , blank = True)
     created_at = models.DateField(auto_now_add = True)
     class Meta:
         ordering = ['-snapshot_date' , 'period']
+        indexes = [
+            models.Index(fields = ['period', 'published_at'], name = 'leaderboard_period_pub_idx'),
+        ]
     def __str__(self):
         return f"{self.period} Leadersboard - {self.snapshot_date}"
 class LeaderboardEntry(models.Model):
@@ -245,6 +269,53 @@ class LeaderboardEntry(models.Model):
     
     class Meta:
         ordering = ['leaderboard', 'rank']
+        indexes = [
+            models.Index(fields = ['leaderboard', 'rank'], name = 'entry_board_rank_idx'),
+        ]
     
     def __str__(self):
         return f"#{self.rank} - {self.user.email} - {self.points} points"
+class DailyActivityRollup(models.Model):
+    # one row per user per day per activity type, kept in step with FitnessActivity by the signals
+    user = models.ForeignKey(settings.AUTH_USER_MODEL , on_delete = models.CASCADE , related_name = 'daily_rollups')
+    day = models.DateField()
+    activity_type = models.CharField(max_length = 20 , choices = FitnessActivity.ACTIVITY_TYPES)
+    total_duration = models.IntegerField(default = 0)
+    total_distance = models.FloatField(default = 0)
+    total_calories = models.IntegerField(default = 0)
+    activity_count = models.IntegerField(default = 0)
+
+    objects = UserShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'day', 'activity_type'], name = 'unique_daily_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.activity_type} - {self.day}"
+class ActivityJob(models.Model):
+    # a queued streak/goal recompute; one row per user and kind, so a burst of writes collapses into one run
+    KIND_CHOICES = [
+        ('streak', 'Streak'),
+        ('goals', 'Goals'),
+    ]
+    user = models.ForeignKey(settings.AUTH_USER_MODEL , on_delete = models.CASCADE , related_name = 'activity_jobs')
+    kind = models.CharField(max_length = 10 , choices = KIND_CHOICES)
+    run_after = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add = True)
+
+    objects = UserShardedQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['run_after']
+        constraints = [
+            models.UniqueConstraint(fields = ['user', 'kind'], name = 'unique_activity_job'),
+        ]
+        indexes = [
+            models.Index(fields = ['run_after'], name = 'activity_job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} for {self.user_id} after {self.run_after}"
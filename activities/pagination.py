@@ -0,0 +1,106 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the ``(ordering_field, id)`` of the row at their edge
+instead of an offset, so fetching page 500 costs the same single indexed
+range query as page 1, and rows inserted while a client is paging do not
+shift or duplicate the rows it has yet to see. Cursors are opaque
+base64-encoded JSON.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    ordering_field = 'date'
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    # -------------------- cursors --------------------
+
+    def encode_cursor(self, direction, row):
+        position = {'d': direction, 'v': getattr(row, self.ordering_field).isoformat(), 'id': row.pk}
+        token = base64.urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return position['d'] == 'p', datetime.fromisoformat(position['v']), int(position['id'])
+        except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # -------------------- paging --------------------
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        field = self.ordering_field
+
+        # newest first, with id breaking ties between rows sharing a timestamp
+        queryset = queryset.order_by(f'-{field}', '-id')
+        backwards = False
+        if cursor is not None:
+            backwards, value, pk = cursor
+            if backwards:
+                queryset = queryset.filter(
+                    Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk})
+                ).order_by(field, 'id')
+            else:
+                queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        # walking backwards we came from a later page, walking forwards from an earlier one
+        more_after = backwards or has_more
+        more_before = has_more if backwards else cursor is not None
+        self.next_link = self.encode_cursor('n', rows[-1]) if rows and more_after else None
+        self.previous_link = self.encode_cursor('p', rows[0]) if rows and more_before else None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_link,
+            'previous': self.previous_link,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class GoalKeysetPagination(KeysetPagination):
+    ordering_field = 'created_at'
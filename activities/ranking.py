@@ -0,0 +1,325 @@
+"""
+In-process leaderboard rank index.
+
+Each leaderboard period keeps every user's period totals in memory together
+with an order-statistic tree keyed by ``(-points, user_id)``, plus the
+usernames and current streaks the ranking endpoint shows. Activity writes,
+streak refreshes and username changes are folded in as they commit, so "what
+is my rank", "who is around me" and "top K" are answered in O(log n) without
+touching the database.
+
+An index is built from the database (one ``ranked_standings`` query, the
+streaks and the usernames) on first use, unless ``rank_indexes.warm()`` has
+already done so from the gunicorn ``post_worker_init`` hook. When its period
+window rolls over to a new day, or after ``RANK_INDEX_MAX_AGE`` seconds so
+that writes handled by other worker processes are picked up, it is rebuilt on
+a background thread while requests keep reading the current one. Changes that
+arrive while a rebuild reads the database are recorded and replayed onto the
+new index before it replaces the old one, so they are not lost in the swap.
+"""
+import logging
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+from itertools import chain
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .leaderboard import period_start, ranked_standings
+from .models import Leaderboard, UserProfile
+from .sharding import scatter, shard_for
+from .stats import points_for
+
+logger = logging.getLogger(__name__)
+
+Standing = namedtuple('Standing', ['user_id', 'rank', 'points', 'calories_burned', 'workout_count', 'username', 'streak'])
+
+PERIODS = [period for period, _ in Leaderboard.PERIOD_CHOICES]
+
+
+class _Node:
+    __slots__ = ('key', 'priority', 'left', 'right', 'size')
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _resize(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node, key, inclusive=False):
+    """Split into (keys < key, keys >= key), or (keys <= key, keys > key) when inclusive"""
+    if node is None:
+        return None, None
+    if node.key < key or (inclusive and node.key == key):
+        left, right = _split(node.right, key, inclusive)
+        node.right = left
+        return _resize(node), right
+    left, right = _split(node.left, key, inclusive)
+    node.left = right
+    return left, _resize(node)
+
+
+def _merge(left, right):
+    """Join two trees where every key in ``left`` sorts before every key in ``right``"""
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _resize(left)
+    right.left = _merge(left, right.left)
+    return _resize(right)
+
+
+class OrderStatisticTree:
+    """Sorted set of unique keys with O(log n) insert, remove, rank and select (a size-augmented treap)"""
+
+    def __init__(self, keys=()):
+        self.root = None
+        for key in sorted(keys):
+            self.root = _merge(self.root, _Node(key))
+
+    def __len__(self):
+        return _size(self.root)
+
+    def insert(self, key):
+        left, right = _split(self.root, key)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key):
+        left, rest = _split(self.root, key)
+        _, right = _split(rest, key, inclusive=True)
+        self.root = _merge(left, right)
+
+    def count_less(self, key):
+        """How many keys sort strictly before ``key``"""
+        node, count = self.root, 0
+        while node is not None:
+            if node.key < key:
+                count += _size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return count
+
+    def select(self, index):
+        """The key at position ``index`` (0-based) in sorted order"""
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        node = self.root
+        while True:
+            left = _size(node.left)
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node.key
+            else:
+                index -= left + 1
+                node = node.right
+
+    def slice(self, start, stop):
+        return [self.select(i) for i in range(max(start, 0), min(stop, len(self)))]
+
+
+class RankIndex:
+    def __init__(self, period):
+        self.period = period
+        self.lock = threading.RLock()
+        self.window_start = None
+        self.built_at = None
+        self.totals = {}
+        self.tree = OrderStatisticTree()
+        self.usernames = {}
+        self.streaks = {}
+        # one list per rebuild in flight, collecting the changes that arrive while it reads
+        self.recording = []
+        self.rebuilding = False
+
+    # -------------------- building --------------------
+
+    def is_stale(self):
+        if self.built_at is None:
+            return True
+        if period_start(self.period, timezone.now().date()) != self.window_start:
+            return True
+        return time.monotonic() - self.built_at > getattr(settings, 'RANK_INDEX_MAX_AGE', 300)
+
+    def rebuild(self):
+        today = timezone.now().date()
+        changes = []
+        with self.lock:
+            self.recording.append(changes)
+        try:
+            rows = list(ranked_standings(self.period, today))
+            streaks = dict(chain.from_iterable(scatter(_current_streaks)))
+            usernames = dict(get_user_model()._base_manager.using(DEFAULT_DB_ALIAS).values_list('pk', 'username'))
+        finally:
+            with self.lock:
+                self.recording.remove(changes)
+        with self.lock:
+            self.window_start = period_start(self.period, today)
+            self.totals = {row['user_id']: (row['calories'], row['workouts']) for row in rows}
+            self.tree = OrderStatisticTree((-row['score'], row['user_id']) for row in rows)
+            self.usernames = usernames
+            self.streaks = streaks
+            self.built_at = time.monotonic()
+            # a write committed just before the query but announced just after it is counted
+            # twice; that window is tiny and the next rebuild corrects it
+            for replay in changes:
+                replay()
+
+    def ensure_fresh(self):
+        if self.built_at is None:
+            # nothing to answer from yet
+            self.rebuild()
+        elif self.is_stale():
+            self.rebuild_in_background()
+        return self
+
+    def rebuild_in_background(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self._background_rebuild, name=f'rank-index-{self.period}', daemon=True).start()
+
+    def _background_rebuild(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("rebuilding the %s rank index failed", self.period)
+        finally:
+            with self.lock:
+                self.rebuilding = False
+            connections.close_all()
+
+    # -------------------- updates --------------------
+
+    def covers(self, day):
+        return self.window_start is None or day >= self.window_start
+
+    def add(self, user_id, calories, workouts):
+        with self.lock:
+            old_calories, old_workouts = self.totals.get(user_id, (0, 0))
+            new_totals = (old_calories + calories, old_workouts + workouts)
+            if user_id in self.totals:
+                self.tree.remove((-points_for(old_calories, old_workouts), user_id))
+            self.totals[user_id] = new_totals
+            self.tree.insert((-points_for(*new_totals), user_id))
+
+    def apply_activity_change(self, old, new):
+        """Fold an ``ActivitySnapshot`` change in, ignoring days outside the period window"""
+        self._record_and_apply(partial(self._apply_change, old, new))
+
+    def set_streak(self, user_id, streak):
+        self._record_and_apply(partial(self._set, 'streaks', user_id, streak))
+
+    def set_username(self, user_id, username):
+        self._record_and_apply(partial(self._set, 'usernames', user_id, username))
+
+    def _record_and_apply(self, change):
+        with self.lock:
+            for changes in self.recording:
+                changes.append(change)
+            if self.built_at is not None:
+                change()
+
+    def _set(self, name, user_id, value):
+        # by name, so a replay lands in the dict the rebuild just put in place
+        getattr(self, name)[user_id] = value
+
+    def _apply_change(self, old, new):
+        # callers hold the lock
+        if old is not None and self.covers(old.day):
+            self.add(old.user_id, -old.calories_burned, -1)
+        if new is not None and self.covers(new.day):
+            self.add(new.user_id, new.calories_burned, 1)
+
+    # -------------------- reads --------------------
+
+    def _standing(self, user_id):
+        calories, workouts = self.totals.get(user_id, (0, 0))
+        points = points_for(calories, workouts)
+        # RANK() semantics: one more than the number of users with strictly more points
+        rank = self.tree.count_less((-points, float('-inf'))) + 1
+        return Standing(
+            user_id, rank, points, calories, workouts, self.usernames.get(user_id), self.streaks.get(user_id, 0),
+        )
+
+    def standing(self, user_id):
+        with self.lock:
+            return self._standing(user_id)
+
+    def around(self, user_id, radius):
+        """Standings of the users within ``radius`` places of ``user_id``, best first"""
+        with self.lock:
+            calories, workouts = self.totals.get(user_id, (0, 0))
+            position = self.tree.count_less((-points_for(calories, workouts), user_id))
+            keys = self.tree.slice(position - radius, position + radius + 1)
+            return [self._standing(key[1]) for key in keys]
+
+    def top(self, k):
+        with self.lock:
+            return [self._standing(key[1]) for key in self.tree.slice(0, k)]
+
+
+def _current_streaks(alias):
+    # users without a running streak are left out; a missing entry reads as 0
+    return UserProfile.objects.using(alias).filter(current_streak__gt=0).values_list('user_id', 'current_streak')
+
+
+class RankIndexRegistry:
+    def __init__(self):
+        self.indexes = {period: RankIndex(period) for period in PERIODS}
+
+    def get(self, period):
+        return self.indexes[period].ensure_fresh()
+
+    def warm(self):
+        for index in self.indexes.values():
+            index.rebuild()
+
+    def apply_activity_change(self, old, new):
+        self.apply_activity_changes([(old, new)])
+
+    def apply_activity_changes(self, changes):
+        # only touch memory once the write is durable, so a rollback cannot skew the ranks;
+        # the write commits on its user's shard, so that is the transaction to wait for
+        per_shard = defaultdict(list)
+        for old, new in changes:
+            per_shard[shard_for((new or old).user_id)].append((old, new))
+        for alias, shard_changes in per_shard.items():
+            transaction.on_commit(partial(self._apply, shard_changes), using=alias)
+
+    def set_streak(self, user_id, streak):
+        transaction.on_commit(partial(self._each, 'set_streak', user_id, streak), using=shard_for(user_id))
+
+    def set_username(self, user_id, username):
+        transaction.on_commit(partial(self._each, 'set_username', user_id, username), using=DEFAULT_DB_ALIAS)
+
+    def _each(self, method, *args):
+        for index in self.indexes.values():
+            getattr(index, method)(*args)
+
+    def _apply(self, changes):
+        for index in self.indexes.values():
+            for old, new in changes:
+                index.apply_activity_change(old, new)
+
+
+rank_indexes = RankIndexRegistry()
@@ -0,0 +1,39 @@
+import json
+
+from django.http import Http404
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Lets DRF's content negotiation accept ``?format=csv|ndjson``. The export view
+    streams its own response, so these only ever render error payloads.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """
+    DRF answers a ``?format=`` no renderer claims with a 404 before the view runs;
+    here it falls back to the first renderer so the export view can say which
+    formats it supports.
+    """
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except Http404:
+            return renderers[0], renderers[0].media_type
@@ -0,0 +1,106 @@
+"""
+Per-user daily rollups.
+
+``DailyActivityRollup`` holds one row per (user, day, activity_type) with the
+summed duration, distance, calories and activity count. The signals apply
+each activity write as a delta, so read endpoints can sum a handful of rollup
+rows instead of scanning every workout the user ever logged.
+``rebuild_rollups`` regenerates the table from ``FitnessActivity`` and backs
+the ``backfill_rollups`` management command.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import DailyActivityRollup, FitnessActivity
+from .sharding import shard_aliases, shards_for
+
+
+def apply_rollup_delta(user_id, day, activity_type, duration=0, distance=0, calories=0, count=0):
+    """Shift one rollup row, creating it on first use and dropping it once it is empty"""
+    rollup = DailyActivityRollup.objects.for_user(user_id).filter(day=day, activity_type=activity_type)
+    changes = {
+        'total_duration': F('total_duration') + duration,
+        'total_distance': F('total_distance') + distance,
+        'total_calories': F('total_calories') + calories,
+        'activity_count': F('activity_count') + count,
+    }
+
+    if not rollup.update(**changes):
+        try:
+            with transaction.atomic(using=rollup.db):
+                rollup.create(
+                    user_id=user_id, day=day, activity_type=activity_type,
+                    total_duration=duration, total_distance=distance,
+                    total_calories=calories, activity_count=count,
+                )
+        except IntegrityError:
+            # another writer created the row between our UPDATE and INSERT
+            rollup.update(**changes)
+
+    if count < 0:
+        rollup.filter(activity_count__lte=0).delete()
+
+
+def _apply(snapshot, sign):
+    apply_rollup_delta(
+        snapshot.user_id, snapshot.day, snapshot.activity_type,
+        duration=sign * snapshot.duration,
+        distance=sign * snapshot.distance,
+        calories=sign * snapshot.calories_burned,
+        count=sign,
+    )
+
+
+def apply_activity_change(old, new):
+    """Move an activity's contribution between rollup rows; mirrors ``stats.apply_activity_change``"""
+    same_row = (
+        old is not None and new is not None
+        and (old.user_id, old.day, old.activity_type) == (new.user_id, new.day, new.activity_type)
+    )
+    if same_row:
+        apply_rollup_delta(
+            new.user_id, new.day, new.activity_type,
+            duration=new.duration - old.duration,
+            distance=new.distance - old.distance,
+            calories=new.calories_burned - old.calories_burned,
+        )
+        return
+
+    if old is not None:
+        _apply(old, -1)
+    if new is not None:
+        _apply(new, 1)
+
+
+def rebuild_rollups(user_ids=None):
+    """Regenerate rollups from the activity table, for everyone or just ``user_ids``"""
+    if user_ids is None:
+        return sum(_rebuild_shard_rollups(alias) for alias in shard_aliases())
+    return sum(_rebuild_shard_rollups(alias, ids) for alias, ids in shards_for(user_ids).items())
+
+
+def _rebuild_shard_rollups(alias, user_ids=None):
+    activities = FitnessActivity.objects.using(alias)
+    existing = DailyActivityRollup.objects.using(alias)
+    if user_ids is not None:
+        activities = activities.filter(user_id__in=user_ids)
+        existing = existing.filter(user_id__in=user_ids)
+
+    grouped = (
+        activities
+        .order_by()
+        .values('user_id', 'activity_type', day=F('activity_day'))
+        .annotate(
+            total_duration=Sum('duration'),
+            total_distance=Sum('distance'),
+            total_calories=Sum('calories_burned'),
+            activity_count=Count('id'),
+        )
+    )
+
+    with transaction.atomic(using=alias):
+        existing.delete()
+        rollups = DailyActivityRollup.objects.using(alias).bulk_create(
+            DailyActivityRollup(**row) for row in grouped.iterator()
+        )
+    return len(rollups)
@@ -46,10 +46,10 @@ class ActivityTrendSerializer(serializers.Serializer):
 class WorkoutGoalSerializer(serializers.ModelSerializer):
     progress_percentage = serializers.SerializerMethodField()
     days_remaining = serializers.SerializerMethodField()
-    is_expierd = serializers.SerializerMethodField()
+    is_expired = serializers.SerializerMethodField()
     user = serializers.StringRelatedField(read_only = True)
     class Meta:
-        models = WorkoutGoal
+        model = WorkoutGoal
         fields = [
             'id', 'user', 'title', 'description', 'goal_type', 'duration_type',
             'target_value', 'current_value', 'unit', 'activity_type',
@@ -57,22 +57,19 @@ class WorkoutGoalSerializer(serializers.ModelSerializer):
             'days_remaining', 'is_expired', 'created_at'
         ]
         read_only_fields = ('user', 'current_value', 'status')
-        def get_progress_percentage(self,obj):
-            return obj.progress_percentage()
-        
-        def get_days_remaining(self, obj):
-            return obj.days_remaining()
-        
-        def get_is_expired(self, obj):
-            return obj.is_expired()
+    def get_progress_percentage(self,obj):
+        return obj.progress_percentage()
+    
+    def get_days_remaining(self, obj):
+        return obj.days_remaining()
     
-        def create(self, validated_data):
-            validated_data['user'] = self.context['request'].user
-            return super().create(validated_data)
+    def get_is_expired(self, obj):
+        return obj.is_expired()
 class UserProfileSeriallizer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only = True)
     username = serializers.CharField(source = 'user.username' ,read_only = True)
     email = serializers.CharField(source = 'user.email' ,read_only = True)
+    last_activity_date = serializers.DateField(source = 'last_activity' ,read_only = True)
 
     class Meta:
         model = UserProfile
@@ -95,5 +92,5 @@ class LeaderboardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Leaderboard
         fields = [
-            'id', 'period', 'snapshot_date', 'entries', 'created_at'
+            'id', 'period', 'snapshot_date', 'published_at', 'entries', 'created_at'
         ]
\ No newline at end of file
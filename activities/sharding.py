@@ -0,0 +1,258 @@
+"""
+User-sharded storage for per-user data (opt-in with ``ACTIVITY_SHARDS``).
+
+With ``ACTIVITY_SHARDS = N`` every user's activities, goals, profile, daily
+rollups and queued jobs live in one of N SQLite files (aliases ``shard0`` ..
+``shardN-1``), picked by ``user_id % N``. Users, leaderboards and everything
+else stay in ``default``. A user's rows share one file, so no write
+transaction ever spans two shards, and writers for users on different shards
+no longer queue for the same database lock.
+
+* ``UserShardRouter`` sends the sharded models to the owner's shard whenever
+  Django hands it an instance (saves, deletes, related managers) and every
+  other model to ``default``. A sharded query with no instance behind it has
+  no user to route by, so it raises ``ShardRoutingError`` rather than quietly
+  reading the wrong file.
+* ``Model.objects.for_user(user)`` is the query form: that user's rows, on
+  their shard. Work that spans users goes shard by shard, with
+  ``shards_for(user_ids)`` or ``scatter(fn)``, which runs ``fn`` on every
+  shard in parallel and gathers the results.
+
+Every shard carries the full schema (``migrate --database shardK``) and a
+copy of its users' ``CustomerRegister`` rows, kept current by ``copy_user``
+from the user signals, so foreign keys and joins on the user stay in one
+file. Each shard hands out primary keys from an id band of its own
+(``reserve_id_band``), so ids stay unique across shards and rows can move
+between them unchanged. ``manage.py reshard`` moves them when the shard
+count changes, then puts every shard on a fresh band above all stored ids.
+
+With ``ACTIVITY_SHARDS = 0`` (the default) no router is installed and every
+helper here resolves to ``default``.
+"""
+import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+
+# models whose rows belong to one user and live on that user's shard
+SHARDED_MODELS = [
+    'activities.UserProfile',
+    'activities.FitnessActivity',
+    'activities.WorkoutGoal',
+    'activities.DailyActivityRollup',
+    'activities.ActivityJob',
+]
+
+# each id band holds 2**40 keys; band 0 is what ``default`` handed out before sharding
+ID_BAND_BITS = 40
+
+
+class ShardRoutingError(Exception):
+    pass
+
+
+def shard_count():
+    return getattr(settings, 'ACTIVITY_SHARDS', 0)
+
+
+def shard_alias(index):
+    return f'shard{index}'
+
+
+def shard_index(alias):
+    """``K`` for ``shardK``, None for any other alias"""
+    if alias.startswith('shard') and alias[len('shard'):].isdigit():
+        return int(alias[len('shard'):])
+    return None
+
+
+def register_shard(index):
+    """
+    Make ``shardK`` usable even when ``ACTIVITY_SHARDS`` no longer covers it
+    (e.g. ``reshard`` draining the shards of a larger layout). Shard files live
+    in ``ACTIVITY_SHARD_DIR`` and share every other setting with ``default``.
+    """
+    alias = shard_alias(index)
+    if alias not in connections.settings:
+        connections.settings[alias] = {
+            **connections.settings[DEFAULT_DB_ALIAS],
+            'NAME': os.path.join(settings.ACTIVITY_SHARD_DIR, f'{alias}.sqlite3'),
+        }
+    return alias
+
+
+def shard_aliases(count=None):
+    """Every database holding per-user rows: the shards, or just ``default`` when unsharded"""
+    count = shard_count() if count is None else count
+    return [shard_alias(index) for index in range(count)] or [DEFAULT_DB_ALIAS]
+
+
+def shard_for(user, count=None):
+    """Alias of the database holding ``user``'s rows (a user or a user id)"""
+    count = shard_count() if count is None else count
+    if not count:
+        return DEFAULT_DB_ALIAS
+    return shard_alias(getattr(user, 'pk', user) % count)
+
+
+def shards_for(user_ids):
+    """``{alias: [user_id, ...]}``, grouping ``user_ids`` by the shard they live on"""
+    grouped = defaultdict(list)
+    for user_id in user_ids:
+        grouped[shard_for(user_id)].append(user_id)
+    return grouped
+
+
+def scatter(fn, aliases=None):
+    """``[fn(alias), ...]`` for every shard (or ``aliases``), one thread per shard"""
+    aliases = shard_aliases() if aliases is None else list(aliases)
+    if len(aliases) == 1:
+        # no thread, so an unsharded caller still sees its own open transaction
+        return [fn(aliases[0])]
+
+    def run(alias):
+        try:
+            return fn(alias)
+        finally:
+            connections[alias].close()
+
+    with ThreadPoolExecutor(max_workers=len(aliases)) as pool:
+        return list(pool.map(run, aliases))
+
+
+def sharded_models():
+    return [apps.get_model(label) for label in SHARDED_MODELS]
+
+
+class UserShardedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """``user``'s rows, read from and written to their shard"""
+        return self.using(shard_for(user)).filter(user_id=getattr(user, 'pk', user))
+
+    def create(self, **kwargs):
+        if self._db is None:
+            # save() shows the router the new row, so it lands on its owner's shard
+            # (ModelSerializer.create and friends come through here)
+            obj = self.model(**kwargs)
+            obj.save(force_insert=True)
+            return obj
+        return super().create(**kwargs)
+
+
+class UserShardRouter:
+    """Sharded models go to their owner's shard, everything else to ``default``"""
+
+    def route(self, model, **hints):
+        if model._meta.label not in SHARDED_MODELS:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if isinstance(instance, get_user_model()):
+            return shard_for(instance.pk)
+        if getattr(instance, 'user_id', None) is not None:
+            return shard_for(instance.user_id)
+        raise ShardRoutingError(
+            f"{model._meta.label} rows live on their user's shard; query them with "
+            f".objects.for_user(user) or .using(shard_for(user))"
+        )
+
+    db_for_read = route
+    db_for_write = route
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # users live in default and are copied to their shard, so either side may be the copy
+        user_model = get_user_model()
+        if isinstance(obj1, user_model) or isinstance(obj2, user_model):
+            return True
+        return None
+
+
+def copy_user(user, alias=None):
+    """Bring the copy of ``user`` on their shard (or ``alias``) in line with the row in default"""
+    alias = alias or shard_for(user)
+    if alias == DEFAULT_DB_ALIAS:
+        return
+    model = user._meta.concrete_model
+    values = {field.attname: getattr(user, field.attname) for field in model._meta.concrete_fields}
+    # update / bulk_create rather than save(), so the user signals do not fire for the copy
+    if not model._base_manager.using(alias).filter(pk=user.pk).update(**values):
+        model._base_manager.using(alias).bulk_create([model(**values)])
+
+
+def delete_user_copy(user, alias=None):
+    """Remove the copy of ``user`` from their shard, and with it every row of theirs there"""
+    alias = alias or shard_for(user)
+    if alias != DEFAULT_DB_ALIAS:
+        user._meta.concrete_model._base_manager.using(alias).filter(pk=user.pk).delete()
+
+
+def highest_id_band(alias):
+    """The highest id band any sharded table on ``alias`` has reached"""
+    band = 0
+    for model in sharded_models():
+        highest = model._base_manager.using(alias).aggregate(highest=models.Max('pk'))['highest'] or 0
+        band = max(band, highest >> ID_BAND_BITS)
+    return band
+
+
+def reserve_id_band(alias, band):
+    """
+    Make ``alias`` hand out new primary keys from ``band`` upwards.
+    SQLite's AUTOINCREMENT continues from ``sqlite_sequence`` or the highest
+    stored id, whichever is larger, so this only ever moves a table forwards.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return
+    floor = band << ID_BAND_BITS
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            cursor.execute('UPDATE sqlite_sequence SET seq = MAX(seq, %s) WHERE name = %s', [floor, table])
+            if not cursor.rowcount:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, floor])
+
+
+def reserve_initial_id_band(using, **kwargs):
+    """``post_migrate`` hook: a freshly migrated ``shardK`` hands out ids from band K + 1"""
+    index = shard_index(using)
+    if index is not None:
+        reserve_id_band(using, index + 1)
+
+
+def _copy_rows(model, rows, alias):
+    # a raw insert, as loaddata does: ids and the auto_now / auto_now_add timestamps are kept as
+    # stored, and no signals fire, since the profile totals and rollups move along with the rows
+    fields = model._meta.concrete_fields
+    manager = model._base_manager.using(alias)
+    batch_size = max(connections[alias].ops.bulk_batch_size(fields, rows), 1)
+    for start in range(0, len(rows), batch_size):
+        manager._insert(rows[start:start + batch_size], fields=fields, using=alias, raw=True)
+
+
+def move_user(user, source, target):
+    """
+    Move every row of ``user``'s from ``source`` to ``target`` with its id unchanged.
+    The copy commits before the originals are deleted, and whatever an interrupted
+    run left on ``target`` is replaced, so a move can simply be run again.
+    Returns False when ``source`` holds nothing of the user's (e.g. already moved).
+    """
+    rows = {model: list(model._base_manager.using(source).filter(user_id=user.pk)) for model in sharded_models()}
+    if not any(rows.values()):
+        return False
+
+    with transaction.atomic(using=target):
+        copy_user(user, target)
+        for model, model_rows in rows.items():
+            model._base_manager.using(target).filter(user_id=user.pk)._raw_delete(target)
+            _copy_rows(model, model_rows, target)
+
+    with transaction.atomic(using=source):
+        for model in rows:
+            model._base_manager.using(source).filter(user_id=user.pk)._raw_delete(source)
+        if source != DEFAULT_DB_ALIAS:
+            user._meta.concrete_model._base_manager.using(source).filter(pk=user.pk)._raw_delete(source)
+    return True
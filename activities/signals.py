@@ -1,23 +1,66 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
 from .models import FitnessActivity, UserProfile, WorkoutGoal
+from . import jobs, rollups, sharding, stats
+from .ranking import rank_indexes
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
+def create_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    # the user's shard joins against its own copy of the row (a no-op when unsharded)
+    sharding.copy_user(instance)
     if created:
         UserProfile.objects.create(user=instance)
+    elif update_fields is None or {'username', 'email'} & set(update_fields):
+        # the profile response shows these, so cached copies must be retired
+        stats.bump_data_version([instance.pk])
+    if update_fields is None or 'username' in update_fields:
+        rank_indexes.set_username(instance.pk, instance.username)
+
+@receiver(post_delete, sender=User)
+def delete_user_copy(sender, instance, using, **kwargs):
+    # the cascade in default does not reach the shard, so drop the copy there and cascade from it
+    if using == DEFAULT_DB_ALIAS:
+        sharding.delete_user_copy(instance)
+
+@receiver(pre_save, sender=FitnessActivity)
+def remember_stored_activity(sender, instance, using, **kwargs):
+    # instances that were not loaded through the ORM (e.g. built with an explicit pk) have no snapshot yet
+    if instance.pk and instance._stored_snapshot is None:
+        stored = FitnessActivity.objects.using(using).filter(pk=instance.pk).first()
+        if stored is not None:
+            instance._stored_snapshot = stored._stored_snapshot
 
 @receiver(post_save, sender=FitnessActivity)
-def update_user_stats(sender, instance, created, **kwargs):
+def update_user_stats(sender, instance, created, update_fields=None, **kwargs):
+    previous = None if created else instance._stored_snapshot
+    # unsaved edits to other fields must not leak into the deltas
+    current = instance.saved_snapshot(None if created else update_fields)
+    stats.apply_activity_change(previous, current)
+    rollups.apply_activity_change(previous, current)
+    rank_indexes.apply_activity_change(previous, current)
+    instance._stored_snapshot = current
+
+    affected = {current.user_id}
+    if previous is not None:
+        affected.add(previous.user_id)
+    jobs.schedule(jobs.STREAK, affected)
+
     if created:
-        # Update user profile
-        if hasattr(instance.user, 'profile'):
-            instance.user.profile.update_stats()
-        
-        # Update all active goals for this user
-        active_goals = WorkoutGoal.objects.filter(user=instance.user, status='active')
-        for goal in active_goals:
-            goal.update_progress()
\ No newline at end of file
+        jobs.schedule(jobs.GOALS, [current.user_id])
+
+@receiver(post_delete, sender=FitnessActivity)
+def remove_user_stats(sender, instance, **kwargs):
+    stored = instance._stored_snapshot or instance.snapshot()
+    stats.apply_activity_change(stored, None)
+    rollups.apply_activity_change(stored, None)
+    rank_indexes.apply_activity_change(stored, None)
+    jobs.schedule(jobs.STREAK, [stored.user_id])
+
+@receiver(post_save, sender=WorkoutGoal)
+@receiver(post_delete, sender=WorkoutGoal)
+def goal_changed(sender, instance, **kwargs):
+    stats.bump_data_version([instance.user_id])
@@ -0,0 +1,122 @@
+"""
+Profile statistics engine.
+
+Activity writes shift the denormalised totals on ``UserProfile`` by a delta
+using ``F()`` expressions, so a write costs a constant number of queries no
+matter how much history the user has, and concurrent writers never overwrite
+each other's increments. ``rebuild_user_stats`` recomputes everything from the
+activity table and is the reconciliation path for rows written behind the
+signals' back (``bulk_create``, ``QuerySet.update``, raw SQL).
+
+Every one of these writes also bumps ``UserProfile.data_version`` in the same
+statement; the response cache keys on it (see ``caching``).
+"""
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import FitnessActivity, UserProfile
+from .sharding import shards_for
+from .streaks import compute_streak
+
+
+REBUILT_FIELDS = [
+    'total_calories_burned', 'total_workout_time', 'total_workouts', 'points', 'level',
+    'current_streak', 'longest_streak', 'last_activity',
+]
+
+
+def points_for(calories, workouts):
+    return (calories // 100) + workouts
+
+
+def level_for(points):
+    return (points // 100) + 1
+
+
+def bump_data_version(user_ids):
+    return sum(
+        UserProfile.objects.using(alias).filter(user_id__in=ids).update(data_version=F('data_version') + 1)
+        for alias, ids in shards_for(user_ids).items()
+    )
+
+
+def apply_stats_delta(user_id, calories=0, duration=0, workouts=0):
+    """
+    Shift a user's totals in one UPDATE; points and level are derived in the same statement.
+    Runs even for a zero delta (e.g. only the notes changed) so the data version still moves.
+    """
+    new_calories = F('total_calories_burned') + calories
+    new_workouts = F('total_workouts') + workouts
+    # integer columns, so "/" is integer division on the database side
+    new_points = new_calories / 100 + new_workouts
+
+    return UserProfile.objects.for_user(user_id).update(
+        total_calories_burned=new_calories,
+        total_workout_time=F('total_workout_time') + duration,
+        total_workouts=new_workouts,
+        points=new_points,
+        level=new_points / 100 + 1,
+        data_version=F('data_version') + 1,
+    )
+
+
+def apply_activity_change(old, new):
+    """
+    Apply the difference between two ``ActivitySnapshot``s to the owners' profiles.
+    ``old`` is None for a create and ``new`` is None for a delete.
+    """
+    if old is not None and new is not None and old.user_id == new.user_id:
+        apply_stats_delta(
+            new.user_id,
+            calories=new.calories_burned - old.calories_burned,
+            duration=new.duration - old.duration,
+        )
+        return
+
+    if old is not None:
+        apply_stats_delta(old.user_id, calories=-old.calories_burned, duration=-old.duration, workouts=-1)
+    if new is not None:
+        apply_stats_delta(new.user_id, calories=new.calories_burned, duration=new.duration, workouts=1)
+
+
+def refresh_streak(user_id):
+    """Recompute the streak fields, which cannot be expressed as a delta"""
+    from .ranking import rank_indexes
+
+    streak = compute_streak(user_id)
+    UserProfile.objects.for_user(user_id).update(
+        current_streak=streak.current,
+        longest_streak=Greatest(F('longest_streak'), streak.longest),
+        last_activity=streak.last_active_day,
+        data_version=F('data_version') + 1,
+    )
+    # the ranking endpoint reads streaks from the rank indexes
+    rank_indexes.set_streak(user_id, streak.current)
+
+
+def rebuild_user_stats(profile):
+    """Recompute every stats field on ``profile`` from scratch and save it"""
+    from .ranking import rank_indexes
+
+    totals = FitnessActivity.objects.for_user(profile.user_id).aggregate(
+        calories=Sum('calories_burned'),
+        duration=Sum('duration'),
+        workouts=Count('id'),
+    )
+
+    profile.total_calories_burned = totals['calories'] or 0
+    profile.total_workout_time = totals['duration'] or 0
+    profile.total_workouts = totals['workouts']
+    profile.points = points_for(profile.total_calories_burned, profile.total_workouts)
+    profile.level = level_for(profile.points)
+
+    streak = compute_streak(profile.user_id)
+    profile.current_streak = streak.current
+    profile.longest_streak = max(profile.longest_streak, streak.longest)
+    profile.last_activity = streak.last_active_day
+
+    # data_version is left out so a stale in-memory value can never move it backwards
+    profile.save(update_fields=REBUILT_FIELDS)
+    bump_data_version([profile.user_id])
+    rank_indexes.set_streak(profile.user_id, streak.current)
+    return profile
@@ -0,0 +1,98 @@
+"""
+Streak engine.
+
+All streaks are derived from the set of distinct days a user was active,
+read from the daily rollups in a single query (for one user or for everyone
+at once; one per shard when sharded), and then walked once in Python, so the cost is O(distinct days)
+with a constant number of queries. Profiles, goals and leaderboards all go through here.
+
+Rollup days are already in each user's own timezone, so "today" defaults to
+the user's local date as well.
+"""
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from itertools import chain
+
+from users.models import local_day
+
+from .models import DailyActivityRollup
+from .sharding import scatter, shards_for
+
+StreakResult = namedtuple('StreakResult', ['current', 'longest', 'last_active_day'])
+
+NO_STREAK = StreakResult(current=0, longest=0, last_active_day=None)
+
+
+def _shard_active_rows(alias, user_ids=None):
+    rollups = DailyActivityRollup.objects.using(alias)
+    if user_ids is not None:
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    return list(
+        rollups
+        .values_list('user_id', 'user__timezone', 'day')
+        .order_by('user_id', 'day')
+        .distinct()
+    )
+
+
+def _active_rows(user_ids=None, aliases=None):
+    # one query per shard; each user's days come back together and in order
+    if user_ids is None:
+        return chain.from_iterable(scatter(_shard_active_rows, aliases))
+    grouped = shards_for(user_ids)
+    return chain.from_iterable(scatter(lambda alias: _shard_active_rows(alias, grouped[alias]), grouped))
+
+
+def active_days(user_ids=None):
+    """Return ``{user_id: [day, ...]}`` with each user's distinct active days in ascending order"""
+    days = defaultdict(list)
+    for user_id, _, day in _active_rows(user_ids):
+        days[user_id].append(day)
+    return days
+
+
+def streak_from_days(days, today):
+    """
+    Work out the streaks from an ascending list of distinct days.
+    The current streak is the run of consecutive days ending today (0 if today has no activity).
+    """
+    if not days:
+        return NO_STREAK
+
+    longest = run = 1
+    current = 1 if days[0] == today else 0
+    for previous, day in zip(days, days[1:]):
+        run = run + 1 if day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        if day == today:
+            current = run
+
+    return StreakResult(current=current, longest=longest, last_active_day=days[-1])
+
+
+def compute_streak(user_id, today=None):
+    return compute_streaks([user_id], today)[user_id]
+
+
+def compute_streaks(user_ids=None, today=None, aliases=None):
+    """
+    Streaks for many users (everyone when ``user_ids`` is None) from one query.
+    Everyone's rollups are read from ``aliases`` when given (e.g. the analytics copy).
+    """
+    days, zones = defaultdict(list), {}
+    for user_id, zone, day in _active_rows(user_ids, aliases):
+        days[user_id].append(day)
+        zones[user_id] = zone
+
+    local_today = {}
+    if today is None:
+        local_today = {zone: local_day(zone) for zone in set(zones.values())}
+
+    return defaultdict(
+        lambda: NO_STREAK,
+        {
+            user_id: streak_from_days(user_days, today or local_today[zones[user_id]])
+            for user_id, user_days in days.items()
+        },
+    )
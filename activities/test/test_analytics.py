@@ -0,0 +1,124 @@
+import io
+import shutil
+import tempfile
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from users.models import CustomerRegister
+from ..analytics import ANALYTICS_DB, sync_analytics
+from ..leaderboard import build_snapshot
+from ..models import DailyActivityRollup, FitnessActivity, Leaderboard, UserProfile
+from .test_leaderboard import add_activity
+from .test_stats import make_user
+
+
+# default is the usual test database; the analytics database is a throwaway file registered
+# on the side, migrated once per class and restored from a copy before every test
+@override_settings(ANALYTICS_DATABASE='on', DATABASE_ROUTERS=['activities.analytics.AnalyticsRouter'])
+class AnalyticsDatabaseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.TemporaryDirectory()
+        cls.path = f'{cls.dir.name}/analytics.sqlite3'
+        connections.settings[ANALYTICS_DB] = {**connections.settings[DEFAULT_DB_ALIAS], 'NAME': cls.path}
+        call_command('migrate', database=ANALYTICS_DB, verbosity=0)
+        connections[ANALYTICS_DB].close()
+        shutil.copy(cls.path, cls.path + '.migrated')
+
+    @classmethod
+    def tearDownClass(cls):
+        connections[ANALYTICS_DB].close()
+        del connections[ANALYTICS_DB]
+        del connections.settings[ANALYTICS_DB]
+        cls.dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        connections[ANALYTICS_DB].close()
+        shutil.copy(self.path + '.migrated', self.path)
+        self.users = [make_user(f'user{i}@example.com', f'user{i}') for i in range(3)]
+        for user, calories in zip(self.users, [900, 450, 100]):
+            add_activity(user, calories)
+
+    def copied(self, model, user):
+        return model.objects.using(ANALYTICS_DB).filter(user=user)
+
+    def test_sync_copies_only_users_whose_data_changed(self):
+        self.assertEqual(sync_analytics(), 3)
+        for user in self.users:
+            self.assertEqual(
+                self.copied(UserProfile, user).get().total_calories_burned,
+                UserProfile.objects.get(user=user).total_calories_burned,
+            )
+            self.assertEqual(self.copied(DailyActivityRollup, user).count(), 1)
+            self.assertTrue(CustomerRegister.objects.using(ANALYTICS_DB).filter(pk=user.pk).exists())
+        self.assertEqual(sync_analytics(), 0)
+
+        add_activity(self.users[1], 300, days_ago=1)
+        self.assertEqual(sync_analytics(), 1)
+        self.assertEqual(self.copied(UserProfile, self.users[1]).get().total_calories_burned, 750)
+        self.assertEqual(self.copied(DailyActivityRollup, self.users[1]).count(), 2)
+
+    def test_sync_removes_what_is_gone(self):
+        sync_analytics()
+        FitnessActivity.objects.get(user=self.users[0]).delete()
+        self.users[2].delete()
+
+        self.assertEqual(sync_analytics(), 2)
+        self.assertFalse(self.copied(DailyActivityRollup, self.users[0]).exists())
+        self.assertEqual(self.copied(UserProfile, self.users[0]).get().total_workouts, 0)
+        self.assertFalse(CustomerRegister.objects.using(ANALYTICS_DB).filter(pk=self.users[2].pk).exists())
+        self.assertFalse(UserProfile.objects.using(ANALYTICS_DB).filter(user_id=self.users[2].pk).exists())
+
+    def test_sync_survives_usernames_and_emails_changing_hands(self):
+        sync_analytics()
+        first, second = self.users[0], self.users[1]
+        # a queryset update skips the signals, so the first user's data_version and copy stay as they were
+        CustomerRegister.objects.filter(pk=first.pk).update(
+            username='renamed', username_normalized='renamed',
+            email='renamed@example.com', email_normalized='renamed@example.com',
+        )
+        second.username, second.email = 'user0', 'user0@example.com'
+        second.save()
+
+        self.assertEqual(sync_analytics(), 1)
+        copies = CustomerRegister.objects.using(ANALYTICS_DB)
+        self.assertEqual(copies.get(pk=second.pk).username_normalized, 'user0')
+        self.assertEqual(copies.get(pk=first.pk).username_normalized, 'renamed')
+        self.assertEqual(copies.get(pk=first.pk).email, 'renamed@example.com')
+        self.assertEqual(sync_analytics(), 0)
+
+    def test_build_reads_and_writes_only_the_analytics_database(self):
+        sync_analytics()
+        # not synced yet, so the snapshot must not see it
+        add_activity(self.users[2], 5000)
+
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            snapshot = build_snapshot('weekly')
+        self.assertEqual(len(primary), 0)
+
+        self.assertFalse(Leaderboard.objects.using(DEFAULT_DB_ALIAS).exists())
+        self.assertEqual(
+            [(entry.user_id, entry.rank, entry.points) for entry in snapshot.entries.all()],
+            [(self.users[0].pk, 1, 10), (self.users[1].pk, 2, 5), (self.users[2].pk, 3, 2)],
+        )
+
+    def test_leaderboard_endpoint_serves_the_analytics_snapshot(self):
+        stdout = io.StringIO()
+        call_command('build_leaderboards', '--period', 'weekly', stdout=stdout)
+        self.assertIn('Synced 3 user(s)', stdout.getvalue())
+
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.get(reverse('leaderboard'), {'period': 'weekly'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(entry['username'], entry['rank']) for entry in response.data['entries']],
+            [('user0', 1), ('user1', 2), ('user2', 3)],
+        )
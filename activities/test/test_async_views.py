@@ -0,0 +1,105 @@
+import json
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.test import AsyncRequestFactory
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .. import async_views
+from ..caching import cache_counts, reset_cache_counts
+from ..leaderboard import build_snapshot
+from ..models import FitnessActivity
+from ..ranking import RankIndex, rank_indexes
+from .test_stats import make_user
+
+
+class AsyncReadViewTest(APITestCase):
+    """The async views answer exactly like the DRF views they stand in for"""
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_counts()
+        self.user = make_user()
+        self.other = make_user('other@example.com', 'other')
+        mock.patch.dict(rank_indexes.indexes, {'weekly': RankIndex('weekly')}).start()
+        self.addCleanup(mock.patch.stopall)
+        with self.captureOnCommitCallbacks(execute=True):
+            for user, calories in [(self.user, 300), (self.user, 200), (self.other, 900)]:
+                FitnessActivity.objects.create(
+                    user=user, activity_type='running', duration=30, calories_burned=calories, distance=5.0
+                )
+        build_snapshot('weekly')
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        self.factory = AsyncRequestFactory()
+
+    async def call(self, view, params=None, **headers):
+        headers.setdefault('Authorization', f'Bearer {self.token}')
+        return await view(self.factory.get('/', params or {}, headers=headers))
+
+    async def assert_same_as_sync(self, view, url_name, params=None):
+        expected = await sync_to_async(self.client.get)(reverse(url_name), params or {})
+        cache.clear()
+        response = await self.call(view, params)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        return response
+
+    async def test_bodies_match_the_sync_views(self):
+        await self.assert_same_as_sync(async_views.activity_metrics, 'activity-metrics', {'period': 'week'})
+        await self.assert_same_as_sync(async_views.recent_activities, 'recent-activities', {'limit': 1})
+        await self.assert_same_as_sync(async_views.leaderboard, 'leaderboard')
+        await self.assert_same_as_sync(async_views.my_ranking, 'my-ranking', {'around': 1})
+        await self.assert_same_as_sync(async_views.user_profile, 'user-profile')
+
+    async def test_error_responses_match(self):
+        await self.assert_same_as_sync(async_views.leaderboard, 'leaderboard', {'period': 'monthly'})
+        await self.assert_same_as_sync(async_views.my_ranking, 'my-ranking', {'period': 'hourly'})
+        await self.assert_same_as_sync(async_views.my_ranking, 'my-ranking', {'around': 'x'})
+
+    async def test_authentication_is_required(self):
+        response = await self.call(async_views.activity_metrics, Authorization='')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+        response = await self.call(async_views.activity_metrics, Authorization='Bearer not-a-token')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(json.loads(response.content)['code'], 'token_not_valid')
+
+    async def test_session_login_is_accepted_like_the_sync_views(self):
+        self.client.credentials()
+        await sync_to_async(self.client.force_login)(self.user)
+        expected = await sync_to_async(self.client.get)(reverse('activity-metrics'))
+        cache.clear()
+
+        request = self.factory.get('/')
+        request.session = SessionStore(self.client.cookies[settings.SESSION_COOKIE_NAME].value)
+        response = await async_views.activity_metrics(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_conditional_get_and_response_cache(self):
+        first = await self.call(async_views.activity_metrics)
+        second = await self.call(async_views.activity_metrics)
+        self.assertEqual(cache_counts()['metrics'], {'hits': 1, 'misses': 1})
+        self.assertEqual(first.content, second.content)
+
+        response = await self.call(async_views.activity_metrics, **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+        await FitnessActivity.objects.acreate(
+            user=self.user, activity_type='yoga', duration=10, calories_burned=50, distance=0.0
+        )
+        response = await self.call(async_views.activity_metrics, **{'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['total_calories'], 550)
+
+    async def test_only_reads_are_served(self):
+        request = self.factory.post('/', {}, headers={'Authorization': f'Bearer {self.token}'})
+        response = await async_views.user_profile(request)
+        self.assertEqual(response.status_code, 405)
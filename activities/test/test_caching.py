@@ -0,0 +1,90 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..caching import cache_counts, reset_cache_counts
+from ..models import FitnessActivity, UserProfile, WorkoutGoal
+from .test_stats import make_user
+
+
+class ResponseCacheTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_cache_counts()
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def add_activity(self, calories=300):
+        return FitnessActivity.objects.create(
+            user=self.user, activity_type='running', duration=30, calories_burned=calories, distance=5.0
+        )
+
+    def test_repeat_reads_are_served_from_cache(self):
+        self.add_activity()
+        url = reverse('activity-metrics')
+        first = self.client.get(url, {'period': 'week'})
+        with self.assertNumQueries(1):  # just the data version
+            second = self.client.get(url, {'period': 'week'})
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(cache_counts()['metrics'], {'hits': 1, 'misses': 1})
+
+    def test_query_params_are_part_of_the_key(self):
+        self.add_activity()
+        url = reverse('recent-activities')
+        self.assertEqual(len(self.client.get(url, {'limit': 1}).data['recent_activities']), 1)
+        self.add_activity()
+        self.assertEqual(len(self.client.get(url, {'limit': 5}).data['recent_activities']), 2)
+
+    def test_activity_writes_invalidate(self):
+        activity = self.add_activity()
+        url = reverse('activity-metrics')
+        self.assertEqual(self.client.get(url).data['total_calories'], 300)
+
+        self.add_activity(calories=200)
+        self.assertEqual(self.client.get(url).data['total_calories'], 500)
+
+        activity.notes = 'felt great'
+        activity.save()
+        recent = self.client.get(reverse('recent-activities'))
+        self.assertIn('felt great', [row['notes'] for row in recent.data['recent_activities']])
+
+        activity.delete()
+        self.assertEqual(self.client.get(url).data['total_calories'], 200)
+        self.assertEqual(cache_counts()['metrics']['hits'], 0)
+
+    def test_goal_writes_bump_the_version(self):
+        before = UserProfile.objects.get(user=self.user).data_version
+        goal = WorkoutGoal.objects.create(
+            user=self.user, title='Move', goal_type='frequency', duration_type='weekly',
+            target_value=3, unit='workouts', end_date=timezone.localdate() + timedelta(days=7)
+        )
+        goal.delete()
+        self.assertEqual(UserProfile.objects.get(user=self.user).data_version, before + 2)
+
+    def test_profile_refresh_bypasses_cache(self):
+        url = reverse('user-profile')
+        self.client.get(url)
+        self.client.get(url, {'refresh': 1})
+        self.assertEqual(cache_counts()['profile'], {'hits': 0, 'misses': 1})
+
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(url).data['username'], 'renamed')
+
+    def test_users_do_not_share_entries(self):
+        self.add_activity()
+        url = reverse('activity-metrics')
+        self.client.get(url)
+        self.client.force_authenticate(make_user('other@example.com', 'other'))
+        self.assertEqual(self.client.get(url).data['activity_count'], 0)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('activity-trends'))
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.data['trends'], {'hits': 0, 'misses': 1})
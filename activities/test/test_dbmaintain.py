@@ -0,0 +1,101 @@
+import io
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.db import OperationalError, connections, transaction
+from django.test import SimpleTestCase
+
+from fitness_tracker.sqlite3.base import DatabaseWrapper
+
+
+class TunedSQLiteTest(SimpleTestCase):
+    """The tuned backend, against a throwaway database file registered under its own aliases"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'tuned.sqlite3')
+        self.aliases = []
+
+    def tearDown(self):
+        for alias in self.aliases:
+            connections[alias].close()
+            del connections[alias]
+        self.dir.cleanup()
+
+    def connect(self, alias, **options):
+        settings_dict = {**connections['default'].settings_dict, 'NAME': self.path, 'OPTIONS': options}
+        connections[alias] = DatabaseWrapper(settings_dict, alias)
+        self.aliases.append(alias)
+        return connections[alias]
+
+    def pragma(self, connection, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        connection = self.connect('tuned', pragmas={'busy_timeout': 1234})
+        self.assertEqual(self.pragma(connection, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(connection, 'busy_timeout'), 1234)
+        self.assertEqual(self.pragma(connection, 'synchronous'), 1)   # NORMAL
+        self.assertEqual(self.pragma(connection, 'temp_store'), 2)    # MEMORY
+        self.assertEqual(self.pragma(connection, 'auto_vacuum'), 2)   # INCREMENTAL
+        self.assertEqual(self.pragma(connection, 'foreign_keys'), 1)  # Django's own pragmas still run
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        first = self.connect('first')
+        second = self.connect('second', pragmas={'busy_timeout': 50})
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value integer)')
+
+        with transaction.atomic(using='first'):
+            # no write yet, but BEGIN IMMEDIATE already holds the lock
+            with self.assertRaises(OperationalError):
+                with second.cursor() as cursor:
+                    cursor.execute('INSERT INTO counter VALUES (1)')
+
+    def test_readers_are_not_blocked_by_a_writer(self):
+        writer = self.connect('writer')
+        reader = self.connect('reader', pragmas={'busy_timeout': 50})
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (value integer)')
+            cursor.execute('INSERT INTO counter VALUES (1)')
+
+        with transaction.atomic(using='writer'):
+            with writer.cursor() as cursor:
+                cursor.execute('UPDATE counter SET value = 2')
+            with reader.cursor() as cursor:
+                cursor.execute('SELECT value FROM counter')
+                self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_dbmaintain_releases_free_pages(self):
+        connection = self.connect('maintained')
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE blob (data text)')
+            cursor.executemany('INSERT INTO blob VALUES (?)', [('x' * 4000,)] * 200)
+            cursor.execute('DELETE FROM blob')
+        self.assertGreater(self.pragma(connection, 'freelist_count'), 0)
+
+        out = io.StringIO()
+        call_command('dbmaintain', database='maintained', stdout=out)
+        self.assertEqual(self.pragma(connection, 'freelist_count'), 0)
+        self.assertIn('auto_vacuum=incremental, journal_mode=wal', out.getvalue())
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_dbmaintain_converts_old_databases_with_vacuum(self):
+        connection = self.connect('legacy', pragmas={'auto_vacuum': 'NONE'})
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE blob (data text)')
+            cursor.executemany('INSERT INTO blob VALUES (?)', [('x' * 4000,)] * 50)
+            cursor.execute('DELETE FROM blob')
+
+        out = io.StringIO()
+        call_command('dbmaintain', database='legacy', stdout=out)
+        self.assertIn('run once with --vacuum', out.getvalue())
+
+        call_command('dbmaintain', database='legacy', vacuum=True, stdout=io.StringIO())
+        self.assertEqual(self.pragma(connection, 'auto_vacuum'), 2)
+        self.assertEqual(self.pragma(connection, 'freelist_count'), 0)
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..leaderboard import build_snapshot
+from ..models import FitnessActivity, WorkoutGoal
+from .test_stats import make_user
+
+
+class ConditionalGetTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        self.activity = FitnessActivity.objects.create(
+            user=self.user, activity_type='running', duration=30, calories_burned=300, distance=5.0
+        )
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_matching_etag_is_not_modified_without_aggregates(self):
+        url = reverse('activity-metrics')
+        first = self.client.get(url, {'period': 'week'})
+        self.assertEqual(first.status_code, 200)
+        cache.clear()
+
+        with self.assertNumQueries(1):  # just the data version
+            response = self.revalidate(url, first['ETag'], period='week')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_writes_change_the_etag(self):
+        url = reverse('activity-history')
+        etag = self.client.get(url)['ETag']
+        FitnessActivity.objects.create(
+            user=self.user, activity_type='yoga', duration=10, calories_burned=50, distance=0.0
+        )
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_varies_with_query_and_format(self):
+        url = reverse('activity-trends')
+        weekly = self.client.get(url, {'trend_type': 'weekly'})['ETag']
+        monthly = self.client.get(url, {'trend_type': 'monthly'})['ETag']
+        self.assertNotEqual(weekly, monthly)
+
+        export = reverse('activity-export')
+        self.assertNotEqual(
+            self.client.get(export, {'format': 'csv'})['ETag'],
+            self.client.get(export, {'format': 'ndjson'})['ETag'],
+        )
+
+    def test_list_and_detail_views(self):
+        goal = WorkoutGoal.objects.create(
+            user=self.user, title='Move', goal_type='frequency', duration_type='weekly',
+            target_value=3, unit='workouts', end_date=timezone.localdate() + timedelta(days=7)
+        )
+        for url in [
+            reverse('activity-list'),
+            reverse('activity-detail', args=[self.activity.pk]),
+            reverse('goal-list-create'),
+            reverse('goal-detail', args=[goal.pk]),
+            reverse('recent-activities'),
+            reverse('user-profile'),
+        ]:
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.revalidate(url, etag).status_code, 304, url)
+
+    def test_other_users_etags_do_not_match(self):
+        url = reverse('activity-list')
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(make_user('other@example.com', 'other'))
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_profile_refresh_is_never_short_circuited(self):
+        url = reverse('user-profile')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.revalidate(url, etag, refresh=1).status_code, 200)
+
+    def test_leaderboard_follows_the_published_snapshot(self):
+        build_snapshot('weekly')
+        url = reverse('leaderboard')
+        etag = self.client.get(url, {'period': 'weekly'})['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(url, etag, period='weekly').status_code, 304)
+
+        build_snapshot('weekly')
+        self.assertEqual(self.revalidate(url, etag, period='weekly').status_code, 200)
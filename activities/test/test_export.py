@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..export import EXPORT_FIELDS
+from ..models import FitnessActivity
+from .test_stats import make_user
+
+
+class ExportTest(APITestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        base = timezone.make_aware(datetime(2025, 5, 10, 12, 0))
+        for i, activity_type in enumerate(['running', 'yoga', 'running', 'cycling']):
+            FitnessActivity.objects.create(
+                user=self.user, activity_type=activity_type, duration=30 + i,
+                calories_burned=200, distance=3.0, date=base - timedelta(days=i), notes=f'note, {i}'
+            )
+        FitnessActivity.objects.create(user=make_user('other@example.com', 'other'), activity_type='running',
+                                       duration=5, calories_burned=50, distance=1.0)
+        self.url = reverse('activity-export')
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('activities.csv', response['Content-Disposition'])
+
+        rows = list(csv.reader(io.StringIO(self.body(response))))
+        self.assertEqual(rows[0], EXPORT_FIELDS)
+        self.assertEqual([row[1] for row in rows[1:]], ['running', 'yoga', 'running', 'cycling'])
+        self.assertEqual(rows[1][EXPORT_FIELDS.index('notes')], 'note, 0')
+
+    def test_ndjson_with_filters(self):
+        response = self.client.get(self.url, {
+            'format': 'ndjson', 'activity_type': 'running',
+            'start_date': '2025-05-08', 'end_date': '2025-05-10',
+        })
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual([row['duration'] for row in rows], [30, 32])
+        self.assertTrue(rows[0]['date'].startswith('2025-05-10'))
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(self.url, {'format': 'json'}).status_code, 400)
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'format must be csv or ndjson'})
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url, {'format': 'csv'}).status_code, 401)
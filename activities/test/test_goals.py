@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..goals import update_active_goals
+from ..models import FitnessActivity, WorkoutGoal
+from .test_stats import make_user
+
+
+class GoalEvaluatorTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.today = timezone.localdate()
+        now = timezone.now()
+        for days_ago, activity_type in [(0, 'running'), (0, 'yoga'), (1, 'running'), (40, 'running')]:
+            FitnessActivity.objects.create(
+                user=self.user, activity_type=activity_type, duration=30, calories_burned=300,
+                distance=5.0, date=now - timedelta(days=days_ago)
+            )
+
+    def make_goal(self, goal_type, duration_type='yearly', target=10000, **kwargs):
+        return WorkoutGoal.objects.create(
+            user=self.user, title=goal_type, goal_type=goal_type, duration_type=duration_type,
+            target_value=target, unit='x', end_date=kwargs.pop('end_date', self.today + timedelta(days=30)),
+            **kwargs
+        )
+
+    def expected(self, goal):
+        start_date, end_date = goal.period_bounds()
+        activities = FitnessActivity.objects.filter(
+            user=self.user, activity_day__gte=start_date, activity_day__lte=end_date
+        )
+        if goal.activity_type:
+            activities = activities.filter(activity_type=goal.activity_type)
+        return activities
+
+    def test_matches_direct_aggregates(self):
+        goals = [
+            self.make_goal('duration', 'daily'),
+            self.make_goal('calories', 'weekly'),
+            self.make_goal('frequency', 'monthly', activity_type='running'),
+            self.make_goal('distance', 'yearly'),
+            self.make_goal('frequency', 'yearly', activity_type='yoga'),
+        ]
+        update_active_goals(self.user.pk)
+
+        for goal in goals:
+            goal.refresh_from_db()
+            activities = self.expected(goal)
+            value = {
+                'duration': 30 * activities.count(),
+                'calories': 300 * activities.count(),
+                'frequency': activities.count(),
+                'distance': 5.0 * activities.count(),
+            }[goal.goal_type]
+            self.assertAlmostEqual(goal.current_value, value, msg=goal.title)
+
+    def test_streak_and_status(self):
+        streak = self.make_goal('streak', target=2)
+        failing = self.make_goal('frequency', 'daily', target=50, end_date=self.today - timedelta(days=1))
+        update_active_goals(self.user.pk)
+
+        streak.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual((streak.current_value, streak.status), (2, 'completed'))
+        self.assertEqual((failing.current_value, failing.status), (2, 'failed'))
+
+    def test_query_count_does_not_grow_with_goal_count(self):
+        def queries_for_goals():
+            WorkoutGoal.objects.update(current_value=0)
+            with CaptureQueriesContext(connection) as queries:
+                update_active_goals(self.user.pk)
+            return len(queries)
+
+        self.make_goal('duration', 'daily')
+        self.make_goal('streak')
+        few = queries_for_goals()
+        for goal_type in ('calories', 'frequency', 'distance', 'duration'):
+            for duration_type in ('daily', 'weekly', 'monthly', 'yearly'):
+                self.make_goal(goal_type, duration_type)
+        self.make_goal('streak')
+        self.assertEqual(few, queries_for_goals())
+
+    def test_unchanged_goals_are_not_written(self):
+        self.make_goal('duration')
+        update_active_goals(self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            changed = update_active_goals(self.user.pk)
+        self.assertEqual(changed, [])
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE')])
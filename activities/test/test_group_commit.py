@@ -0,0 +1,108 @@
+import threading
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .. import group_commit
+from ..group_commit import ActivityWriter
+from ..models import DailyActivityRollup, FitnessActivity, UserProfile
+from ..stats import rebuild_user_stats
+from .test_stats import STAT_FIELDS, make_user
+
+
+def activity(user, **fields):
+    return FitnessActivity(**{
+        'user': user, 'activity_type': 'running', 'duration': 30, 'calories_burned': 300, 'distance': 5.0,
+        **fields,
+    })
+
+
+# the writer commits on its own thread and connection, so the rows have to really commit
+class GroupCommitTest(TransactionTestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.writer = ActivityWriter()
+
+    def submit_concurrently(self, activities):
+        results = [None] * len(activities)
+
+        def submit(i):
+            try:
+                results[i] = self.writer.submit(activities[i])
+            except Exception as exc:
+                results[i] = exc
+
+        threads = [threading.Thread(target=submit, args=(i,)) for i in range(len(activities))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @override_settings(ACTIVITY_GROUP_COMMIT_WINDOW_MS=200)
+    def test_concurrent_inserts_share_a_commit(self):
+        other = make_user('other@example.com', 'other')
+        with mock.patch.object(self.writer, 'commit', wraps=self.writer.commit) as commit:
+            saved = self.submit_concurrently([activity(self.user) for _ in range(6)] + [activity(other)])
+        self.assertEqual(commit.call_count, 1)
+        self.assertTrue(all(row.pk for row in saved))
+
+        # derived state matches a from-scratch rebuild, as with any other write path
+        for user, count in [(self.user, 6), (other, 1)]:
+            profile = UserProfile.objects.get(user=user)
+            self.assertEqual(profile.total_workouts, count)
+            live = [getattr(profile, field) for field in STAT_FIELDS]
+            rebuild_user_stats(profile)
+            self.assertEqual(live, [getattr(profile, field) for field in STAT_FIELDS])
+        self.assertEqual(DailyActivityRollup.objects.get(user=self.user).activity_count, 6)
+
+    @override_settings(ACTIVITY_GROUP_COMMIT_WINDOW_MS=200)
+    def test_a_bad_row_only_fails_its_own_request(self):
+        results = self.submit_concurrently([activity(self.user), activity(self.user, duration=None), activity(self.user)])
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertTrue(results[0].pk and results[2].pk)
+        self.assertEqual(FitnessActivity.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_workouts, 2)
+
+    @override_settings(ACTIVITY_GROUP_COMMIT=True)
+    def test_post_goes_through_the_writer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(group_commit, 'writer', self.writer):
+            response = client.post(reverse('activity-list'), {
+                'activity_type': 'cycling', 'duration': 45, 'calories_burned': 400, 'distance': 12.0,
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['id'], FitnessActivity.objects.get(user=self.user).pk)
+        self.assertEqual(response.data['user'], str(self.user))
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_calories_burned, 400)
+
+    @override_settings(ACTIVITY_GROUP_COMMIT=True)
+    def test_a_timed_out_request_withdraws_its_activity(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        # nothing drains the queue until the request has given up
+        with mock.patch.object(group_commit, 'writer', self.writer), \
+                mock.patch.object(group_commit, 'SUBMIT_TIMEOUT', 0.05), \
+                mock.patch.object(self.writer, 'ensure_running'):
+            response = client.post(reverse('activity-list'), {
+                'activity_type': 'cycling', 'duration': 45, 'calories_burned': 400, 'distance': 12.0,
+            }, format='json')
+        self.assertEqual(response.status_code, 503)
+
+        # the retry is the only activity written
+        self.assertTrue(self.writer.submit(activity(self.user)).pk)
+        self.assertEqual(FitnessActivity.objects.filter(user=self.user).count(), 1)
+
+    def test_a_failing_batch_resolves_its_requests_and_keeps_the_writer_running(self):
+        with mock.patch.object(group_commit, 'shard_for', side_effect=RuntimeError('boom')), \
+                self.assertLogs('activities.group_commit', 'ERROR') as logs:
+            with self.assertRaisesMessage(RuntimeError, 'boom'):
+                self.writer.submit(activity(self.user))
+        self.assertEqual(logs.records[0].getMessage(), "activity writer failed on a batch of 1")
+        self.assertIsInstance(logs.records[0].exc_info[1], RuntimeError)
+        self.assertTrue(self.writer.submit(activity(self.user)).pk)
+        self.assertEqual(FitnessActivity.objects.filter(user=self.user).count(), 1)
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+from django.db.models import Q
+from django.test import TestCase
+from django.utils import timezone
+
+from ..leaderboard import published_snapshots
+from ..models import DailyActivityRollup, FitnessActivity, LeaderboardEntry, WorkoutGoal
+from ..views import filter_history
+from .test_stats import make_user
+
+
+class QueryPlanTest(TestCase):
+    """The per-user read paths must be answered from an index, never a full table scan"""
+
+    def setUp(self):
+        self.user = make_user()
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        scans = [line for line in plan.splitlines() if ' SCAN ' in f' {line} ']
+        self.assertFalse(scans, plan)
+        self.assertIn('USING', plan)
+
+    def test_activity_day_is_stored(self):
+        moment = timezone.now() - timedelta(days=3)
+        activity = FitnessActivity.objects.create(
+            user=self.user, activity_type='running', duration=30, calories_burned=100,
+            distance=5.0, date=moment
+        )
+        self.assertEqual(activity.activity_day, timezone.localdate(moment))
+
+        activity.date = moment - timedelta(days=2)
+        activity.save(update_fields=['date'])
+        activity.refresh_from_db()
+        self.assertEqual(activity.activity_day, timezone.localdate(moment) - timedelta(days=2))
+
+    def test_history_filters(self):
+        activities = FitnessActivity.objects.filter(user=self.user)
+        self.assertUsesIndex(filter_history(activities, {'start_date': '2026-01-01', 'end_date': '2026-02-01'}))
+        self.assertUsesIndex(filter_history(activities, {'start_date': '2026-01-01', 'activity_type': 'yoga'}))
+
+    def test_activity_list_pages(self):
+        now = timezone.now()
+        activities = FitnessActivity.objects.filter(user=self.user).order_by('-date', '-id')
+        self.assertUsesIndex(activities[:21])
+        self.assertUsesIndex(activities.filter(Q(date__lt=now) | Q(date=now, id__lt=10))[:21])
+
+    def test_active_goals(self):
+        self.assertUsesIndex(WorkoutGoal.objects.filter(user=self.user, status='active'))
+
+    def test_rollups(self):
+        self.assertUsesIndex(DailyActivityRollup.objects.filter(
+            user=self.user, day__gte=date(2026, 1, 1), day__lte=date(2026, 2, 1)
+        ))
+
+    def test_leaderboard_reads(self):
+        self.assertUsesIndex(published_snapshots('weekly')[:1])
+        self.assertUsesIndex(LeaderboardEntry.objects.filter(leaderboard_id__in=[1]))
@@ -0,0 +1,99 @@
+import json
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..models import DailyActivityRollup, FitnessActivity, UserProfile, WorkoutGoal
+from ..rollups import rebuild_rollups
+from ..stats import rebuild_user_stats
+from .test_stats import STAT_FIELDS, make_user
+
+
+def payload(count, days=1):
+    now = timezone.now()
+    return [
+        {
+            'activity_type': 'running' if i % 2 else 'yoga',
+            'duration': 10 + i,
+            'calories_burned': 100 + i,
+            'distance': 1.5,
+            'date': (now - timedelta(days=i % days)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+class BatchIngestTest(APITestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('activity-batch')
+
+    def test_json_array(self):
+        response = self.client.post(self.url, payload(12, days=4), format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 12)
+        self.assertEqual(FitnessActivity.objects.filter(user=self.user).count(), 12)
+
+        profile = UserProfile.objects.get(user=self.user)
+        rebuilt = rebuild_user_stats(UserProfile.objects.get(user=self.user))
+        for field in STAT_FIELDS:
+            self.assertEqual(getattr(profile, field), getattr(rebuilt, field), field)
+
+        rollups = sorted(DailyActivityRollup.objects.values_list('day', 'activity_type', 'activity_count', 'total_duration'))
+        rebuild_rollups()
+        self.assertEqual(rollups, sorted(DailyActivityRollup.objects.values_list('day', 'activity_type', 'activity_count', 'total_duration')))
+
+    def test_ndjson(self):
+        body = '\n'.join(json.dumps(item) for item in payload(3)) + '\n'
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+
+    def test_bad_ndjson_line(self):
+        response = self.client.post(self.url, '{"duration": 1}\n{oops', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('line 2', str(response.data))
+
+    def test_per_item_errors_reject_the_whole_batch(self):
+        items = payload(3)
+        items[1]['activity_type'] = 'teleporting'
+        del items[2]['duration']
+
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('activity_type', response.data['errors'][0]['errors'])
+        self.assertFalse(FitnessActivity.objects.exists())
+
+    def test_requires_a_list(self):
+        response = self.client.post(self.url, payload(1)[0], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_calories_are_estimated(self):
+        items = payload(1)
+        items[0]['calories_burned'] = 0
+        self.client.post(self.url, items, format='json')
+        self.assertGreater(FitnessActivity.objects.get().calories_burned, 0)
+
+    def test_goals_are_evaluated_once(self):
+        goal = WorkoutGoal.objects.create(
+            user=self.user, title='Move', goal_type='frequency', duration_type='weekly',
+            target_value=100, unit='workouts', end_date=timezone.localdate() + timedelta(days=7)
+        )
+        self.client.post(self.url, payload(5), format='json')
+        goal.refresh_from_db()
+        self.assertEqual(goal.current_value, 5)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def queries_for(count):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(self.url, [dict(item, activity_type='running') for item in payload(count)], format='json')
+            return len(queries)
+
+        queries_for(1)  # creates today's rollup row
+        self.assertEqual(queries_for(5), queries_for(60))
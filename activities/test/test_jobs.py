@@ -0,0 +1,110 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .. import jobs
+from ..models import ActivityJob, FitnessActivity, UserProfile, WorkoutGoal
+from .test_stats import make_user
+
+
+@override_settings(ACTIVITY_JOBS_INLINE=False, ACTIVITY_JOBS_COALESCE_SECONDS=5)
+class DeferredJobsTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.goal = WorkoutGoal.objects.create(
+            user=self.user, title='Move', goal_type='frequency', duration_type='weekly',
+            target_value=100, unit='workouts', end_date=timezone.localdate() + timedelta(days=7)
+        )
+
+    def add_activity(self, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FitnessActivity.objects.create(
+                user=self.user, activity_type='running', duration=30, calories_burned=300,
+                distance=5.0, date=timezone.now() - timedelta(days=days_ago)
+            )
+
+    def later(self):
+        return timezone.now() + timedelta(minutes=1)
+
+    def test_writes_collapse_into_one_job_per_kind(self):
+        for days_ago in range(3):
+            self.add_activity(days_ago)
+
+        self.assertEqual(
+            sorted(ActivityJob.objects.values_list('user_id', 'kind')),
+            [(self.user.pk, 'goals'), (self.user.pk, 'streak')]
+        )
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.current_streak, 0)
+        self.assertEqual(profile.total_workouts, 3)  # deltas are still applied in the request
+
+        self.assertEqual(jobs.run_due_jobs(now=self.later()), 2)
+        profile.refresh_from_db()
+        self.goal.refresh_from_db()
+        self.assertEqual(profile.current_streak, 3)
+        self.assertEqual(self.goal.current_value, FitnessActivity.objects.filter(
+            activity_day__gte=self.goal.period_bounds()[0]).count())
+        self.assertFalse(ActivityJob.objects.exists())
+
+    def test_coalescing_keeps_the_first_run_time(self):
+        self.add_activity()
+        first = ActivityJob.objects.get(kind='streak').run_after
+        jobs.enqueue(jobs.STREAK, [self.user.pk], delay=600)
+        self.assertEqual(ActivityJob.objects.get(kind='streak').run_after, first)
+
+    def test_jobs_wait_for_the_window(self):
+        self.add_activity()
+        self.assertEqual(jobs.run_due_jobs(), 0)
+        self.assertEqual(ActivityJob.objects.count(), 2)
+
+    def test_nothing_is_queued_without_a_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            FitnessActivity.objects.create(
+                user=self.user, activity_type='running', duration=30, calories_burned=300, distance=5.0
+            )
+        self.assertFalse(ActivityJob.objects.exists())
+
+    def test_failed_jobs_are_retried_later(self):
+        self.add_activity()
+        broken = mock.Mock(side_effect=RuntimeError('boom'))
+        with mock.patch.dict(jobs.HANDLERS, {jobs.STREAK: broken}), self.assertLogs('activities.jobs', 'ERROR'):
+            jobs.run_due_jobs(now=self.later())
+
+        retry = ActivityJob.objects.get()
+        self.assertEqual(retry.kind, 'streak')
+        self.assertGreater(retry.run_after, timezone.now() + timedelta(seconds=30))
+
+    def test_jobs_of_a_crashed_worker_run_again_after_the_lease(self):
+        self.add_activity()
+        crash = mock.Mock(side_effect=SystemExit)
+        with mock.patch.dict(jobs.HANDLERS, {jobs.STREAK: crash}), self.assertRaises(SystemExit):
+            jobs.run_due_jobs(now=self.later())
+        self.assertEqual(ActivityJob.objects.count(), 2)
+        self.assertEqual(jobs.run_due_jobs(now=self.later()), 0)
+
+        after_lease = self.later() + timedelta(seconds=jobs.LEASE_SECONDS)
+        self.assertEqual(jobs.run_due_jobs(now=after_lease), 2)
+        self.assertFalse(ActivityJob.objects.exists())
+        self.assertEqual(UserProfile.objects.get(user=self.user).current_streak, 1)
+
+    def test_a_write_during_the_run_keeps_its_job(self):
+        self.add_activity()
+
+        def refresh_while_another_write_lands(user_id):
+            jobs.enqueue(jobs.STREAK, [user_id])
+
+        with mock.patch.dict(jobs.HANDLERS, {jobs.STREAK: refresh_while_another_write_lands}):
+            self.assertEqual(jobs.run_due_jobs(now=self.later()), 2)
+        self.assertEqual(list(ActivityJob.objects.values_list('kind', flat=True)), ['streak'])
+
+    def test_worker_command(self):
+        self.add_activity()
+        ActivityJob.objects.update(run_after=timezone.now())
+        out = StringIO()
+        call_command('run_activity_jobs', stdout=out)
+        self.assertIn('Ran 2 activity jobs', out.getvalue())
+        self.assertEqual(UserProfile.objects.get(user=self.user).current_streak, 1)
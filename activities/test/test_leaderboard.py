@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..leaderboard import build_snapshot, ranked_standings, update_leaderboard
+from ..models import FitnessActivity, Leaderboard
+from .test_stats import make_user
+
+
+def add_activity(user, calories, days_ago=0):
+    FitnessActivity.objects.create(
+        user=user, activity_type='running', duration=30, calories_burned=calories,
+        distance=5.0, date=timezone.now() - timedelta(days=days_ago)
+    )
+
+
+class RankedStandingsTest(TestCase):
+    def setUp(self):
+        self.users = [make_user(f'user{i}@example.com', f'user{i}') for i in range(4)]
+        first, tied_a, tied_b, idle = self.users
+        add_activity(first, 900)
+        add_activity(tied_a, 450)
+        add_activity(tied_b, 400)
+        add_activity(idle, 5000, days_ago=20)
+
+    def test_ties_share_rank(self):
+        standings = list(ranked_standings('weekly'))
+        self.assertEqual(
+            [(row['user_id'], row['score'], row['rank']) for row in standings],
+            [
+                (self.users[0].pk, 10, 1),
+                (self.users[1].pk, 5, 2),
+                (self.users[2].pk, 5, 2),
+                (self.users[3].pk, 0, 4),
+            ]
+        )
+
+    def test_all_time_uses_profile_points(self):
+        standings = list(ranked_standings('all_time'))
+        self.assertEqual(standings[0]['user_id'], self.users[3].pk)
+        self.assertEqual(standings[0]['score'], 51)
+        self.assertEqual(standings[0]['workouts'], 1)
+
+    def test_query_count_is_constant_in_user_count(self):
+        def build():
+            board = Leaderboard.objects.create(period='weekly')
+            with CaptureQueriesContext(connection) as queries:
+                update_leaderboard(board, 'weekly')
+            return len(queries), board.entries.count()
+
+        few_queries, few_entries = build()
+        for i in range(4, 30):
+            add_activity(make_user(f'user{i}@example.com', f'user{i}'), 100 * i)
+        many_queries, many_entries = build()
+
+        self.assertEqual((few_entries, many_entries), (4, 30))
+        self.assertEqual(few_queries, many_queries)
+
+
+class LeaderboardEndpointTest(APITestCase):
+    def test_leaderboard_payload(self):
+        user = make_user()
+        add_activity(user, 500)
+        build_snapshot('weekly')
+        self.client.force_authenticate(user)
+
+        response = self.client.get(reverse('leaderboard'), {'period': 'weekly'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['entries'][0]['username'], 'runner')
+        self.assertEqual(response.data['entries'][0]['rank'], 1)
+        self.assertEqual(response.data['entries'][0]['points'], 6)
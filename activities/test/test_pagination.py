@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..models import FitnessActivity, WorkoutGoal
+from .test_stats import make_user
+
+
+class KeysetPaginationTest(APITestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+        self.url = reverse('activity-list')
+        now = timezone.now()
+        # pairs of activities share a timestamp so ordering has to fall back to id
+        self.activities = [
+            FitnessActivity.objects.create(
+                user=self.user, activity_type='running', duration=30, calories_burned=100,
+                distance=5.0, date=now - timedelta(hours=i // 2)
+            )
+            for i in range(25)
+        ]
+        self.expected = [a.pk for a in sorted(self.activities, key=lambda a: (a.date, a.pk), reverse=True)]
+
+    def walk(self, url, params=None):
+        ids, pages = [], 0
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['results']]
+            pages += 1
+            if not response.data['next']:
+                return ids, pages
+            response = self.client.get(response.data['next'])
+
+    def test_walks_every_row_once_in_order(self):
+        ids, pages = self.walk(self.url, {'page_size': 10})
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 3)
+
+    def test_first_page_has_no_previous(self):
+        response = self.client.get(self.url, {'page_size': 10})
+        self.assertIsNone(response.data['previous'])
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get(self.url, {'page_size': 10})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [row['id'] for row in back.data['results']],
+            [row['id'] for row in first.data['results']]
+        )
+        self.assertIsNone(back.data['previous'])
+        self.assertIsNotNone(back.data['next'])
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        first = self.client.get(self.url, {'page_size': 10})
+        FitnessActivity.objects.create(
+            user=self.user, activity_type='yoga', duration=10, calories_burned=50, distance=0.0
+        )
+        second = self.client.get(first.data['next'])
+        self.assertEqual([row['id'] for row in second.data['results']], self.expected[10:20])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_page_size_is_capped(self):
+        response = self.client.get(self.url, {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 25)
+        self.assertIsNone(response.data['next'])
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        def queries_for(url, params=None):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, params)
+            return len(queries), response
+
+        first_count, response = queries_for(self.url, {'page_size': 5})
+        for _ in range(3):
+            response = self.client.get(response.data['next'])
+        deep_count, _ = queries_for(response.data['next'])
+        self.assertEqual(first_count, deep_count)
+
+    def test_history_is_paginated_with_filters(self):
+        FitnessActivity.objects.create(
+            user=self.user, activity_type='yoga', duration=10, calories_burned=50, distance=0.0
+        )
+        ids, _ = self.walk(reverse('activity-history'), {'activity_type': 'running', 'page_size': 7})
+        self.assertEqual(ids, self.expected)
+
+    def test_goals_are_paginated(self):
+        for i in range(3):
+            WorkoutGoal.objects.create(
+                user=self.user, title=f'Goal {i}', goal_type='frequency', duration_type='weekly',
+                target_value=3, unit='workouts', end_date=timezone.localdate() + timedelta(days=7)
+            )
+        ids, pages = self.walk(reverse('goal-list-create'), {'page_size': 2})
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(pages, 2)
@@ -0,0 +1,179 @@
+import bisect
+import random
+from datetime import timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..leaderboard import ranked_standings
+from ..models import ActivitySnapshot, FitnessActivity
+from ..ranking import OrderStatisticTree, RankIndex, rank_indexes
+from .test_stats import make_user
+
+
+class OrderStatisticTreeTest(SimpleTestCase):
+    def test_matches_sorted_list(self):
+        rng = random.Random(7)
+        tree, expected = OrderStatisticTree(), []
+        for _ in range(2000):
+            key = (rng.randint(-50, 0), rng.randint(1, 40))
+            if key in expected:
+                tree.remove(key)
+                expected.remove(key)
+            else:
+                tree.insert(key)
+                bisect.insort(expected, key)
+
+            probe = (rng.randint(-50, 0), rng.randint(1, 40))
+            self.assertEqual(tree.count_less(probe), bisect.bisect_left(expected, probe))
+
+        self.assertEqual(len(tree), len(expected))
+        self.assertEqual(tree.slice(0, len(tree)), expected)
+        self.assertEqual(tree.select(len(expected) // 2), expected[len(expected) // 2])
+
+    def test_bulk_build(self):
+        tree = OrderStatisticTree([(3, 1), (1, 1), (2, 1)])
+        self.assertEqual(tree.slice(0, 10), [(1, 1), (2, 1), (3, 1)])
+        with self.assertRaises(IndexError):
+            tree.select(3)
+
+
+class RankIndexTest(TestCase):
+    def setUp(self):
+        self.users = [make_user(f'user{i}@example.com', f'user{i}') for i in range(5)]
+
+    def add_activity(self, user, calories, days_ago=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return FitnessActivity.objects.create(
+                user=user, activity_type='running', duration=30, calories_burned=calories,
+                distance=5.0, date=timezone.now() - timedelta(days=days_ago)
+            )
+
+    def assertMatchesDatabase(self, index):
+        for row in ranked_standings(index.period):
+            standing = index.standing(row['user_id'])
+            self.assertEqual((standing.rank, standing.points), (row['rank'], row['score']))
+
+    def test_updates_follow_writes(self):
+        index = RankIndex('weekly')
+        index.rebuild()
+        with mock.patch.dict(rank_indexes.indexes, {'weekly': index}):
+            rng = random.Random(3)
+            activities = []
+            for _ in range(30):
+                activities.append(self.add_activity(
+                    rng.choice(self.users), rng.randint(50, 900), days_ago=rng.choice([0, 1, 30])
+                ))
+                if rng.random() < 0.3:
+                    with self.captureOnCommitCallbacks(execute=True):
+                        FitnessActivity.objects.get(pk=activities.pop(0).pk).delete()
+
+            self.assertMatchesDatabase(index)
+
+            with self.assertNumQueries(0):
+                index.standing(self.users[0].pk)
+                index.around(self.users[0].pk, 2)
+                index.top(3)
+
+    def test_changes_during_a_rebuild_survive_the_swap(self):
+        self.add_activity(self.users[0], 500)
+        index = RankIndex('weekly')
+        index.rebuild()
+        late = ActivitySnapshot(self.users[1].pk, 'running', timezone.now().date(), 30, 5.0, 900)
+
+        def standings_then_a_commit(period, today):
+            rows = list(ranked_standings(period, today))
+            # announced after the query read its snapshot, before the new tree is in place
+            index.apply_activity_change(None, late)
+            return rows
+
+        with mock.patch('activities.ranking.ranked_standings', standings_then_a_commit):
+            index.rebuild()
+        self.assertEqual(index.standing(self.users[1].pk)[1:3], (1, 10))
+        self.assertEqual(index.standing(self.users[0].pk)[1:3], (2, 6))
+
+    def test_around_and_top(self):
+        for points, user in enumerate(self.users, start=1):
+            self.add_activity(user, points * 1000)
+        index = RankIndex('all_time')
+        index.rebuild()
+
+        self.assertEqual([row.user_id for row in index.top(2)], [self.users[4].pk, self.users[3].pk])
+        self.assertEqual(
+            [row.rank for row in index.around(self.users[2].pk, 1)],
+            [2, 3, 4]
+        )
+
+    def test_rebuilds_when_window_rolls_over(self):
+        index = RankIndex('daily')
+        index.rebuild()
+        self.assertFalse(index.is_stale())
+        index.window_start -= timedelta(days=1)
+        self.assertTrue(index.is_stale())
+
+    def test_a_stale_index_is_rebuilt_off_the_request_path(self):
+        index = RankIndex('daily')
+        with mock.patch.object(index, 'rebuild', wraps=index.rebuild) as rebuild:
+            index.ensure_fresh()  # the first build has nothing to fall back on
+            index.built_at -= 10 ** 6
+            with mock.patch('activities.ranking.threading.Thread') as thread, self.assertNumQueries(0):
+                self.assertIs(index.ensure_fresh(), index)
+                index.ensure_fresh()
+        self.assertEqual(rebuild.call_count, 1)
+        thread.assert_called_once()
+        thread.return_value.start.assert_called_once_with()
+
+    def test_usernames_and_streaks_follow_their_writes(self):
+        self.add_activity(self.users[0], 500)
+        index = RankIndex('weekly')
+        index.rebuild()
+        with mock.patch.dict(rank_indexes.indexes, {'weekly': index}):
+            self.assertEqual(index.standing(self.users[0].pk)[5:], ('user0', 1))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.users[0].username = 'renamed'
+                self.users[0].save()
+            self.add_activity(self.users[0], 100, days_ago=1)
+            with self.assertNumQueries(0):
+                self.assertEqual(index.standing(self.users[0].pk)[5:], ('renamed', 2))
+                self.assertEqual(index.top(1)[0].username, 'renamed')
+
+
+class MyRankingEndpointTest(APITestCase):
+    def test_rank_without_snapshot(self):
+        leader, me = make_user(), make_user('me@example.com', 'me')
+        mock.patch.dict(rank_indexes.indexes, {'weekly': RankIndex('weekly')}).start()
+        self.addCleanup(mock.patch.stopall)
+        with self.captureOnCommitCallbacks(execute=True):
+            FitnessActivity.objects.create(user=leader, activity_type='running', duration=30,
+                                           calories_burned=900, distance=5.0)
+            FitnessActivity.objects.create(user=me, activity_type='yoga', duration=30,
+                                           calories_burned=100, distance=0.0)
+        self.client.force_authenticate(me)
+
+        response = self.client.get(reverse('my-ranking'), {'period': 'weekly', 'around': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rank'], 2)
+        self.assertEqual(response.data['points'], 2)
+        self.assertEqual([row['username'] for row in response.data['around']], ['runner', 'me'])
+
+        self.assertEqual(self.client.get(reverse('my-ranking'), {'period': 'hourly'}).status_code, 404)
+
+    def test_lookups_do_not_touch_the_database(self):
+        user = make_user()
+        index = RankIndex('weekly')
+        mock.patch.dict(rank_indexes.indexes, {'weekly': index}).start()
+        self.addCleanup(mock.patch.stopall)
+        with self.captureOnCommitCallbacks(execute=True):
+            FitnessActivity.objects.create(user=user, activity_type='running', duration=30,
+                                           calories_burned=900, distance=5.0)
+        index.rebuild()
+        self.client.force_authenticate(user)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('my-ranking'), {'period': 'weekly', 'around': 2})
+        self.assertEqual(response.data['streak'], 1)
+        self.assertEqual(response.data['around'], [{'rank': 1, 'username': 'runner', 'points': 10}])
@@ -0,0 +1,138 @@
+import random
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..models import DailyActivityRollup, FitnessActivity, WorkoutGoal
+from ..rollups import rebuild_rollups
+from .test_stats import make_user
+
+ROLLUP_FIELDS = ('user_id', 'day', 'activity_type', 'total_duration', 'total_calories', 'activity_count')
+
+
+def rollup_rows():
+    return sorted(DailyActivityRollup.objects.values_list(*ROLLUP_FIELDS))
+
+
+class RollupMaintenanceTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('other@example.com', 'other')
+
+    def add_activity(self, user=None, **kwargs):
+        data = {'activity_type': 'running', 'duration': 30, 'calories_burned': 300, 'distance': 5.0}
+        data.update(kwargs)
+        return FitnessActivity.objects.create(user=user or self.user, **data)
+
+    def assertMatchesBackfill(self):
+        incremental = rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, rollup_rows())
+
+    def test_activities_on_same_day_share_a_row(self):
+        self.add_activity(duration=30, distance=5.0)
+        self.add_activity(duration=15, distance=2.5)
+
+        rollup = DailyActivityRollup.objects.get(user=self.user)
+        self.assertEqual(rollup.activity_count, 2)
+        self.assertEqual(rollup.total_duration, 45)
+        self.assertAlmostEqual(rollup.total_distance, 7.5)
+
+    def test_moving_an_activity_moves_its_totals(self):
+        activity = self.add_activity()
+        activity.activity_type = 'cycling'
+        activity.date = activity.date - timedelta(days=2)
+        activity.save()
+
+        self.assertEqual(DailyActivityRollup.objects.count(), 1)
+        self.assertEqual(DailyActivityRollup.objects.get().activity_type, 'cycling')
+        self.assertMatchesBackfill()
+
+    def test_empty_rows_are_removed(self):
+        activity = self.add_activity()
+        activity.delete()
+        self.assertFalse(DailyActivityRollup.objects.exists())
+
+    def test_random_sequence_matches_backfill(self):
+        rng = random.Random(99)
+        now = timezone.now()
+        activities = []
+        for _ in range(60):
+            action = rng.choice(['create', 'create', 'update', 'delete'])
+            if action == 'create' or not activities:
+                activities.append(self.add_activity(
+                    user=rng.choice([self.user, self.other]),
+                    activity_type=rng.choice(['running', 'yoga', 'hiit']),
+                    duration=rng.randint(5, 90),
+                    date=now - timedelta(days=rng.randint(0, 3)),
+                ))
+            elif action == 'update':
+                activity = FitnessActivity.objects.get(pk=rng.choice(activities).pk)
+                activity.activity_type = rng.choice(['running', 'yoga', 'hiit'])
+                activity.duration = rng.randint(5, 90)
+                activity.date = now - timedelta(days=rng.randint(0, 3))
+                activity.save()
+            else:
+                FitnessActivity.objects.get(pk=activities.pop(rng.randrange(len(activities))).pk).delete()
+
+        self.assertMatchesBackfill()
+
+    def test_backfill_command(self):
+        self.add_activity()
+        DailyActivityRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=open('/dev/null', 'w'))
+        self.assertEqual(DailyActivityRollup.objects.get().activity_count, 1)
+
+
+class RollupReadPathTest(APITestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def add_history(self, count):
+        now = timezone.now()
+        for i in range(count):
+            FitnessActivity.objects.create(
+                user=self.user, activity_type='running', duration=30,
+                calories_burned=300, distance=5.0, date=now - timedelta(days=i % 5)
+            )
+
+    def test_metrics_from_rollups(self):
+        self.add_history(4)
+        response = self.client.get(reverse('activity-metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['activity_count'], 4)
+        self.assertEqual(response.data['total_duration'], 120)
+        self.assertEqual(response.data['average_calories'], 300)
+
+    def test_metrics_reads_rollups_not_activities(self):
+        self.add_history(30)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('activity-metrics'), {'period': 'week'})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('activities_fitnessactivity', sql)
+
+    def test_goal_progress_from_rollups(self):
+        self.add_history(3)
+        today = timezone.localdate()
+        goals = {
+            goal_type: WorkoutGoal.objects.create(
+                user=self.user, title=goal_type, goal_type=goal_type, duration_type='monthly',
+                target_value=10000, unit='x', end_date=today + timedelta(days=30)
+            )
+            for goal_type in ('duration', 'calories', 'frequency', 'distance')
+        }
+        for goal in goals.values():
+            goal.update_progress()
+
+        in_month = FitnessActivity.objects.filter(activity_day__gte=today.replace(day=1)).count()
+        self.assertEqual(goals['duration'].current_value, 30 * in_month)
+        self.assertEqual(goals['calories'].current_value, 300 * in_month)
+        self.assertEqual(goals['frequency'].current_value, in_month)
+        self.assertAlmostEqual(goals['distance'].current_value, 5.0 * in_month)
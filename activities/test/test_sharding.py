@@ -0,0 +1,163 @@
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import CustomerRegister
+from .. import jobs
+from ..ingest import ingest_activities
+from ..leaderboard import build_snapshot, ranked_standings
+from ..models import ActivityJob, DailyActivityRollup, FitnessActivity, UserProfile
+from ..sharding import ID_BAND_BITS, ShardRoutingError, register_shard, shard_for, shard_index
+from .test_leaderboard import add_activity
+from .test_stats import make_user
+
+ACTIVITY = {'activity_type': 'running', 'duration': 30, 'calories_burned': 300, 'distance': 5.0}
+
+
+# default is the usual test database; the shards are throwaway files registered on the side,
+# migrated once per class and restored from a copy before every test
+@override_settings(ACTIVITY_SHARDS=2, DATABASE_ROUTERS=['activities.sharding.UserShardRouter'])
+class ShardingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dir = tempfile.TemporaryDirectory()
+        # shard2 is only used once test_reshard grows the layout to three
+        with override_settings(ACTIVITY_SHARD_DIR=cls.dir.name):
+            cls.aliases = [register_shard(index) for index in range(3)]
+        for alias in cls.aliases:
+            call_command('migrate', database=alias, verbosity=0)
+            connections[alias].close()
+            shutil.copy(cls.path(alias), cls.path(alias) + '.migrated')
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.aliases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        cls.dir.cleanup()
+        super().tearDownClass()
+
+    @classmethod
+    def path(cls, alias):
+        return connections.settings[alias]['NAME']
+
+    def setUp(self):
+        for alias in self.aliases:
+            connections[alias].close()
+            shutil.copy(self.path(alias) + '.migrated', self.path(alias))
+        self.users = [make_user(f'user{i}@example.com', f'user{i}') for i in range(4)]
+
+    def post_activity(self, user, **fields):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(reverse('activity-list'), {**ACTIVITY, **fields}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return client
+
+    def test_each_users_rows_live_on_their_shard(self):
+        for user in self.users:
+            client = self.post_activity(user)
+            self.assertEqual(client.get(reverse('activity-metrics')).data['activity_count'], 1)
+            self.assertEqual(client.get(reverse('user-profile')).data['total_workouts'], 1)
+
+        self.assertEqual({shard_for(user) for user in self.users}, {'shard0', 'shard1'})
+        for user in self.users:
+            home, away = shard_for(user), {'shard0': 'shard1', 'shard1': 'shard0'}[shard_for(user)]
+            for model in (FitnessActivity, UserProfile, DailyActivityRollup):
+                self.assertEqual(model.objects.using(home).filter(user=user).count(), 1)
+                self.assertFalse(model.objects.using(away).filter(user=user).exists())
+            copy = CustomerRegister.objects.using(home).get(pk=user.pk)
+            self.assertEqual(copy.email, user.email)
+        self.assertFalse(FitnessActivity.objects.using(DEFAULT_DB_ALIAS).exists())
+
+    def test_a_query_without_a_user_is_refused(self):
+        with self.assertRaises(ShardRoutingError):
+            FitnessActivity.objects.count()
+        self.assertEqual(FitnessActivity.objects.for_user(self.users[0]).count(), 0)
+
+    def test_ids_are_unique_across_shards(self):
+        activities = [FitnessActivity.objects.create(user=user, **ACTIVITY) for user in self.users]
+        self.assertEqual(len({activity.pk for activity in activities}), len(activities))
+        for activity in activities:
+            self.assertEqual(activity.pk >> ID_BAND_BITS, shard_index(shard_for(activity.user_id)) + 1)
+
+    def test_leaderboard_is_gathered_from_every_shard(self):
+        first, tied_a, tied_b, idle = self.users
+        add_activity(first, 900)
+        add_activity(tied_a, 450)
+        add_activity(tied_b, 400)
+        add_activity(idle, 5000, days_ago=20)
+
+        expected = [(first.pk, 10, 1), (tied_a.pk, 5, 2), (tied_b.pk, 5, 2), (idle.pk, 0, 4)]
+        standings = ranked_standings('weekly')
+        self.assertEqual([(row['user_id'], row['score'], row['rank']) for row in standings], expected)
+
+        snapshot = build_snapshot('weekly')
+        self.assertEqual(
+            [(entry.user_id, entry.points, entry.rank) for entry in snapshot.entries.order_by('rank', 'user_id')],
+            expected,
+        )
+
+    @override_settings(ACTIVITY_JOBS_INLINE=False)
+    def test_jobs_queue_and_run_on_the_users_shard(self):
+        for user in self.users:
+            self.post_activity(user)
+        for user in self.users:
+            self.assertEqual(ActivityJob.objects.for_user(user).count(), 2)
+        ran = jobs.run_due_jobs(now=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(ran, 2 * len(self.users))
+        self.assertEqual(UserProfile.objects.for_user(self.users[0]).get().current_streak, 1)
+
+    def test_deleting_a_user_clears_their_shard(self):
+        user = self.users[0]
+        self.post_activity(user)
+        home = shard_for(user)
+        user.delete()
+        self.assertFalse(FitnessActivity.objects.using(home).filter(user_id=user.pk).exists())
+        self.assertFalse(UserProfile.objects.using(home).filter(user_id=user.pk).exists())
+        self.assertFalse(CustomerRegister.objects.using(home).filter(pk=user.pk).exists())
+
+    def test_reshard_moves_rows_with_their_ids(self):
+        for user in self.users:
+            ingest_activities(user, [ACTIVITY, {**ACTIVITY, 'calories_burned': 100}])
+        before = {
+            user.pk: list(FitnessActivity.objects.for_user(user).values_list('pk', 'created_at').order_by('pk'))
+            for user in self.users
+        }
+
+        with override_settings(ACTIVITY_SHARDS=3):
+            call_command('reshard', '--from', '2', stdout=io.StringIO())
+
+            moved = 0
+            for user in self.users:
+                old, new = shard_for(user, 2), shard_for(user)
+                moved += old != new
+                rows = FitnessActivity.objects.for_user(user).values_list('pk', 'created_at').order_by('pk')
+                self.assertEqual(list(rows), before[user.pk])
+                self.assertEqual(UserProfile.objects.for_user(user).get().total_calories_burned, 400)
+                if old != new:
+                    self.assertFalse(FitnessActivity.objects.using(old).filter(user=user).exists())
+                    self.assertFalse(CustomerRegister.objects.using(old).filter(pk=user.pk).exists())
+            self.assertTrue(moved)
+
+            # new rows start above everything that moved, on every shard
+            highest = max(pk for rows in before.values() for pk, _ in rows)
+            for user in self.users[:3]:
+                self.assertGreater(self.post_activity_pk(user), highest)
+
+            output = io.StringIO()
+            call_command('reshard', '--from', '2', stdout=output)
+            self.assertIn('Moved 0 user(s)', output.getvalue())
+
+    def post_activity_pk(self, user):
+        return FitnessActivity.objects.create(user=user, **ACTIVITY).pk
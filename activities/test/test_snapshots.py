@@ -0,0 +1,79 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..leaderboard import build_snapshot, published_snapshot
+from ..models import FitnessActivity, Leaderboard
+from .test_stats import make_user
+
+
+class SnapshotBuilderTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        FitnessActivity.objects.create(user=self.user, activity_type='running', duration=30,
+                                       calories_burned=500, distance=5.0)
+
+    def test_unpublished_snapshot_is_invisible(self):
+        Leaderboard.objects.create(period='weekly')
+        self.assertIsNone(published_snapshot('weekly'))
+
+    def test_build_publishes_complete_snapshot(self):
+        snapshot = build_snapshot('weekly')
+        self.assertEqual(published_snapshot('weekly'), snapshot)
+        self.assertEqual(snapshot.entries.get().points, 6)
+
+    def test_newer_snapshot_replaces_older_and_prunes(self):
+        first = build_snapshot('daily', keep=2)
+        second = build_snapshot('daily', keep=2)
+        third = build_snapshot('daily', keep=2)
+
+        self.assertEqual(published_snapshot('daily'), third)
+        self.assertFalse(Leaderboard.objects.filter(pk=first.pk).exists())
+        self.assertTrue(Leaderboard.objects.filter(pk=second.pk).exists())
+
+    def test_abandoned_builds_are_cleaned_up(self):
+        abandoned = Leaderboard.objects.create(period='monthly', snapshot_date=timezone.now() - timedelta(hours=2))
+        # another builder still at work
+        in_progress = Leaderboard.objects.create(period='monthly', snapshot_date=timezone.now())
+        build_snapshot('monthly')
+        self.assertFalse(Leaderboard.objects.filter(pk=abandoned.pk).exists())
+        self.assertTrue(Leaderboard.objects.filter(pk=in_progress.pk).exists())
+
+    def test_loop_survives_a_failed_pass(self):
+        builds = [RuntimeError('boom'), mock.MagicMock(pk=1), KeyboardInterrupt()]
+        with mock.patch('activities.management.commands.build_leaderboards.build_snapshot', side_effect=builds), \
+                mock.patch('activities.management.commands.build_leaderboards.time.sleep'), \
+                self.assertLogs('activities.management.commands.build_leaderboards', 'ERROR'):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('build_leaderboards', '--loop', '--period', 'daily', stdout=StringIO())
+
+    def test_command_builds_every_period(self):
+        call_command('build_leaderboards', stdout=StringIO())
+        for period, _ in Leaderboard.PERIOD_CHOICES:
+            self.assertIsNotNone(published_snapshot(period))
+
+
+class LeaderboardReadTest(APITestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def test_get_is_a_pure_read(self):
+        response = self.client.get(reverse('leaderboard'), {'period': 'weekly'})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Leaderboard.objects.exists())
+
+    def test_get_serves_latest_published(self):
+        build_snapshot('weekly')
+        latest = build_snapshot('weekly')
+        with self.assertNumQueries(2):
+            # the published snapshot, then its entries joined to their users
+            response = self.client.get(reverse('leaderboard'), {'period': 'weekly'})
+        self.assertEqual(response.data['id'], latest.pk)
+        self.assertEqual(response.data['entries'][0]['username'], 'runner')
@@ -0,0 +1,161 @@
+import random
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from users.models import CustomerRegister
+from ..models import FitnessActivity, UserProfile
+from ..stats import rebuild_user_stats
+
+STAT_FIELDS = (
+    'total_calories_burned', 'total_workout_time', 'total_workouts',
+    'points', 'level', 'current_streak', 'last_activity',
+)
+
+
+def make_user(email='runner@example.com', username='runner'):
+    return CustomerRegister.objects.create_user(
+        email=email,
+        username=username,
+        password='testpass123',
+        first_name='Test',
+        last_name='Runner',
+        height=175.0,
+        weight=70.0
+    )
+
+
+class IncrementalStatsTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('other@example.com', 'other')
+
+    def assertMatchesRebuild(self, user):
+        """The delta-maintained profile must equal a full recompute"""
+        incremental = UserProfile.objects.get(user=user)
+        rebuilt = rebuild_user_stats(UserProfile.objects.get(user=user))
+        for field in STAT_FIELDS:
+            self.assertEqual(getattr(incremental, field), getattr(rebuilt, field), field)
+
+    def add_activity(self, user=None, **kwargs):
+        data = {
+            'activity_type': 'running',
+            'duration': 30,
+            'calories_burned': 300,
+            'distance': 5.0,
+        }
+        data.update(kwargs)
+        return FitnessActivity.objects.create(user=user or self.user, **data)
+
+    def test_create_applies_delta(self):
+        self.add_activity(duration=45, calories_burned=450)
+        self.add_activity(duration=20, calories_burned=0, activity_type='yoga')
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.total_workouts, 2)
+        self.assertEqual(profile.total_workout_time, 65)
+        self.assertEqual(profile.total_calories_burned, 450 + 60)
+        self.assertEqual(profile.points, (510 // 100) + 2)
+        self.assertEqual(profile.current_streak, 1)
+        self.assertMatchesRebuild(self.user)
+
+    def test_update_applies_difference(self):
+        activity = self.add_activity(duration=30, calories_burned=300)
+        activity.duration = 90
+        activity.calories_burned = 1200
+        activity.save()
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.total_workouts, 1)
+        self.assertEqual(profile.total_workout_time, 90)
+        self.assertEqual(profile.total_calories_burned, 1200)
+        self.assertMatchesRebuild(self.user)
+
+    def test_partial_save_only_counts_the_saved_fields(self):
+        activity = self.add_activity(duration=30, calories_burned=300)
+        activity.duration = 90
+        activity.calories_burned = 1200
+        activity.save(update_fields=['calories_burned'])
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.total_workout_time, 30)
+        self.assertEqual(profile.total_calories_burned, 1200)
+        self.assertMatchesRebuild(self.user)
+
+        activity.save()
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_workout_time, 90)
+        self.assertMatchesRebuild(self.user)
+
+    def test_update_without_loaded_snapshot(self):
+        activity = self.add_activity(duration=30, calories_burned=300)
+        detached = FitnessActivity(
+            pk=activity.pk, user=self.user, activity_type='running',
+            duration=10, calories_burned=100, distance=1.0, date=activity.date,
+            created_at=activity.created_at
+        )
+        detached.save()
+
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_workout_time, 10)
+        self.assertMatchesRebuild(self.user)
+
+    def test_reassigning_owner_moves_totals(self):
+        activity = self.add_activity()
+        activity = FitnessActivity.objects.get(pk=activity.pk)
+        activity.user = self.other
+        activity.save()
+
+        self.assertEqual(UserProfile.objects.get(user=self.user).total_workouts, 0)
+        self.assertEqual(UserProfile.objects.get(user=self.other).total_workouts, 1)
+        self.assertMatchesRebuild(self.user)
+        self.assertMatchesRebuild(self.other)
+
+    def test_delete_reverts_delta(self):
+        keep = self.add_activity(calories_burned=250)
+        FitnessActivity.objects.get(pk=self.add_activity(calories_burned=800).pk).delete()
+
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.total_workouts, 1)
+        self.assertEqual(profile.total_calories_burned, keep.calories_burned)
+        self.assertMatchesRebuild(self.user)
+
+    def test_random_sequence_matches_full_recompute(self):
+        rng = random.Random(1234)
+        now = timezone.now()
+        activities = []
+
+        for _ in range(60):
+            action = rng.choice(['create', 'create', 'update', 'delete'])
+            if action == 'create' or not activities:
+                activities.append(self.add_activity(
+                    user=rng.choice([self.user, self.other]),
+                    duration=rng.randint(5, 120),
+                    calories_burned=rng.randint(0, 900),
+                    date=now - timedelta(days=rng.randint(0, 5)),
+                ))
+            elif action == 'update':
+                activity = FitnessActivity.objects.get(pk=rng.choice(activities).pk)
+                activity.duration = rng.randint(5, 120)
+                activity.calories_burned = rng.randint(1, 900)
+                activity.date = now - timedelta(days=rng.randint(0, 5))
+                activity.save()
+            else:
+                activity = activities.pop(rng.randrange(len(activities)))
+                FitnessActivity.objects.get(pk=activity.pk).delete()
+
+        self.assertMatchesRebuild(self.user)
+        self.assertMatchesRebuild(self.other)
+
+    def test_insert_query_count_is_independent_of_history(self):
+        self.add_activity(user=self.other)
+        with CaptureQueriesContext(connection) as light:
+            self.add_activity(user=self.other)
+
+        for _ in range(20):
+            self.add_activity()
+        with CaptureQueriesContext(connection) as heavy:
+            self.add_activity()
+
+        self.assertEqual(len(heavy), len(light))
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from ..models import FitnessActivity, UserProfile, WorkoutGoal
+from ..streaks import compute_streak, compute_streaks, streak_from_days
+from .test_stats import make_user
+
+
+class StreakFromDaysTest(SimpleTestCase):
+    today = date(2025, 3, 10)
+
+    def days(self, *offsets):
+        return sorted(self.today - timedelta(days=offset) for offset in offsets)
+
+    def test_no_days(self):
+        result = streak_from_days([], self.today)
+        self.assertEqual((result.current, result.longest, result.last_active_day), (0, 0, None))
+
+    def test_current_run_ends_today(self):
+        result = streak_from_days(self.days(0, 1, 2, 5), self.today)
+        self.assertEqual(result.current, 3)
+        self.assertEqual(result.longest, 3)
+        self.assertEqual(result.last_active_day, self.today)
+
+    def test_no_activity_today_breaks_current(self):
+        result = streak_from_days(self.days(1, 2), self.today)
+        self.assertEqual(result.current, 0)
+        self.assertEqual(result.longest, 2)
+
+    def test_longest_run_in_the_past(self):
+        result = streak_from_days(self.days(0, 10, 11, 12, 13, 20), self.today)
+        self.assertEqual(result.current, 1)
+        self.assertEqual(result.longest, 4)
+
+    def test_future_days_do_not_hide_today(self):
+        result = streak_from_days(self.days(-2, 0, 1), self.today)
+        self.assertEqual(result.current, 2)
+        self.assertEqual(result.last_active_day, self.today + timedelta(days=2))
+
+
+class StreakQueryTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.other = make_user('other@example.com', 'other')
+        now = timezone.now()
+        for user, offsets in ((self.user, (0, 0, 1, 2, 4)), (self.other, (1, 2))):
+            for offset in offsets:
+                FitnessActivity.objects.create(
+                    user=user, activity_type='walking', duration=20,
+                    calories_burned=80, distance=2.0, date=now - timedelta(days=offset)
+                )
+
+    def test_single_user_is_one_query(self):
+        with self.assertNumQueries(1):
+            result = compute_streak(self.user.pk)
+        self.assertEqual((result.current, result.longest), (3, 3))
+
+    def test_all_users_is_one_query(self):
+        with self.assertNumQueries(1):
+            streaks = compute_streaks()
+        self.assertEqual(streaks[self.user.pk].current, 3)
+        self.assertEqual(streaks[self.other.pk].current, 0)
+        self.assertEqual(streaks[self.other.pk].longest, 2)
+        self.assertEqual(streaks[-1].current, 0)
+
+    def test_profile_and_goal_use_engine(self):
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.current_streak, 3)
+        self.assertEqual(profile.calculate_current_streak(), 3)
+
+        goal = WorkoutGoal.objects.create(
+            user=self.user, title='Streak', goal_type='streak', duration_type='weekly',
+            target_value=7, unit='days', end_date=timezone.localdate() + timedelta(days=7)
+        )
+        self.assertEqual(goal.calculate_streak(), 3)
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.test import TestCase
+from django.utils import timezone
+
+from users.models import local_day
+from users.serializers import UserProfileSerializer
+from ..models import DailyActivityRollup, FitnessActivity, UserProfile, WorkoutGoal
+from ..streaks import compute_streak
+from .test_stats import make_user
+
+
+class LocalDayBucketingTest(TestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.user.timezone = 'America/Los_Angeles'
+        self.user.save()
+
+    def add_activity(self, moment):
+        return FitnessActivity.objects.create(
+            user=self.user, activity_type='running', duration=30, calories_burned=300,
+            distance=5.0, date=moment
+        )
+
+    def test_evening_workout_counts_for_the_local_day(self):
+        # 7pm in Los Angeles is already the next day in UTC
+        activity = self.add_activity(datetime(2026, 1, 15, 3, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(activity.activity_day, datetime(2026, 1, 14).date())
+        self.assertEqual(DailyActivityRollup.objects.get(user=self.user).day, datetime(2026, 1, 14).date())
+
+    def test_streak_counts_from_the_local_today(self):
+        now = timezone.now()
+        self.add_activity(now)
+        self.add_activity(now - timedelta(days=1))
+
+        self.assertEqual(compute_streak(self.user.pk).current, 2)
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertEqual(profile.last_activity, local_day('America/Los_Angeles', now))
+
+    def test_daily_goal_uses_the_local_day(self):
+        goal = WorkoutGoal.objects.create(
+            user=self.user, title='Move', goal_type='frequency', duration_type='daily',
+            target_value=5, unit='workouts', end_date=timezone.now().date() + timedelta(days=7)
+        )
+        self.assertEqual(goal.period_bounds()[0], local_day('America/Los_Angeles'))
+
+        self.add_activity(timezone.now())
+        goal.update_progress()
+        self.assertEqual(goal.current_value, 1)
+
+
+class TimezoneFieldTest(TestCase):
+    def test_rejects_unknown_zone(self):
+        user = make_user()
+        serializer = UserProfileSerializer(user, data={'timezone': 'Mars/Olympus'}, partial=True)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('timezone', serializer.errors)
+
+        serializer = UserProfileSerializer(user, data={'timezone': 'Africa/Addis_Ababa'}, partial=True)
+        self.assertTrue(serializer.is_valid(), serializer.errors)
@@ -0,0 +1,105 @@
+from datetime import date, datetime, timedelta
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from ..models import FitnessActivity
+from ..trends import bucket_starts, parse_trend_params
+from .test_stats import make_user
+
+
+class TrendParamsTest(SimpleTestCase):
+    today = date(2025, 3, 19)  # a Wednesday
+
+    def test_legacy_weekly_defaults_to_eight_calendar_weeks(self):
+        granularity, start, end = parse_trend_params({}, self.today)
+        self.assertEqual(granularity, 'week')
+        self.assertEqual(start, date(2025, 1, 27))
+        self.assertEqual(len(bucket_starts(start, end, granularity)), 8)
+
+    def test_monthly_uses_real_month_boundaries(self):
+        granularity, start, end = parse_trend_params({'trend_type': 'monthly'}, self.today)
+        self.assertEqual(
+            bucket_starts(start, end, granularity),
+            [date(2024, 10, 1), date(2024, 11, 1), date(2024, 12, 1),
+             date(2025, 1, 1), date(2025, 2, 1), date(2025, 3, 1)]
+        )
+
+    def test_explicit_range(self):
+        granularity, start, end = parse_trend_params(
+            {'granularity': 'day', 'start': '2025-02-27', 'end': '2025-03-02'}, self.today
+        )
+        self.assertEqual(len(bucket_starts(start, end, granularity)), 4)
+
+    def test_rejects_bad_input(self):
+        for params in ({'granularity': 'hour'}, {'trend_type': 'hourly'},
+                       {'start': '03/01/2025'}, {'start': '2025-03-02', 'end': '2025-03-01'}):
+            with self.assertRaises(ValueError):
+                parse_trend_params(params, self.today)
+
+
+class TrendsEndpointTest(APITestCase):
+    def setUp(self):
+        self.user = make_user()
+        self.client.force_authenticate(self.user)
+
+    def add_activity(self, day, duration=30):
+        FitnessActivity.objects.create(
+            user=self.user, activity_type='running', duration=duration, calories_burned=300,
+            distance=5.0, date=timezone.make_aware(datetime.combine(day, datetime.min.time()) + timedelta(hours=12))
+        )
+
+    def test_ranges_at_the_edges_of_the_calendar(self):
+        for params, dates in [
+            ({'granularity': 'month', 'start': '9999-11-01', 'end': '9999-12-31'}, ['9999-11', '9999-12']),
+            ({'granularity': 'week', 'start': '9999-12-20', 'end': '9999-12-31'}, ['9999-12-20', '9999-12-27']),
+            ({'granularity': 'year', 'start': '9998-01-01', 'end': '9999-12-31'}, ['9998', '9999']),
+            ({'granularity': 'day', 'start': '9999-12-31', 'end': '9999-12-31'}, ['9999-12-31']),
+        ]:
+            response = self.client.get(reverse('activity-trends'), params)
+            self.assertEqual(response.status_code, 200, params)
+            self.assertEqual([row['date'] for row in response.data], dates)
+
+        # the default six months stop at the first month there is
+        response = self.client.get(reverse('activity-trends'), {'granularity': 'month', 'end': '0001-02-15'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+    def test_month_buckets_and_zero_fill(self):
+        self.add_activity(date(2025, 1, 31))
+        self.add_activity(date(2025, 2, 1), duration=45)
+        self.add_activity(date(2025, 2, 28), duration=15)
+
+        response = self.client.get(reverse('activity-trends'), {
+            'granularity': 'month', 'start': '2024-12-01', 'end': '2025-03-31'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row['date'], row['activity_count'], row['total_duration']) for row in response.data],
+            [('2024-12', 0, 0), ('2025-01', 1, 30), ('2025-02', 2, 60), ('2025-03', 0, 0)]
+        )
+        self.assertEqual(response.data[0]['period'], 'monthly')
+
+    def test_week_buckets_start_on_monday(self):
+        self.add_activity(date(2025, 3, 9))   # Sunday
+        self.add_activity(date(2025, 3, 10))  # Monday
+        response = self.client.get(reverse('activity-trends'), {
+            'granularity': 'week', 'start': '2025-03-03', 'end': '2025-03-16'
+        })
+        self.assertEqual([row['date'] for row in response.data], ['2025-03-03', '2025-03-10'])
+        self.assertEqual([row['activity_count'] for row in response.data], [1, 1])
+
+    def test_query_count_is_flat_in_bucket_count(self):
+        self.add_activity(date(2025, 1, 1))
+        url = reverse('activity-trends')
+        # the response cache's data-version lookup, then one grouped aggregate
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'granularity': 'day', 'start': '2022-01-01', 'end': '2025-01-01'})
+        self.assertEqual(len(response.data), 1097)
+
+    def test_bad_granularity(self):
+        response = self.client.get(reverse('activity-trends'), {'granularity': 'hour'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.data)
@@ -0,0 +1,136 @@
+"""
+Trends engine.
+
+A trend is a run of calendar buckets (day, ISO week, month or year) between
+two dates. Totals come from one grouped query over the daily rollups,
+truncated to the bucket size in the database; buckets without activity are
+filled with zeros in Python, so the cost does not depend on how many buckets
+were asked for.
+"""
+from datetime import MAXYEAR, date, datetime, timedelta
+
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+
+from .models import DailyActivityRollup
+
+# granularity -> (label used in the response ``period`` field, date format, default bucket count)
+GRANULARITIES = {
+    'day': ('daily', '%Y-%m-%d', 30),
+    'week': ('weekly', '%Y-%m-%d', 8),
+    'month': ('monthly', '%Y-%m', 6),
+    'year': ('yearly', '%Y', 5),
+}
+
+# the original ``trend_type`` parameter, still accepted
+TREND_TYPES = {'daily': 'day', 'weekly': 'week', 'monthly': 'month', 'yearly': 'year'}
+
+MAX_BUCKETS = 3660
+
+
+def bucket_start(day, granularity):
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    if granularity == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    """The bucket after ``start``, or None when it would begin after ``date.max``"""
+    if granularity == 'year' and start.year == MAXYEAR:
+        return None
+    try:
+        if granularity == 'week':
+            return start + timedelta(weeks=1)
+        if granularity == 'month':
+            return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+        if granularity == 'year':
+            return start.replace(year=start.year + 1)
+        return start + timedelta(days=1)
+    except OverflowError:
+        return None
+
+
+def previous_bucket(start, granularity):
+    """The bucket before ``start``, or None when ``start`` is the first one the calendar has"""
+    if start == date.min:
+        return None
+    return bucket_start(start - timedelta(days=1), granularity)
+
+
+def parse_trend_params(params, today):
+    """
+    Read ``granularity`` (or the legacy ``trend_type``), ``start`` and ``end`` from the
+    query string. Raises ValueError with a user-facing message on bad input.
+    """
+    granularity = params.get('granularity')
+    if not granularity:
+        trend_type = params.get('trend_type', 'weekly')
+        if trend_type not in TREND_TYPES:
+            raise ValueError(f"Unknown trend_type '{trend_type}'")
+        granularity = TREND_TYPES[trend_type]
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+
+    try:
+        end = datetime.strptime(params['end'], '%Y-%m-%d').date() if params.get('end') else today
+        start = datetime.strptime(params['start'], '%Y-%m-%d').date() if params.get('start') else None
+    except ValueError:
+        raise ValueError("start and end must be dates in YYYY-MM-DD format")
+
+    if start is None:
+        start = bucket_start(end, granularity)
+        for _ in range(GRANULARITIES[granularity][2] - 1):
+            start = previous_bucket(start, granularity) or start
+    if start > end:
+        raise ValueError("start must not be after end")
+
+    return granularity, start, end
+
+
+def bucket_starts(start, end, granularity):
+    current = bucket_start(start, granularity)
+    buckets = []
+    # runs off the calendar after the bucket holding date.max
+    while current is not None and current <= end:
+        buckets.append(current)
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"Too many buckets requested (max {MAX_BUCKETS})")
+        current = next_bucket(current, granularity)
+    return buckets
+
+
+def compute_trends(user, granularity, start, end):
+    """Totals per calendar bucket from ``start`` to ``end`` inclusive, oldest first"""
+    label, date_format, _ = GRANULARITIES[granularity]
+    buckets = bucket_starts(start, end, granularity)
+
+    rows = (
+        DailyActivityRollup.objects
+        .for_user(user)
+        .filter(day__gte=start, day__lte=end)
+        .annotate(bucket=Trunc('day', granularity, output_field=DateField()))
+        .order_by()
+        .values('bucket')
+        .annotate(
+            total_duration=Sum('total_duration'),
+            total_calories=Sum('total_calories'),
+            activity_count=Sum('activity_count'),
+        )
+    )
+    totals = {row['bucket']: row for row in rows}
+
+    trends = []
+    for bucket in buckets:
+        row = totals.get(bucket, {})
+        trends.append({
+            'period': label,
+            'total_duration': row.get('total_duration') or 0,
+            'total_calories': row.get('total_calories') or 0,
+            'activity_count': row.get('activity_count') or 0,
+            'date': bucket.strftime(date_format),
+        })
+    return trends
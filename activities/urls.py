@@ -1,22 +1,29 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# the hot read endpoints, as coroutines when served by an ASGI worker
+reads = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     path('', views.FitnessActivityListCreateView.as_view(), name='activity-list'),
     path('<int:pk>/', views.FitnessActivityDetailView.as_view(), name='activity-detail'),
+    path('batch/', views.batch_create_activities, name='activity-batch'),
     path('history/', views.ActivityHistoryView.as_view(), name='activity-history'),
-    path('metrics/', views.activity_metrics, name='activity-metrics'),
+    path('export/', views.ActivityExportView.as_view(), name='activity-export'),
+    path('metrics/', reads.activity_metrics, name='activity-metrics'),
     path('trends/', views.activity_trends, name='activity-trends'),
-    path('recent/', views.recent_activities, name='recent-activities'),
+    path('recent/', reads.recent_activities, name='recent-activities'),
     
     # Workout Goals
     path('goals/', views.WorkoutGoalListCreateView.as_view(), name='goal-list-create'),
     path('goals/<int:pk>/', views.WorkoutGoalDetailView.as_view(), name='goal-detail'),
     
     # Leaderboard
-    path('leaderboard/', views.leaderboard, name='leaderboard'),
-    path('leaderboard/my-ranking/', views.my_ranking, name='my-ranking'),
+    path('leaderboard/', reads.leaderboard, name='leaderboard'),
+    path('leaderboard/my-ranking/', reads.my_ranking, name='my-ranking'),
     
     # User Profile
-    path('profile/', views.user_profile, name='user-profile'),
+    path('profile/', reads.user_profile, name='user-profile'),
+    path('cache-stats/', views.cache_stats, name='cache-stats'),
 ]
\ No newline at end of file
@@ -1,14 +1,20 @@
 from rest_framework import generics
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from django.utils import timezone
+from rest_framework.views import APIView
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from datetime import timedelta, datetime
-from django.db.models import Sum, Count, Avg
+from django.db.models import Prefetch, Sum, prefetch_related_objects
 from .models import (
     FitnessActivity,
+    DailyActivityRollup,
     WorkoutGoal,
-    Leaderboard,
     LeaderboardEntry,
     UserProfile
 )
@@ -18,176 +24,207 @@ from .serializers import (
     ActivityTrendSerializer,
     WorkoutGoalSerializer,
     LeaderboardSerializer,
-    LeaderboardEntrySerializer,
     UserProfileSeriallizer
 )
+from . import group_commit
+from .caching import cache_counts, cached_per_user, user_data_etag
+from .export import CONTENT_TYPES, STREAMERS, export_rows
+from .ingest import MAX_BATCH_SIZE, ingest_activities
+from .leaderboard import published_snapshot
+from .pagination import GoalKeysetPagination, KeysetPagination
+from .parsers import NDJSONParser
+from .ranking import rank_indexes
+from .renderers import CSVRenderer, ExportContentNegotiation, NDJSONRenderer
+from .trends import compute_trends, parse_trend_params
 
 ### -------------------- FITNESS ACTIVITY VIEWS --------------------
 
+@method_decorator(condition(etag_func=user_data_etag), name='get')
 class FitnessActivityListCreateView(generics.ListCreateAPIView):
     serializer_class = FitnessActivitySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return FitnessActivity.objects.filter(user=self.request.user)
+        return FitnessActivity.objects.for_user(self.request.user)
 
     def perform_create(self, serializer):
+        if getattr(settings, 'ACTIVITY_GROUP_COMMIT', False):
+            # committed together with whatever other requests are writing (see group_commit)
+            serializer.instance = group_commit.writer.submit(
+                FitnessActivity(user=self.request.user, **serializer.validated_data)
+            )
+            return
         serializer.save(user=self.request.user)
 
 
+@method_decorator(condition(etag_func=user_data_etag), name='get')
 class FitnessActivityDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = FitnessActivitySerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return FitnessActivity.objects.filter(user=self.request.user)
+        return FitnessActivity.objects.for_user(self.request.user)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, NDJSONParser])
+def batch_create_activities(request):
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'error': 'Expected a JSON array (or NDJSON) of activities'}, status=400)
+    if not items:
+        return Response({'error': 'No activities provided'}, status=400)
+    if len(items) > MAX_BATCH_SIZE:
+        return Response({'error': f'At most {MAX_BATCH_SIZE} activities per batch'}, status=400)
+
+    serializer = FitnessActivitySerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return Response({
+            'error': 'Validation failed',
+            'errors': [
+                {'index': index, 'errors': errors}
+                for index, errors in enumerate(serializer.errors) if errors
+            ]
+        }, status=400)
+
+    created = ingest_activities(request.user, serializer.validated_data)
+    return Response({
+        'created': len(created),
+        'ids': [activity.pk for activity in created]
+    }, status=201)
+
 
+def filter_history(queryset, params):
+    """Apply the start_date / end_date / activity_type filters shared by history and export"""
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
+    activity_type = params.get('activity_type')
 
+    if start_date:
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            queryset = queryset.filter(activity_day__gte=start_date)
+        except ValueError:
+            pass
+
+    if end_date:
+        try:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            queryset = queryset.filter(activity_day__lte=end_date)
+        except ValueError:
+            pass
+
+    if activity_type:
+        queryset = queryset.filter(activity_type=activity_type)
+
+    return queryset
+
+
+@method_decorator(condition(etag_func=user_data_etag), name='get')
 class ActivityHistoryView(generics.ListAPIView):
     serializer_class = FitnessActivitySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        queryset = FitnessActivity.objects.filter(user=self.request.user)
-
-        start_date = self.request.query_params.get('start_date')
-        end_date = self.request.query_params.get('end_date')
-        activity_type = self.request.query_params.get('activity_type')
+        queryset = FitnessActivity.objects.for_user(self.request.user)
+        return filter_history(queryset, self.request.query_params)
 
-        if start_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__date__gte=start_date)
-            except ValueError:
-                pass
 
-        if end_date:
-            try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                queryset = queryset.filter(date__date__lte=end_date)
-            except ValueError:
-                pass
-
-        if activity_type:
-            queryset = queryset.filter(activity_type=activity_type)
-
-        return queryset
+@method_decorator(condition(etag_func=user_data_etag), name='get')
+class ActivityExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, CSVRenderer, NDJSONRenderer]
+    # so an unknown ?format= reaches get() and gets the 400 below
+    content_negotiation_class = ExportContentNegotiation
+
+    def get(self, request):
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in STREAMERS:
+            return Response({'error': 'format must be csv or ndjson'}, status=400)
+
+        queryset = filter_history(FitnessActivity.objects.for_user(request.user), request.query_params)
+        response = StreamingHttpResponse(
+            STREAMERS[export_format](export_rows(queryset)),
+            content_type=CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="activities.{export_format}"'
+        return response
 
 ### -------------------- WORKOUT GOALS --------------------
 
+@method_decorator(condition(etag_func=user_data_etag), name='get')
 class WorkoutGoalListCreateView(generics.ListCreateAPIView):
     serializer_class = WorkoutGoalSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = GoalKeysetPagination
 
     def get_queryset(self):
-        return WorkoutGoal.objects.filter(user=self.request.user)
+        return WorkoutGoal.objects.for_user(self.request.user).select_related('user')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
 
+@method_decorator(condition(etag_func=user_data_etag), name='get')
 class WorkoutGoalDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = WorkoutGoalSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return WorkoutGoal.objects.filter(user=self.request.user)
+        return WorkoutGoal.objects.for_user(self.request.user).select_related('user')
 
 ### -------------------- METRICS & TRENDS --------------------
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=user_data_etag)
+@cached_per_user('metrics')
 def activity_metrics(request):
-    user = request.user
-    period = request.query_params.get('period', 'all')
-
-    queryset = FitnessActivity.objects.filter(user=user)
-    today = timezone.now().date()
-
-    if period == "week":
-        start_date = today - timedelta(days=7)
-        queryset = queryset.filter(date__date__gte=start_date)
-    elif period == "month":
-        start_date = today - timedelta(days=30)
-        queryset = queryset.filter(date__date__gte=start_date)
-    elif period == "year":
-        start_date = today - timedelta(days=365)
-        queryset = queryset.filter(date__date__gte=start_date)
-
-    metrics = queryset.aggregate(
-        total_duration=Sum('duration'),
-        total_distance=Sum('distance'),
-        total_calories=Sum('calories_burned'),
-        activity_count=Count('id'),
-        average_duration=Avg('duration'),
-        average_calories=Avg('calories_burned')
-    )
-    metrics = {k: v or 0 for k, v in metrics.items()}
+    totals = metrics_queryset(request.user, request.query_params.get('period', 'all')).aggregate(**METRIC_TOTALS)
+    return Response(metrics_data(totals))
 
-    serializer = ActivityMetricsSerializer(metrics)
-    return Response(serializer.data)
 
+# ?period= -> days back from the user's today (anything else is all time)
+METRIC_PERIOD_DAYS = {'week': 7, 'month': 30, 'year': 365}
 
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def activity_trends(request):
-    user = request.user
-    trend_type = request.query_params.get('trend_type', 'weekly')
+METRIC_TOTALS = {
+    'total_duration': Sum('total_duration'),
+    'total_distance': Sum('total_distance'),
+    'total_calories': Sum('total_calories'),
+    'activity_count': Sum('activity_count'),
+}
 
-    today = timezone.now().date()
-    trends = []
 
-    if trend_type == 'weekly':
-        for i in range(8):
-            week_start = today - timedelta(weeks=i + 1)
-            week_end = today - timedelta(weeks=i)
+def metrics_queryset(user, period):
+    queryset = DailyActivityRollup.objects.for_user(user)
+    if period in METRIC_PERIOD_DAYS:
+        queryset = queryset.filter(day__gte=user.local_day() - timedelta(days=METRIC_PERIOD_DAYS[period]))
+    return queryset
 
-            activities = FitnessActivity.objects.filter(
-                user=user,
-                date__date__gte=week_start,
-                date__date__lt=week_end
-            )
 
-            metrics = activities.aggregate(
-                total_duration=Sum('duration'),
-                total_calories=Sum('calories_burned'),
-                activity_count=Count('id')
-            )
-
-            trends.append({
-                'period': 'weekly',
-                'total_duration': metrics['total_duration'] or 0,
-                'total_calories': metrics['total_calories'] or 0,
-                'activity_count': metrics['activity_count'] or 0,
-                'date': week_start.strftime('%Y-%m-%d')
-            })
-
-    elif trend_type == 'monthly':
-        for i in range(6):
-            month_start = today.replace(day=1) - timedelta(days=30 * i)
-            month_end = month_start + timedelta(days=30)
-
-            activities = FitnessActivity.objects.filter(
-                user=user,
-                date__date__gte=month_start,
-                date__date__lt=month_end
-            )
+def metrics_data(totals):
+    metrics = {k: v or 0 for k, v in totals.items()}
+    count = metrics['activity_count']
+    metrics['average_duration'] = metrics['total_duration'] / count if count else 0
+    metrics['average_calories'] = metrics['total_calories'] / count if count else 0
+    return ActivityMetricsSerializer(metrics).data
 
-            metrics = activities.aggregate(
-                total_duration=Sum('duration'),
-                total_calories=Sum('calories_burned'),
-                activity_count=Count('id')
-            )
 
-            trends.append({
-                'period': 'monthly',
-                'total_duration': metrics['total_duration'] or 0,
-                'total_calories': metrics['total_calories'] or 0,
-                'activity_count': metrics['activity_count'] or 0,
-                'date': month_start.strftime('%Y-%m')
-            })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@condition(etag_func=user_data_etag)
+@cached_per_user('trends')
+def activity_trends(request):
+    today = request.user.local_day()
+    try:
+        granularity, start_date, end_date = parse_trend_params(request.query_params, today)
+        trends = compute_trends(request.user, granularity, start_date, end_date)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=400)
 
-    trends.reverse()
     serializer = ActivityTrendSerializer(trends, many=True)
     return Response(serializer.data)
 
@@ -195,81 +232,50 @@ def activity_trends(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=user_data_etag)
+@cached_per_user('recent')
 def recent_activities(request):
     user = request.user
     limit = int(request.query_params.get('limit', 10))
-    activities = FitnessActivity.objects.filter(user=user).order_by('-date')[:limit]
+    activities = FitnessActivity.objects.for_user(user).order_by('-date')[:limit]
     serializer = FitnessActivitySerializer(activities, many=True)
 
     return Response({
         'recent_activities': serializer.data,
-        'total_count': FitnessActivity.objects.filter(user=user).count()
+        'total_count': FitnessActivity.objects.for_user(user).count()
     })
 
 ### -------------------- LEADERBOARD --------------------
 
-def update_leaderboard(leaderboard_obj, period):
-    leaderboard_obj.entries.all().delete()
-    today = timezone.now().date()
-
-    if period == "daily":
-        start_date = today
-    elif period == "weekly":
-        start_date = today - timedelta(days=7)
-    elif period == "monthly":
-        start_date = today - timedelta(days=30)
-    else:
-        start_date = None
-
-    profiles = UserProfile.objects.all()
-    entries = []
-
-    for profile in profiles:
-        if start_date:
-            activities = FitnessActivity.objects.filter(
-                user=profile.user,
-                date__date__gte=start_date
-            )
-            calories = activities.aggregate(total=Sum('calories_burned'))['total'] or 0
-            points = (calories // 100) + activities.count()
-            workouts = activities.count()
-            streak = profile.calculate_current_streak()
-        else:
-            points = profile.points
-            calories = profile.total_calories_burned
-            workouts = profile.total_workouts
-            streak = profile.current_streak
-
-        entries.append(LeaderboardEntry(
-            leaderboard=leaderboard_obj,
-            user=profile.user,
-            points=points,
-            calories_burned=calories,
-            workout_count=workouts,
-            streak=streak
-        ))
-
-    entries.sort(key=lambda x: x.points, reverse=True)
-    for rank, entry in enumerate(entries, start=1):
-        entry.rank = rank
-
-    LeaderboardEntry.objects.bulk_create(entries)
+def request_snapshot(request):
+    """The published snapshot for ?period=, looked up once per request"""
+    if not hasattr(request, '_leaderboard_snapshot'):
+        request._leaderboard_snapshot = published_snapshot(request.query_params.get('period', 'weekly'))
+    return request._leaderboard_snapshot
+
+
+def leaderboard_etag(request):
+    # snapshots are immutable once published, so the published id identifies the payload
+    leaderboard_obj = request_snapshot(request)
+    if leaderboard_obj is None:
+        return None
+    renderer = getattr(request, 'accepted_renderer', None)
+    return f"leaderboard-{leaderboard_obj.pk}-{renderer.format if renderer else ''}"
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=leaderboard_etag)
 def leaderboard(request):
-    period = request.query_params.get('period', 'weekly')
+    # snapshots are built by `manage.py build_leaderboards`; this view only reads
+    leaderboard_obj = request_snapshot(request)
+    if leaderboard_obj is None:
+        return Response({'error': 'Leaderboard not found'}, status=404)
 
-    leaderboard_obj, created = Leaderboard.objects.get_or_create(
-        period=period,
-        snapshot_date=timezone.now().date(),
-        defaults={'period': period}
+    prefetch_related_objects(
+        [leaderboard_obj],
+        Prefetch('entries', queryset=LeaderboardEntry.objects.select_related('user'))
     )
-
-    if created or not leaderboard_obj.entries.exists():
-        update_leaderboard(leaderboard_obj, period)
-
     serializer = LeaderboardSerializer(leaderboard_obj)
     return Response(serializer.data)
 
@@ -278,30 +284,78 @@ def leaderboard(request):
 @permission_classes([IsAuthenticated])
 def my_ranking(request):
     period = request.query_params.get('period', 'weekly')
-    leaderboard_obj = Leaderboard.objects.filter(
-        period=period,
-        snapshot_date=timezone.now().date()
-    ).first()
-
-    if not leaderboard_obj:
+    if period not in rank_indexes.indexes:
         return Response({'error': 'Leaderboard not found'}, status=404)
 
-    entry = leaderboard_obj.entries.filter(user=request.user).first()
-    if not entry:
-        return Response({'error': 'User not in leaderboard'}, status=404)
-
-    serializer = LeaderboardEntrySerializer(entry)
-    return Response(serializer.data)
+    # answered from memory; a stale index is rebuilt in the background (see ranking)
+    index = rank_indexes.get(period)
+    data = ranking_data(request.user, index.standing(request.user.pk))
+
+    try:
+        radius = ranking_radius(request.query_params)
+    except ValueError:
+        return Response({'error': 'around must be an integer'}, status=400)
+    if radius is not None:
+        data['around'] = around_data(index.around(request.user.pk, radius))
+
+    return Response(data)
+
+
+def ranking_data(user, standing):
+    return {
+        'rank': standing.rank,
+        'username': user.username,
+        'email': user.email,
+        'points': standing.points,
+        'calories_burned': standing.calories_burned,
+        'workout_count': standing.workout_count,
+        'streak': standing.streak,
+    }
+
+
+def ranking_radius(params):
+    """``?around=`` clamped to 0..50, or None when not asked for"""
+    radius = params.get('around')
+    if not radius:
+        return None
+    return min(max(int(radius), 0), 50)
+
+
+def around_data(neighbours):
+    return [
+        {
+            'rank': row.rank,
+            'username': row.username,
+            'points': row.points,
+        }
+        for row in neighbours
+    ]
 
 ### -------------------- USER PROFILE --------------------
 
+def profile_etag(request):
+    # a forced refresh must always reach the view
+    if request.query_params.get('refresh'):
+        return None
+    return user_data_etag(request)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=profile_etag)
+@cached_per_user('profile', bypass_params=['refresh'])
 def user_profile(request):
-    profile, created = UserProfile.objects.get_or_create(user=request.user)
+    profile, created = UserProfile.objects.for_user(request.user).get_or_create(user=request.user)
 
     if created or request.query_params.get('refresh'):
         profile.update_stats()
 
     serializer = UserProfileSeriallizer(profile)
     return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Response cache hits and misses per endpoint, for the worker serving this request"""
+    return Response(cache_counts())
@@ -0,0 +1,138 @@
+"""
+Activity insert latency while leaderboards are rebuilt in a loop, with the
+leaderboards in the primary database file and with them in their own
+``ANALYTICS_DATABASE`` file. Every mode runs in its own process, since the
+analytics database is set up when settings load.
+
+The builder rebuilds every period back to back for the whole run while 4
+writer threads insert activities for their own users. Reported: inserts/s,
+median / p99 / worst insert latency, "database is locked" failures and how
+many snapshots the builder published.
+
+    python -m benchmarks.analytics [USERS] [SECONDS]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+WRITERS = 4
+
+
+def seed(users):
+    from django.test import override_settings
+
+    from activities.ingest import ingest_activities
+    from benchmarks.harness import make_user
+
+    items = [
+        {'activity_type': 'running', 'duration': 30, 'calories_burned': 100 + index * 7 % 500, 'distance': 5.0}
+        for index in range(20)
+    ]
+    # the default hasher would spend most of the setup on password hashing
+    with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+        for index in range(users):
+            ingest_activities(make_user(index), items)
+
+
+def measure(users, seconds):
+    """Runs in the child process; prints one JSON line"""
+    from benchmarks.harness import test_database
+
+    from django.core.management import call_command
+    from django.db import OperationalError, connections
+
+    from activities.analytics import ANALYTICS_DB, analytics_enabled, sync_analytics
+    from activities.leaderboard import build_snapshot
+    from activities.models import FitnessActivity, Leaderboard
+    from users.models import CustomerRegister
+
+    with test_database(os.path.join(os.environ['BENCH_DIR'], 'bench.sqlite3')):
+        if analytics_enabled():
+            call_command('migrate', database=ANALYTICS_DB, verbosity=0)
+        seed(users)
+        if analytics_enabled():
+            sync_analytics()
+        writers = list(CustomerRegister.objects.order_by('pk')[:WRITERS])
+        connections.close_all()  # the threads open their own
+
+        stop = threading.Event()
+        builds, latencies, failures = [], [], []
+
+        def build():
+            try:
+                while not stop.is_set():
+                    for period, _ in Leaderboard.PERIOD_CHOICES:
+                        build_snapshot(period)
+                        builds.append(period)
+            finally:
+                connections.close_all()
+
+        def write(user):
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        FitnessActivity.objects.create(
+                            user=user, activity_type='running', duration=30, calories_burned=300, distance=5.0,
+                        )
+                        latencies.append(time.perf_counter() - started)
+                    except OperationalError:
+                        failures.append(user.pk)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=build)]
+        threads += [threading.Thread(target=write, args=(user,)) for user in writers]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        print(json.dumps({
+            'inserts': len(latencies), 'failures': len(failures), 'builds': len(builds),
+            'p50': cuts[49] * 1000, 'p99': cuts[98] * 1000, 'max': max(latencies) * 1000,
+        }))
+
+
+def run_mode(analytics, users, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'BENCH_DIR': directory}
+        env.pop('ANALYTICS_DATABASE', None)
+        if analytics:
+            env['ANALYTICS_DATABASE'] = os.path.join(directory, 'analytics.sqlite3')
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.analytics', '--measure', str(users), str(seconds)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(users, seconds):
+    from benchmarks.harness import report
+
+    rows = []
+    for label, analytics in [('leaderboards in the primary database', False), ('ANALYTICS_DATABASE set', True)]:
+        result = run_mode(analytics, users, seconds)
+        rows += [
+            (label, ''),
+            ('  inserts/s', f"{result['inserts'] / seconds:.0f}"),
+            ('  insert latency p50 / p99 / max (ms)', f"{result['p50']:.1f} / {result['p99']:.1f} / {result['max']:.0f}"),
+            ('  failed with "database is locked"', result['failures']),
+            ('  snapshots published', result['builds']),
+        ]
+    report(f"{WRITERS} writers during back-to-back leaderboard rebuilds, {users} users, {seconds}s", rows)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, float(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,156 @@
+"""
+One worker process's worth of concurrent requests, served as a gunicorn
+worker serves them (WSGI with ``threads`` threads, see gunicorn.conf.py) and as
+an ASGI server would with ``ASYNC_READ_VIEWS=True`` (one event loop).
+
+Everything is real: a SQLite file, the locmem response cache, the full
+middleware stack. Two workloads:
+
+* GET /api/activities/metrics/, which has an async view in ASGI mode
+* POST /api/activities/, which stays a sync view and under ASGI runs on the
+  worker's one ``thread_sensitive`` thread, like every other sync endpoint
+
+Reported per mode: wall time, requests/second, and the peak number of SQL
+statements executing at the same moment, which is the concurrency the server
+actually got (the clients are always all in flight at once). In Django 4.2 the
+async ORM and cache calls are ``sync_to_async(thread_sensitive=True)``, so the
+async views cannot run more than one statement at a time per worker.
+
+    python -m benchmarks.async_reads [CLIENTS]
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from benchmarks.harness import make_user, report, test_database, timer
+
+from django.db.backends import utils  # noqa: E402
+
+# threads per sync worker (gunicorn.conf.py)
+SYNC_THREADS = 4
+
+ACTIVITY = {'activity_type': 'running', 'duration': 30, 'calories_burned': 300, 'distance': 5.0}
+
+
+class Concurrency:
+    """Peak number of SQL statements running at once, across every thread"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current = self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.current -= 1
+
+    def patch(self):
+        execute = utils.CursorWrapper._execute
+
+        def counted(cursor, *args, **kwargs):
+            with self:
+                return execute(cursor, *args, **kwargs)
+        return mock.patch.object(utils.CursorWrapper, '_execute', counted)
+
+
+def run_sync(method, url, token, clients):
+    from django.test import Client
+
+    client = Client()
+    headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def send(_):
+        if method == 'post':
+            response = client.post(url, ACTIVITY, content_type='application/json', **headers)
+        else:
+            response = client.get(url, **headers)
+        assert response.status_code < 300, response.status_code
+
+    with ThreadPoolExecutor(SYNC_THREADS) as pool, timer() as elapsed:
+        list(pool.map(send, range(clients)))
+    return elapsed['seconds']
+
+
+def run_async(method, url, token, clients):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    headers = {'Authorization': f'Bearer {token}'}
+
+    async def send():
+        if method == 'post':
+            response = await client.post(url, ACTIVITY, content_type='application/json', headers=headers)
+        else:
+            response = await client.get(url, headers=headers)
+        assert response.status_code < 300, response.status_code
+
+    async def burst():
+        await asyncio.gather(*(send() for _ in range(clients)))
+
+    with timer() as elapsed:
+        asyncio.run(burst())
+    return elapsed['seconds']
+
+
+def main(clients):
+    from django.conf import settings
+    from django.test import override_settings
+    from django.urls import clear_url_caches
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    import activities.urls
+    import fitness_tracker.urls
+    from activities.models import FitnessActivity
+    from users.authentication import user_cache
+
+    sync_middleware = list(settings.MIDDLEWARE)
+    async_middleware = [m for m in sync_middleware if m != 'whitenoise.middleware.WhiteNoiseMiddleware']
+
+    def serve(async_views):
+        # what settings.py and urls.py decide at import time from ASYNC_READ_VIEWS
+        settings.MIDDLEWARE = async_middleware if async_views else sync_middleware
+        with override_settings(ASYNC_READ_VIEWS=async_views):
+            importlib.reload(activities.urls)
+            importlib.reload(fitness_tracker.urls)
+            clear_url_caches()
+
+    with tempfile.TemporaryDirectory() as directory, test_database(os.path.join(directory, 'bench.sqlite3')):
+        user = make_user()
+        for _ in range(20):
+            FitnessActivity.objects.create(user=user, **ACTIVITY)
+        token = str(RefreshToken.for_user(user).access_token)
+
+        rows = []
+        for method, url in [('get', '/api/activities/metrics/'), ('post', '/api/activities/')]:
+            for label, async_views, run in [(f'WSGI, {SYNC_THREADS} threads', False, run_sync),
+                                            ('ASGI, one event loop', True, run_async)]:
+                serve(async_views)
+                user_cache.clear()
+                run(method, url, token, 1)  # warm the response cache and the JWT user cache
+                concurrency = Concurrency()
+                with concurrency.patch():
+                    seconds = run(method, url, token, clients)
+                rows += [
+                    (f'{method.upper()} {url}, {label}', ''),
+                    ('  wall time (ms)', f"{seconds * 1000:.0f}"),
+                    ('  req/s', f"{clients / seconds:.0f}"),
+                    ('  peak SQL statements running at once', concurrency.peak),
+                ]
+        serve(False)
+        report(f"{clients} concurrent requests against one worker", rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('clients', nargs='?', type=int, default=200)
+    args = parser.parse_args()
+    main(args.clients)
@@ -0,0 +1,58 @@
+"""
+Requests/second on GET /api/activities/recent/ with a real JWT, with the
+user cache of ``CachedJWTAuthentication`` switched off (TTL 0, which is the
+stock ``JWTAuthentication`` lookup) and on.
+
+    python -m benchmarks.auth [REQUESTS]
+"""
+import sys
+
+from benchmarks.harness import make_user, report, test_database, timer
+
+
+def run(client, count):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries, timer() as elapsed:
+        for _ in range(count):
+            assert client.get('/api/activities/recent/').status_code == 200
+    return count / elapsed['seconds'], len(queries) / count
+
+
+def main(count):
+    from django.test import override_settings
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from activities.models import FitnessActivity
+    from users.authentication import user_cache
+
+    with test_database():
+        user = make_user()
+        for i in range(20):
+            FitnessActivity.objects.create(user=user, activity_type='running', duration=30,
+                                           calories_burned=300, distance=5.0, date=timezone.now())
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        client.get('/api/activities/recent/')  # warm the response cache
+
+        with override_settings(JWT_USER_CACHE_TTL=0):
+            user_cache.clear()
+            uncached_rps, uncached_queries = run(client, count)
+        with override_settings(JWT_USER_CACHE_TTL=60):
+            user_cache.clear()
+            cached_rps, cached_queries = run(client, count)
+
+        report(f"{count} authenticated GETs of /api/activities/recent/", [
+            ('user lookup per request (req/s)', f"{uncached_rps:.0f}"),
+            ('  queries per request', f"{uncached_queries:.2f}"),
+            ('cached JWT user (req/s)', f"{cached_rps:.0f}"),
+            ('  queries per request', f"{cached_queries:.2f}"),
+            ('speed-up', f"{cached_rps / uncached_rps:.2f}x"),
+        ])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
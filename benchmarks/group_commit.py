@@ -0,0 +1,82 @@
+"""
+Activity inserts per second from 8, 32 and 128 concurrent writers on a
+database file: each writer saving its own activities (signals, one commit per
+statement) versus handing them to the group-commit writer thread.
+
+Uses whichever backend the environment selects, so compare e.g.
+
+    python -m benchmarks.group_commit [INSERTS]
+    SQLITE_TUNED=True python -m benchmarks.group_commit [INSERTS]
+"""
+import os
+import sys
+import tempfile
+import threading
+
+from benchmarks.harness import make_user, report, test_database, timer
+
+WRITERS = (8, 32, 128)
+
+
+def hammer(users, inserts, insert):
+    from django.db import OperationalError, connection
+
+    failures = []
+    per_writer = max(inserts // len(users), 1)
+
+    def write(user):
+        try:
+            for _ in range(per_writer):
+                try:
+                    insert(user)
+                except OperationalError:
+                    failures.append(user.pk)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=write, args=(user,)) for user in users]
+    with timer() as elapsed:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return per_writer * len(users) / elapsed['seconds'], len(failures)
+
+
+def main(inserts):
+    from django.db import connection
+
+    from activities.group_commit import ActivityWriter
+    from activities.models import FitnessActivity
+
+    def fields(user):
+        return dict(user=user, activity_type='running', duration=30, calories_burned=300, distance=5.0)
+
+    def save(user):
+        FitnessActivity.objects.create(**fields(user))
+
+    writer = ActivityWriter()
+
+    def grouped(user):
+        writer.submit(FitnessActivity(**fields(user)))
+
+    with tempfile.TemporaryDirectory() as directory, test_database(os.path.join(directory, 'bench.sqlite3')):
+        users = [make_user(index) for index in range(max(WRITERS))]
+        backend = connection.settings_dict['ENGINE']
+        connection.close()
+
+        rows = []
+        for count in WRITERS:
+            saved_rate, saved_failures = hammer(users[:count], inserts, save)
+            grouped_rate, grouped_failures = hammer(users[:count], inserts, grouped)
+            rows += [
+                (f'{count} writers', ''),
+                ('  own commit (inserts/s)', f"{saved_rate:.0f}  ({saved_failures} locked)"),
+                ('  group commit (inserts/s)', f"{grouped_rate:.0f}  ({grouped_failures} locked)"),
+                ('  speed-up', f"{grouped_rate / saved_rate:.1f}x"),
+            ]
+        report(f"~{inserts} activity inserts per run, {backend}", rows)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1024)
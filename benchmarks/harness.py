@@ -0,0 +1,60 @@
+"""
+Shared setup for the benchmark scripts.
+
+Each script is run from the project root, e.g. ``python -m benchmarks.ingest``,
+and works against a throwaway test database so the real ``db.sqlite3`` is
+never touched.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitness_tracker.settings')
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+
+@contextmanager
+def test_database(name=None):
+    """A migrated throwaway database; in memory unless ``name`` gives a file path"""
+    setup_test_environment()
+    if name:
+        connection.settings_dict['TEST']['NAME'] = name
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def make_user(index=0):
+    from users.models import CustomerRegister
+    return CustomerRegister.objects.create_user(
+        email=f'bench{index}@example.com',
+        username=f'bench{index}',
+        password='benchpass123',
+        height=175.0,
+        weight=70.0,
+    )
+
+
+@contextmanager
+def timer():
+    result = {}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - started
+
+
+def report(title, rows):
+    print(title)
+    for label, value in rows:
+        print(f"  {label:<40} {value}")
@@ -0,0 +1,53 @@
+"""
+Throughput of activity ingest: N single POSTs to /api/activities/ versus one
+POST of the same N activities to /api/activities/batch/.
+
+    python -m benchmarks.ingest [N]
+"""
+import sys
+from datetime import timedelta
+
+from benchmarks.harness import make_user, report, test_database, timer
+
+
+def payload(count):
+    from django.utils import timezone
+    now = timezone.now()
+    return [
+        {
+            'activity_type': ['running', 'cycling', 'yoga'][i % 3],
+            'duration': 30 + i % 40,
+            'calories_burned': 200 + i % 300,
+            'distance': 5.0,
+            'date': (now - timedelta(hours=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def main(count):
+    from rest_framework.test import APIClient
+
+    with test_database():
+        items = payload(count)
+
+        single = APIClient()
+        single.force_authenticate(make_user(0))
+        with timer() as one_by_one:
+            for item in items:
+                assert single.post('/api/activities/', item, format='json').status_code == 201
+
+        batch = APIClient()
+        batch.force_authenticate(make_user(1))
+        with timer() as batched:
+            assert batch.post('/api/activities/batch/', items, format='json').status_code == 201
+
+        report(f"Ingesting {count} activities", [
+            ('single POSTs (activities/s)', f"{count / one_by_one['seconds']:.0f}"),
+            ('batch POST (activities/s)', f"{count / batched['seconds']:.0f}"),
+            ('speed-up', f"{one_by_one['seconds'] / batched['seconds']:.1f}x"),
+        ])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,93 @@
+"""
+Activity inserts per second from 16 concurrent writers (one user each) with
+everything in one database file, and with the per-user data spread over
+``ACTIVITY_SHARDS`` files. Every mode runs in its own process, since the shard
+databases are set up when settings load. Reported: inserts/second, and inserts
+that failed with "database is locked".
+
+    python -m benchmarks.sharding [INSERTS_PER_WRITER]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+WRITERS = 16
+SHARDS = (0, 2, 4)
+
+
+def writer(user, inserts, failures):
+    from django.db import OperationalError, connections
+
+    from activities.models import FitnessActivity
+
+    try:
+        for _ in range(inserts):
+            try:
+                FitnessActivity.objects.create(
+                    user=user, activity_type='running', duration=30, calories_burned=300, distance=5.0,
+                )
+            except OperationalError:
+                failures.append(user.pk)
+    finally:
+        connections.close_all()
+
+
+def measure(inserts):
+    """Runs in the child process; prints one JSON line"""
+    from benchmarks.harness import make_user, test_database, timer
+
+    from django.core.management import call_command
+    from django.db import connections
+
+    from activities.sharding import shard_aliases, shard_count
+
+    with test_database(os.path.join(os.environ['ACTIVITY_SHARD_DIR'], 'bench.sqlite3')):
+        if shard_count():
+            for alias in shard_aliases():
+                call_command('migrate', database=alias, verbosity=0)
+        users = [make_user(index) for index in range(WRITERS)]
+        connections.close_all()  # the threads open their own
+
+        failures = []
+        threads = [threading.Thread(target=writer, args=(user, inserts, failures)) for user in users]
+        with timer() as elapsed:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        print(json.dumps({'seconds': elapsed['seconds'], 'failures': len(failures)}))
+
+
+def run_mode(shards, inserts):
+    with tempfile.TemporaryDirectory() as directory:
+        env = {**os.environ, 'ACTIVITY_SHARDS': str(shards), 'ACTIVITY_SHARD_DIR': directory}
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.sharding', '--measure', str(inserts)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(inserts):
+    from benchmarks.harness import report
+
+    total = WRITERS * inserts
+    rows = []
+    for shards in SHARDS:
+        result = run_mode(shards, inserts)
+        rows += [
+            (f'ACTIVITY_SHARDS={shards}', ''),
+            ('  inserts/s', f"{total / result['seconds']:.0f}"),
+            ('  failed with "database is locked"', result['failures']),
+        ]
+    report(f"{WRITERS} writers x {inserts} activity inserts, on database files", rows)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(int(sys.argv[2]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
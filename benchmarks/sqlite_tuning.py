@@ -0,0 +1,98 @@
+"""
+Mixed read/write load on a database file from 8 threads (gunicorn's 2 x 4),
+with the stock SQLite backend and with ``SQLITE_TUNED=True``.
+
+Each thread is a user posting an activity on every fifth request and reading
+their metrics and recent activities otherwise, through the real API. Every
+mode runs in its own process, since the backend is picked when settings load.
+Reported: requests/second, and requests that failed with "database is locked".
+
+    python -m benchmarks.sqlite_tuning [REQUESTS_PER_THREAD]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+
+THREADS = 8
+WRITE_EVERY = 5
+
+
+def worker(index, requests, failures):
+    from django.db import OperationalError, connection
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    from users.models import CustomerRegister
+
+    user = CustomerRegister.objects.get(username=f'bench{index}')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    try:
+        for i in range(requests):
+            try:
+                if i % WRITE_EVERY == 0:
+                    response = client.post('/api/activities/', {
+                        'activity_type': 'running', 'duration': 30, 'calories_burned': 300, 'distance': 5.0,
+                    }, format='json')
+                else:
+                    response = client.get('/api/activities/metrics/' if i % 2 else '/api/activities/recent/')
+                if response.status_code >= 500:
+                    failures.append(i)
+            except OperationalError:
+                failures.append(i)
+    finally:
+        connection.close()
+
+
+def measure(requests):
+    """Runs in the child process; prints one JSON line"""
+    from benchmarks.harness import make_user, test_database, timer
+
+    with tempfile.TemporaryDirectory() as directory, test_database(os.path.join(directory, 'bench.sqlite3')):
+        from django.db import connection
+        for index in range(THREADS):
+            make_user(index)
+        connection.close()  # the threads open their own
+
+        failures = []
+        threads = [threading.Thread(target=worker, args=(index, requests, failures)) for index in range(THREADS)]
+        with timer() as elapsed:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        print(json.dumps({'seconds': elapsed['seconds'], 'failures': len(failures)}))
+
+
+def run_mode(tuned, requests):
+    env = {**os.environ, 'SQLITE_TUNED': str(tuned)}
+    output = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.sqlite_tuning', '--measure', str(requests)],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(requests):
+    from benchmarks.harness import report
+
+    total = THREADS * requests
+    rows = []
+    for label, tuned in [('stock sqlite3 backend', False), ('SQLITE_TUNED=True', True)]:
+        result = run_mode(tuned, requests)
+        rows += [
+            (label, ''),
+            ('  req/s', f"{total / result['seconds']:.0f}"),
+            ('  failed with "database is locked"', result['failures']),
+        ]
+    report(f"{THREADS} threads x {requests} requests, 1 in {WRITE_EVERY} a write, on a database file", rows)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        measure(int(sys.argv[2]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -9,6 +9,14 @@ python manage.py makemigrations
 
 echo "=== Applying migrations ==="
 python manage.py migrate
+# per-user data shards (ACTIVITY_SHARDS, see activities/sharding.py)
+for i in $(seq 0 $(( ${ACTIVITY_SHARDS:-0} - 1 ))); do
+    python manage.py migrate --database shard$i
+done
+# leaderboard database (ANALYTICS_DATABASE, see activities/analytics.py)
+if [ -n "${ANALYTICS_DATABASE:-}" ]; then
+    python manage.py migrate --database analytics
+fi
 
 echo "=== Collecting static files ==="
 python manage.py collectstatic --noinput --clear
@@ -17,7 +25,16 @@ echo "=== Creating startup script ==="
 # Create a simple start script
 cat > start.sh << EOF
 #!/bin/bash
-exec gunicorn fitness_tracker.wsgi:application --bind 0.0.0.0:\${PORT:-10000}
+# WAL, busy timeout and persistent connections so the worker threads stop tripping "database is locked"
+export SQLITE_TUNED=\${SQLITE_TUNED:-True}
+# Leaderboard snapshots are built in the background, never inside a request
+python manage.py build_leaderboards --loop --interval \${LEADERBOARD_INTERVAL:-300} &
+# Streak and goal recomputes run in the job worker, coalesced per user, after the request returns
+export ACTIVITY_JOBS_INLINE=\${ACTIVITY_JOBS_INLINE:-False}
+python manage.py run_activity_jobs --loop &
+# ASYNC_READ_VIEWS=True switches to the ASGI app on uvicorn workers (gunicorn.conf.py picks the worker class)
+if [ "\${ASYNC_READ_VIEWS:-False}" = "True" ]; then APP=fitness_tracker.asgi:application; else APP=fitness_tracker.wsgi:application; fi
+exec gunicorn \$APP --bind 0.0.0.0:\${PORT:-10000}
 EOF
 
 chmod +x start.sh
@@ -75,6 +75,33 @@ DATABASES = {
     }
 }
 
+# SQLITE_TUNED=True: WAL, busy timeout, BEGIN IMMEDIATE and the other pragmas in fitness_tracker/sqlite3,
+# with connections kept open for CONN_MAX_AGE seconds rather than reopened (and re-tuned) per request
+if os.environ.get('SQLITE_TUNED', 'False') == 'True':
+    DATABASES['default'].update({
+        'ENGINE': 'fitness_tracker.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    })
+
+# ACTIVITY_SHARDS=N: activities, goals, profiles, rollups and activity jobs live in N SQLite files
+# (shard0 .. shardN-1) picked by user id, so writers for different users stop sharing one lock;
+# users, leaderboards and the rest stay in default. Each shard needs `migrate --database shardK`,
+# and `reshard --from OLD_N` moves existing rows after the count changes (see activities/sharding.py)
+ACTIVITY_SHARDS = int(os.environ.get('ACTIVITY_SHARDS', 0))
+ACTIVITY_SHARD_DIR = os.environ.get('ACTIVITY_SHARD_DIR', BASE_DIR)
+for index in range(ACTIVITY_SHARDS):
+    DATABASES[f'shard{index}'] = {**DATABASES['default'], 'NAME': Path(ACTIVITY_SHARD_DIR) / f'shard{index}.sqlite3'}
+DATABASE_ROUTERS = ['activities.sharding.UserShardRouter'] if ACTIVITY_SHARDS else []
+
+# ANALYTICS_DATABASE=path: leaderboards live in their own SQLite file and are built there from copies of
+# the profile totals and daily rollups, synced incrementally by build_leaderboards / sync_analytics, so a
+# rebuild never locks the database the activity writes go to. Needs `migrate --database analytics`
+ANALYTICS_DATABASE = os.environ.get('ANALYTICS_DATABASE')
+if ANALYTICS_DATABASE:
+    DATABASES['analytics'] = {**DATABASES['default'], 'NAME': ANALYTICS_DATABASE}
+    DATABASE_ROUTERS = ['activities.analytics.AnalyticsRouter', *DATABASE_ROUTERS]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -105,7 +132,7 @@ AUTH_USER_MODEL = 'users.CustomerRegister'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -113,6 +140,11 @@ REST_FRAMEWORK = {
     ),
 }
 
+# one lookup matching the login against email or username, case-insensitively
+AUTHENTICATION_BACKENDS = [
+    'users.backends.EmailOrUsernameBackend',
+]
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -120,6 +152,49 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
+# seconds a worker trusts its cached copy of a JWT user's row (0 turns the cache off)
+JWT_USER_CACHE_TTL = int(os.environ.get('JWT_USER_CACHE_TTL', 30))
+
+# Google sign-in: id_tokens must be issued to one of these OAuth client ids (unset refuses id_token logins)
+GOOGLE_CLIENT_IDS = [cid for cid in os.environ.get('GOOGLE_CLIENT_IDS', '').split(',') if cid]
+# (connect, read) seconds for calls to Google's certs and userinfo endpoints
+GOOGLE_HTTP_TIMEOUT = (3, 5)
+
+# seconds before an in-memory leaderboard rank index is rebuilt to pick up other workers' writes
+RANK_INDEX_MAX_AGE = int(os.environ.get('RANK_INDEX_MAX_AGE', 300))
+
+# seconds after which an unpublished leaderboard snapshot counts as a crashed build and is deleted
+LEADERBOARD_ABANDONED_AFTER = int(os.environ.get('LEADERBOARD_ABANDONED_AFTER', 3600))
+
+# streak and goal recomputes after activity writes: inline in the request, or queued for the
+# run_activity_jobs worker and coalesced per user over ACTIVITY_JOBS_COALESCE_SECONDS
+ACTIVITY_JOBS_INLINE = os.environ.get('ACTIVITY_JOBS_INLINE', 'True') == 'True'
+ACTIVITY_JOBS_COALESCE_SECONDS = int(os.environ.get('ACTIVITY_JOBS_COALESCE_SECONDS', 5))
+
+# serve metrics, recent, leaderboard, my-ranking and profile from the async views, for running
+# fitness_tracker.asgi under an ASGI server. Not faster on this stack: the async ORM and cache calls
+# and every other (sync) endpoint share one thread per worker (see gunicorn.conf.py, benchmarks/async_reads.py)
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+if ASYNC_READ_VIEWS:
+    # WhiteNoise's middleware is sync-only and would funnel every async request through one
+    # thread; asgi.py serves static files instead
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
+# POST /api/activities/ hands its insert to one writer thread per process, which commits everything that
+# arrived within ACTIVITY_GROUP_COMMIT_WINDOW_MS of the first request in one transaction
+ACTIVITY_GROUP_COMMIT = os.environ.get('ACTIVITY_GROUP_COMMIT', 'False') == 'True'
+ACTIVITY_GROUP_COMMIT_WINDOW_MS = float(os.environ.get('ACTIVITY_GROUP_COMMIT_WINDOW_MS', 2))
+
+# locmem by default; point CACHE_BACKEND/CACHE_LOCATION at e.g. FileBasedCache to share between workers
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'fitness-tracker'),
+    }
+}
+# dashboard responses are keyed on the user's data version, so this only bounds memory, not staleness
+RESPONSE_CACHE_TIMEOUT = int(os.environ.get('RESPONSE_CACHE_TIMEOUT', 300))
+
 SITE_ID = 1
 ACCOUNT_EMAIL_REQUIRED = True
 ACCOUNT_USERNAME_REQUIRED = True
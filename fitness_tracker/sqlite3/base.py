@@ -0,0 +1,60 @@
+"""
+SQLite backend tuned for several worker threads writing to one database file.
+
+Selected with ``SQLITE_TUNED=True`` (see settings). On every new connection it
+applies the ``pragmas`` from ``DATABASES['default']['OPTIONS']``, by default:
+
+- ``journal_mode=WAL``: readers no longer block behind a writer, or it behind them
+- ``busy_timeout``: a writer waits for the lock instead of failing with "database is locked"
+- ``synchronous=NORMAL``: durable at each WAL checkpoint rather than each commit, safe in WAL mode
+- ``mmap_size``, ``cache_size``, ``temp_store``: fewer read syscalls, larger page cache, temp b-trees in memory
+- ``auto_vacuum=INCREMENTAL``: lets ``manage.py dbmaintain`` hand free pages back (new databases only)
+
+Transactions start with ``BEGIN IMMEDIATE`` (``transaction_mode``), taking the
+write lock up front. A deferred transaction that reads and then writes cannot
+wait out the busy timeout when another writer got there first; SQLite fails
+it immediately, which is where most "database is locked" errors come from.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,           # ms; first, so the pragmas below wait for locks too
+    'auto_vacuum': 'INCREMENTAL',   # before journal_mode: it only applies until the first table exists
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+    'cache_size': -64 * 1024,       # negative: KiB, so 64 MiB
+    'temp_store': 'MEMORY',
+}
+
+
+def _settled(conn, name, value):
+    """
+    Whether a setting stored in the database file needs no change. Setting these takes a
+    lock even when nothing changes, which a connection opened mid-write would wait on.
+    """
+    if name == 'journal_mode':
+        return conn.execute('PRAGMA journal_mode').fetchone()[0] == str(value).lower()
+    if name == 'auto_vacuum':
+        # only takes effect on an empty file; after that it needs a VACUUM (see dbmaintain)
+        return conn.execute('PRAGMA page_count').fetchone()[0] > 0
+    return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # our own options; sqlite3.connect() would reject them
+        self.pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = params.pop('transaction_mode', 'IMMEDIATE')
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if not _settled(conn, name, value):
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}' if self.transaction_mode else 'BEGIN')
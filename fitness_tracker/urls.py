@@ -17,9 +17,11 @@ def home(request):
                 'docs': {
                     'list_create': 'GET/POST /api/activities/activities/',
                     'detail': 'GET/PUT/DELETE /api/activities/activities/{id}/',
+                    'batch': 'POST /api/activities/batch/ (JSON array or application/x-ndjson)',
                     'history': 'GET /api/activities/history/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&activity_type=running',
+                    'export': 'GET /api/activities/export/?format=csv|ndjson&start_date=YYYY-MM-DD&end_date=YYYY-MM-DD&activity_type=running',
                     'metrics': 'GET /api/activities/metrics/?period=week|month|year|all',
-                    'trends': 'GET /api/activities/trends/?trend_type=weekly|monthly',
+                    'trends': 'GET /api/activities/trends/?granularity=day|week|month|year&start=YYYY-MM-DD&end=YYYY-MM-DD',
                     'recent': 'GET /api/activities/recent/?limit=10',
                 }
             },
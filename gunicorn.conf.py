@@ -1,6 +1,21 @@
+import os
+
+# Always WSGI. Under an ASGI worker Django 4.2 runs every sync view and middleware, and every
+# async ORM/cache call, on one thread per worker, so ASYNC_READ_VIEWS is slower here than
+# 4 threads (python -m benchmarks.async_reads); it is only meant for running
+# fitness_tracker.asgi under an ASGI server directly
+if os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True':
+    raise RuntimeError("ASYNC_READ_VIEWS needs an ASGI server; unset it for gunicorn's WSGI workers")
+
 bind = "0.0.0.0:10000"    # Listen on all networks, port 10000
 workers = 2                # Run 2 copies of your app
 threads = 4                # Each copy can handle 4 requests
 worker_class = "sync"      # How to handle requests
 worker_connections = 1000  # Maximum connections
-timeout = 120              # Wait 2 minutes before timing out
\ No newline at end of file
+timeout = 120              # Wait 2 minutes before timing out
+
+
+def post_worker_init(worker):
+    # Build the in-memory leaderboard rank indexes before taking traffic
+    from activities.ranking import rank_indexes
+    rank_indexes.warm()
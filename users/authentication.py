@@ -0,0 +1,125 @@
+"""
+JWT authentication with an in-process user cache.
+
+``JWTAuthentication`` loads the user row on every request. Here the row's
+column values are kept per worker process for ``JWT_USER_CACHE_TTL`` seconds
+and each request gets a fresh ``CustomerRegister`` built from them, so a view
+mutating ``request.user`` cannot leak into the next request. Saving or
+deleting a user drops their entry in this process straight away; other
+processes pick the change up when the TTL runs out, so keep it short. The
+active-user and revoked-token checks run on every request, cached or not.
+
+``aauthenticate`` is the same for async views: a cache hit is answered on the
+event loop, and only a miss goes to a thread for the lookup.
+"""
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import CustomerRegister
+
+
+class UserCache:
+    """
+    User column values by str(pk), since token claims and model pks do not always agree on type.
+    Entries are kept in expiry order, so expired ones are pruned from the front on every put
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.rows = {}
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.rows.get(str(user_id))
+            if entry is not None and entry[0] < time.monotonic():
+                del self.rows[str(user_id)]
+                entry = None
+        if entry is None:
+            return None
+        _, field_names, values = entry
+        return CustomerRegister.from_db(CustomerRegister.objects.db, field_names, values)
+
+    def put(self, user):
+        ttl = getattr(settings, 'JWT_USER_CACHE_TTL', 30)
+        if ttl <= 0:
+            return
+        field_names = [field.attname for field in CustomerRegister._meta.concrete_fields]
+        values = [getattr(user, name) for name in field_names]
+        now = time.monotonic()
+        with self.lock:
+            for key, entry in list(self.rows.items()):
+                if entry[0] >= now:
+                    break
+                del self.rows[key]
+            # re-inserted at the end, behind everything that expires sooner
+            self.rows.pop(str(user.pk), None)
+            self.rows[str(user.pk)] = (now + ttl, field_names, values)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.rows.pop(str(user_id), None)
+
+    def clear(self):
+        with self.lock:
+            self.rows.clear()
+
+
+user_cache = UserCache()
+
+
+@receiver(post_save, sender=CustomerRegister)
+@receiver(post_delete, sender=CustomerRegister)
+def forget_cached_user(sender, instance, **kwargs):
+    user_cache.discard(instance.pk)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user = user_cache.get(self.token_user_id(validated_token))
+        if user is None:
+            # the parent does the lookup and the same checks as below
+            user = super().get_user(validated_token)
+            user_cache.put(user)
+            return user
+        return self.check_user(user, validated_token)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+
+        user = user_cache.get(self.token_user_id(validated_token))
+        if user is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        else:
+            user = self.check_user(user, validated_token)
+        return user, validated_token
+
+    def token_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def check_user(self, user, validated_token):
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,43 @@
+"""
+Email-or-username authentication in one lookup.
+
+The login is matched case-insensitively against both email and username in a
+single query served by the unique indexes on their normalized columns, and the
+password hash is checked at most once. Unknown logins still pay for one hash
+so a failed login takes the same time whether or not the account exists.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
+
+from .models import normalize_login
+
+UserModel = get_user_model()
+
+
+def login_candidates(login):
+    return UserModel._default_manager.filter(Q(email_normalized=login) | Q(username_normalized=login))
+
+
+def find_login_candidate(login):
+    """The user a login string refers to: an email match wins over a username match"""
+    login = normalize_login(login)
+    candidates = list(login_candidates(login)[:2])
+    candidates.sort(key=lambda user: user.email_normalized != login)
+    return candidates[0] if candidates else None
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        login = username if username is not None else kwargs.get(UserModel.USERNAME_FIELD)
+        if login is None or password is None:
+            return None
+
+        user = find_login_candidate(login)
+        if user is None:
+            # same cost as a real check, so response time does not reveal which accounts exist
+            UserModel().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,142 @@
+"""
+Google sign-in without a network round trip per login.
+
+``id_token``s are JWTs signed with Google's published keys, so they are
+verified here: signature, expiry, issuer and audience. The audience must be
+one of ``GOOGLE_CLIENT_IDS``; with none configured ``id_token`` login is
+refused, since a token issued to any other Google client would pass. The
+signing keys are fetched from ``GOOGLE_CERTS_URL`` and kept per worker
+process for as long as the response's ``Cache-Control: max-age`` allows; a
+token signed with a key we have not seen triggers an early refetch, at most
+once per ``KEY_REFETCH_SECONDS``, to pick up a rotation.
+
+``access_token``s cannot be checked offline and still go to the userinfo
+endpoint, over one pooled session with connect/read timeouts so a slow Google
+cannot hold a worker indefinitely.
+"""
+import re
+import threading
+import time
+
+import jwt
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+DEFAULT_CERTS_URL = 'https://www.googleapis.com/oauth2/v3/certs'
+DEFAULT_USERINFO_URL = 'https://www.googleapis.com/oauth2/v3/userinfo'
+
+# used when the certs response carries no max-age
+DEFAULT_KEY_MAX_AGE = 3600
+KEY_REFETCH_SECONDS = 60
+
+_MAX_AGE = re.compile(r'max-age=(\d+)')
+
+
+class GoogleTokenError(Exception):
+    """The token was rejected, or Google could not be reached to check it"""
+
+
+def _make_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=getattr(settings, 'GOOGLE_HTTP_POOL_SIZE', 10))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = _make_session()
+
+
+def _timeout():
+    return getattr(settings, 'GOOGLE_HTTP_TIMEOUT', (3, 5))
+
+
+def _cache_seconds(response):
+    match = _MAX_AGE.search(response.headers.get('Cache-Control', ''))
+    return int(match.group(1)) if match else DEFAULT_KEY_MAX_AGE
+
+
+class SigningKeys:
+    """Google's public keys by ``kid``, refreshed when their cache lifetime runs out"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = {}
+        self.expires = 0.0
+        self.fetched = None
+
+    def fetch(self):
+        url = getattr(settings, 'GOOGLE_CERTS_URL', DEFAULT_CERTS_URL)
+        try:
+            response = session.get(url, timeout=_timeout())
+            response.raise_for_status()
+            jwks = jwt.PyJWKSet.from_dict(response.json())
+        except (requests.RequestException, ValueError, jwt.PyJWKSetError) as e:
+            raise GoogleTokenError(f'Could not load Google signing keys: {e}') from e
+
+        now = time.monotonic()
+        self.keys = {key.key_id: key for key in jwks.keys}
+        self.expires = now + _cache_seconds(response)
+        self.fetched = now
+
+    def get(self, kid):
+        with self.lock:
+            now = time.monotonic()
+            stale = now >= self.expires
+            rotated = kid not in self.keys and (self.fetched is None or now - self.fetched >= KEY_REFETCH_SECONDS)
+            if stale or rotated:
+                self.fetch()
+            key = self.keys.get(kid)
+        if key is None:
+            raise GoogleTokenError('Token signed with an unknown key')
+        return key
+
+    def clear(self):
+        with self.lock:
+            self.keys = {}
+            self.expires = 0.0
+            self.fetched = None
+
+
+signing_keys = SigningKeys()
+
+
+def verify_id_token(token):
+    """Claims of a Google-signed ``id_token``, or ``GoogleTokenError``"""
+    try:
+        kid = jwt.get_unverified_header(token).get('kid')
+    except jwt.InvalidTokenError as e:
+        raise GoogleTokenError(str(e)) from e
+
+    audience = getattr(settings, 'GOOGLE_CLIENT_IDS', [])
+    if not audience:
+        raise GoogleTokenError('Google id_token sign-in is not configured (GOOGLE_CLIENT_IDS is not set)')
+    try:
+        claims = jwt.decode(
+            token, signing_keys.get(kid), algorithms=['RS256'],
+            audience=audience, issuer=GOOGLE_ISSUERS,
+            options={'require': ['exp', 'iss', 'sub', 'aud']},
+            leeway=getattr(settings, 'GOOGLE_TOKEN_LEEWAY', 30),
+        )
+    except jwt.InvalidTokenError as e:
+        raise GoogleTokenError(str(e)) from e
+
+    if claims.get('email_verified') in (False, 'false'):
+        raise GoogleTokenError('Google account email is not verified')
+    return claims
+
+
+def fetch_user_info(access_token):
+    """Profile claims for an OAuth ``access_token``, from Google's userinfo endpoint"""
+    url = getattr(settings, 'GOOGLE_USERINFO_URL', DEFAULT_USERINFO_URL)
+    try:
+        response = session.get(url, headers={'Authorization': f'Bearer {access_token}'}, timeout=_timeout())
+        user_info = response.json()
+    except (requests.RequestException, ValueError) as e:
+        raise GoogleTokenError(f'Could not reach Google: {e}') from e
+
+    if response.status_code != 200 or 'error' in user_info:
+        raise GoogleTokenError(user_info.get('error_description') or user_info.get('error') or 'Invalid access token')
+    return user_info
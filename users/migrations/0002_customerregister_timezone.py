@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:20
+
+from django.db import migrations, models
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerregister',
+            name='timezone',
+            field=models.CharField(default='UTC', help_text='IANA timezone, e.g. America/Los_Angeles', max_length=64, validators=[users.models.validate_timezone]),
+        ),
+    ]
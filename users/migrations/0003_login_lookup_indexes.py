@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:10
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_customerregister_timezone'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customerregister',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='user_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customerregister',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='user_username_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.30 on 2026-10-18 15:20
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def backfill_normalized_logins(apps, schema_editor):
+    CustomerRegister = apps.get_model('users', 'CustomerRegister')
+    users = CustomerRegister.objects.using(schema_editor.connection.alias)
+
+    # accounts that differ only in case or surrounding whitespace would fail the unique
+    # constraints added below; say which ones, since picking a winner is not ours to do
+    collisions = []
+    for field in ('email', 'username'):
+        taken = (
+            users.annotate(normalized=Lower(Trim(field)))
+            .values('normalized').annotate(count=Count('pk')).filter(count__gt=1)
+            .values_list('normalized', flat=True)
+        )
+        for value in taken:
+            ids = (
+                users.annotate(normalized=Lower(Trim(field)))
+                .filter(normalized=value).values_list('pk', flat=True)
+            )
+            collisions.append(f"{field} {value!r}: user ids {', '.join(map(str, sorted(ids)))}")
+    if collisions:
+        raise RuntimeError(
+            "These accounts share an email or username once case and whitespace are ignored. "
+            "Rename or merge them, then run migrate again:\n  " + "\n  ".join(collisions)
+        )
+
+    users.update(
+        email_normalized=Lower(Trim('email')),
+        username_normalized=Lower(Trim('username')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_login_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customerregister',
+            name='email_normalized',
+            field=models.CharField(editable=False, max_length=254, null=True),
+        ),
+        migrations.AddField(
+            model_name='customerregister',
+            name='username_normalized',
+            field=models.CharField(editable=False, max_length=150, null=True),
+        ),
+        migrations.RunPython(backfill_normalized_logins, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='customerregister',
+            name='email_normalized',
+            field=models.CharField(editable=False, max_length=254, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='customerregister',
+            name='username_normalized',
+            field=models.CharField(editable=False, max_length=150, unique=True),
+        ),
+        # the unique indexes above now serve the case-insensitive lookups
+        migrations.RemoveIndex(
+            model_name='customerregister',
+            name='user_email_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customerregister',
+            name='user_username_lower_idx',
+        ),
+    ]
@@ -1,5 +1,26 @@
+import zoneinfo
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser,BaseUserManager
+from django.core.exceptions import ValidationError
+from django.utils.timezone import localdate
+
+
+def validate_timezone(value):
+    try:
+        zoneinfo.ZoneInfo(value)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f'{value!r} is not a known IANA timezone')
+
+
+def local_day(zone_name, moment=None):
+    """Calendar day of ``moment`` (default now) as seen in the named timezone"""
+    return localdate(moment, zoneinfo.ZoneInfo(zone_name))
+
+
+def normalize_login(value):
+    """The form emails and usernames are compared in: case-insensitive, surrounding spaces ignored"""
+    return value.strip().lower()
 # Create your models here.
 class CustomerRegisterManager(BaseUserManager):
     def create_user(self, email, username, password=None, **extra_fields):
@@ -29,13 +50,49 @@ class CustomerRegister(AbstractUser):
     
     # google sign in 
     google_id = models.CharField(max_length= 100 ,blank = True , null = True ,unique = True)
+    # decides which calendar day an activity counts towards (streaks, goals, trends)
+    timezone = models.CharField(max_length = 64 , default = 'UTC' , validators = [validate_timezone] , help_text = "IANA timezone, e.g. America/Los_Angeles")
+    # lowercase copies kept in save(): unique regardless of case, and what logins and availability checks match
+    email_normalized = models.CharField(max_length = 254 , unique = True , editable = False)
+    username_normalized = models.CharField(max_length = 150 , unique = True , editable = False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name', 'height', 'weight']
     def __str__(self):
         return self.email
+    def local_day(self, moment=None):
+        return local_day(self.timezone, moment)
+    def save(self, *args, **kwargs):
+        self.email_normalized = normalize_login(self.email)
+        self.username_normalized = normalize_login(self.username)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            derived = {'email': 'email_normalized', 'username': 'username_normalized'}
+            kwargs['update_fields'] = {*update_fields, *(derived[name] for name in derived if name in update_fields)}
+        super().save(*args, **kwargs)
     class Meta:
         db_table = 'auth_customerregister'
     
     #  the Abstractuser already have the email , password, firstname,lastname , is_active , last_viewed and many other things so make sure to do that 
-    
\ No newline at end of file
+    
+
+
+def free_username(base):
+    """
+    ``base``, or ``base`` with the smallest numeric suffix nobody has taken, in one query.
+    Every candidate sorts between ``base`` and ``base + ':'`` (':' follows '9'), so a
+    range on the unique normalized column fetches exactly the taken neighbours.
+    """
+    max_length = CustomerRegister._meta.get_field('username').max_length
+    base = base[:max_length - 6]
+    prefix = normalize_login(base)
+    taken = set(
+        CustomerRegister.objects.filter(username_normalized__gte=prefix, username_normalized__lt=prefix + ':')
+        .values_list('username_normalized', flat=True)
+    )
+    if prefix not in taken:
+        return base
+    counter = 1
+    while f'{prefix}{counter}' in taken:
+        counter += 1
+    return f'{base}{counter}'
@@ -1,7 +1,30 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
-from .models import CustomerRegister
-class UserRegistrationSerializer(serializers.ModelSerializer):
+from .models import CustomerRegister, normalize_login
+
+# most candidates one batch availability check accepts per kind
+MAX_AVAILABILITY_BATCH = 100
+
+
+class CaseInsensitiveUniqueLogin:
+    """Reject an email/username that differs from an existing one only in case (the unique index would)"""
+
+    def validate_email(self, value):
+        return self._unique_normalized('email', value)
+
+    def validate_username(self, value):
+        return self._unique_normalized('username', value)
+
+    def _unique_normalized(self, field, value):
+        others = CustomerRegister.objects.filter(**{f'{field}_normalized': normalize_login(value)})
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(f'A user with that {field} already exists.')
+        return value
+
+
+class UserRegistrationSerializer(CaseInsensitiveUniqueLogin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password2 = serializers.CharField(write_only=True)
 
@@ -9,7 +32,7 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         model = CustomerRegister
         fields = ('id', 'email', 'username', 'password', 'password2', 
                  'first_name', 'last_name', 'height', 'weight', 
-                 'fitness_goal', 'phone_number')
+                 'fitness_goal', 'phone_number', 'timezone')
     
     def validate(self, attrs):
         if attrs.get('password') != attrs.get('password2'):
@@ -35,26 +58,20 @@ class UserLoginSerializer(serializers.Serializer):
         if not password:
             raise serializers.ValidationError("Password is required.")
 
+        # the backend resolves email or username in one lookup and checks the hash once
         user = authenticate(username = login, password = password)
 
-        if not user:
-            try:
-                user_obj = CustomerRegister.objects.get(username = login)
-                user = authenticate(username = user_obj.email , password = password)
-            except:
-                user = None
-        
         if not user:
             raise serializers.ValidationError("Invalid email/password !!")
         
         attrs['user'] =user
         return attrs
-class UserProfile(serializers.ModelSerializer):
+class UserProfile(CaseInsensitiveUniqueLogin, serializers.ModelSerializer):
     class Meta:
         model = CustomerRegister
         fields = ('id', 'email', 'username', 'first_name', 'last_name', 
                  'height', 'weight', 'fitness_goal', 'phone_number', 
-                 'picture_url')
+                 'picture_url', 'timezone')
         read_only_fields = ('email',)
 
 class GoogleAuthSerializer(serializers.Serializer):
@@ -71,5 +88,14 @@ class AvailabilityCheckSerializer(serializers.Serializer):
             raise serializers.ValidationError("Either email or username must be provided")
         return attrs
 
+class BatchAvailabilityCheckSerializer(serializers.Serializer):
+    emails = serializers.ListField(child=serializers.EmailField(), required=False, max_length=MAX_AVAILABILITY_BATCH)
+    usernames = serializers.ListField(child=serializers.CharField(), required=False, max_length=MAX_AVAILABILITY_BATCH)
+
+    def validate(self, attrs):
+        if not attrs.get('emails') and not attrs.get('usernames'):
+            raise serializers.ValidationError("Either emails or usernames must be provided")
+        return attrs
+
 # Provide the serializer under the name tests expect
 UserProfileSerializer = UserProfile
@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ..authentication import user_cache
+from ..models import CustomerRegister
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.user = CustomerRegister.objects.create_user(
+            email='cached@example.com',
+            username='cached',
+            password='cachedpass123',
+            height=170.0,
+            weight=65.0
+        )
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.url = reverse('get-profile')
+
+    def test_second_request_skips_the_user_lookup(self):
+        """Test the user row is only read on the first request"""
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['email'], 'cached@example.com')
+
+    def test_each_request_gets_its_own_instance(self):
+        """Test cached users are rebuilt so one request cannot change another's user"""
+        self.client.get(self.url)
+        first = user_cache.get(self.user.pk)
+        first.username = 'mutated'
+        self.assertEqual(user_cache.get(self.user.pk).username, 'cached')
+
+    def test_save_invalidates(self):
+        """Test profile edits are visible on the next request"""
+        self.client.get(self.url)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).data['user']['first_name'], 'Renamed')
+
+    def test_deactivation_locks_out_immediately(self):
+        """Test a deactivated user is rejected even though they were cached"""
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_inactive_user_is_rejected(self):
+        """Test the active check also runs on cache hits"""
+        self.user.is_active = False
+        user_cache.put(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(JWT_USER_CACHE_TTL=0)
+    def test_ttl_zero_disables_the_cache(self):
+        """Test the cache can be switched off"""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_expired_entries_are_evicted(self):
+        """Test the cache does not grow with every user ever seen"""
+        with mock.patch('users.authentication.time.monotonic', return_value=1000):
+            user_cache.put(self.user)
+        other = CustomerRegister(pk=self.user.pk + 1, email='other@example.com', username='other')
+        with mock.patch('users.authentication.time.monotonic', return_value=2000):
+            user_cache.put(other)
+            self.assertEqual(list(user_cache.rows), [str(other.pk)])
+        with mock.patch('users.authentication.time.monotonic', return_value=3000):
+            self.assertIsNone(user_cache.get(other.pk))
+        self.assertEqual(user_cache.rows, {})
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.contrib.auth import authenticate
+from django.test import TestCase
+
+from ..backends import EmailOrUsernameBackend, login_candidates
+from ..models import CustomerRegister
+
+
+class EmailOrUsernameBackendTest(TestCase):
+    def setUp(self):
+        self.user = CustomerRegister.objects.create_user(
+            email='Runner@Example.com',
+            username='Runner',
+            password='runnerpass123',
+            height=170.0,
+            weight=65.0
+        )
+
+    def test_email_or_username_any_case(self):
+        """Test every spelling of the login resolves to the user"""
+        for login in ['Runner@Example.com', 'runner@example.com', 'Runner', 'RUNNER']:
+            self.assertEqual(authenticate(username=login, password='runnerpass123'), self.user, login)
+
+    def test_one_query_and_one_hash(self):
+        """Test a wrong password costs one lookup and one hash check"""
+        with mock.patch.object(CustomerRegister, 'check_password', autospec=True, return_value=False) as check:
+            with self.assertNumQueries(1):
+                self.assertIsNone(authenticate(username='runner', password='wrong'))
+        self.assertEqual(check.call_count, 1)
+
+    def test_unknown_login_still_hashes(self):
+        """Test unknown users pay for a dummy hash so timing stays flat"""
+        with mock.patch.object(CustomerRegister, 'set_password', autospec=True) as dummy:
+            with self.assertNumQueries(1):
+                self.assertIsNone(authenticate(username='nobody', password='whatever'))
+        self.assertEqual(dummy.call_count, 1)
+
+    def test_email_match_wins(self):
+        """Test a username that looks like someone else's email cannot shadow them"""
+        CustomerRegister.objects.create_user(
+            email='other@example.com', username='runner@example.com',
+            password='otherpass123', height=170.0, weight=65.0
+        )
+        self.assertEqual(authenticate(username='runner@example.com', password='runnerpass123'), self.user)
+
+    def test_inactive_users_are_rejected(self):
+        """Test deactivated accounts cannot log in"""
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(EmailOrUsernameBackend().authenticate(None, username='runner', password='runnerpass123'))
+
+    def test_lookup_uses_the_normalized_indexes(self):
+        """Test the login lookup is an index search, not a table scan"""
+        plan = login_candidates('runner').explain()
+        self.assertNotIn(' SCAN ', f' {plan} ')
+        self.assertEqual(plan.count('USING INDEX'), 2)
@@ -0,0 +1,175 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from .. import google
+from ..models import CustomerRegister
+
+CLIENT_ID = 'fitness-tracker.apps.example.com'
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update(kid=kid, alg='RS256', use='sig')
+    return private_key, public_jwk
+
+
+class StandInGoogle(BaseHTTPRequestHandler):
+    """Serves a JWKS document and a userinfo endpoint the way Google does"""
+    keys = []
+    max_age = 3600
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append(self.path)
+        if self.path == '/certs':
+            self.reply(200, {'keys': type(self).keys}, {'Cache-Control': f'public, max-age={self.max_age}'})
+        elif self.path == '/userinfo' and self.headers.get('Authorization') == 'Bearer good-access-token':
+            self.reply(200, {
+                'sub': 'google-sub-2', 'email': 'access@example.com',
+                'email_verified': True, 'given_name': 'Access',
+            })
+        else:
+            self.reply(401, {'error': 'invalid_token'})
+
+    def reply(self, code, body, headers=None):
+        payload = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleLoginTest(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInGoogle)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{cls.server.server_port}'
+        cls.settings = override_settings(
+            GOOGLE_CERTS_URL=f'{base}/certs', GOOGLE_USERINFO_URL=f'{base}/userinfo',
+            GOOGLE_CLIENT_IDS=[CLIENT_ID],
+        )
+        cls.settings.enable()
+        cls.private_key, public_jwk = make_key('key-1')
+        cls.public_jwk = public_jwk
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        google.signing_keys.clear()
+        StandInGoogle.keys = [self.public_jwk]
+        StandInGoogle.max_age = 3600
+        StandInGoogle.requests = []
+        self.url = reverse('google-login')
+
+    def id_token(self, key=None, kid='key-1', **claims):
+        now = int(time.time())
+        payload = {
+            'iss': 'https://accounts.google.com', 'aud': CLIENT_ID, 'sub': 'google-sub-1',
+            'email': 'google@example.com', 'email_verified': True,
+            'given_name': 'Goo', 'family_name': 'Gle', 'iat': now, 'exp': now + 3600,
+        }
+        payload.update(claims)
+        return jwt.encode(payload, key or self.private_key, algorithm='RS256', headers={'kid': kid})
+
+    def login(self, **data):
+        return self.client.post(self.url, data, format='json')
+
+    def test_id_token_is_verified_against_cached_keys(self):
+        """Test keys are fetched once and later logins need no call to Google"""
+        first = self.login(id_token=self.id_token())
+        second = self.login(id_token=self.id_token())
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(StandInGoogle.requests, ['/certs'])
+        user = CustomerRegister.objects.get(google_id='google-sub-1')
+        self.assertEqual((user.email, user.username, user.first_name), ('google@example.com', 'google', 'Goo'))
+
+    def test_keys_are_refetched_when_max_age_runs_out(self):
+        """Test the Cache-Control lifetime of the key set is honoured"""
+        StandInGoogle.max_age = 0
+        self.login(id_token=self.id_token())
+        self.login(id_token=self.id_token())
+        self.assertEqual(StandInGoogle.requests, ['/certs', '/certs'])
+
+    def test_unknown_kid_picks_up_rotated_keys(self):
+        """Test a token signed with a new key triggers one early refetch"""
+        self.login(id_token=self.id_token())
+        google.signing_keys.fetched -= google.KEY_REFETCH_SECONDS  # a while later, Google rotates
+        new_key, new_jwk = make_key('key-2')
+        StandInGoogle.keys = [self.public_jwk, new_jwk]
+        response = self.login(id_token=self.id_token(key=new_key, kid='key-2'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(StandInGoogle.requests, ['/certs', '/certs'])
+
+    def test_unknown_kid_refetch_is_rate_limited(self):
+        """Test a stream of tokens with made-up kids cannot make us hammer Google"""
+        self.login(id_token=self.id_token())
+        for _ in range(3):
+            response = self.login(id_token=self.id_token(kid='forged'))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(StandInGoogle.requests, ['/certs'])
+
+    def test_invalid_id_tokens_are_rejected(self):
+        """Test signature, audience, issuer, expiry and email verification are all checked"""
+        forger, _ = make_key('key-1')
+        bad_tokens = [
+            self.id_token(key=forger),
+            self.id_token(aud='someone-else'),
+            self.id_token(iss='https://evil.example.com'),
+            self.id_token(exp=int(time.time()) - 3600),
+            self.id_token(email_verified=False),
+            'not-a-jwt',
+        ]
+        for token in bad_tokens:
+            response = self.login(id_token=token)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['message'], 'Invalid Google token')
+        self.assertFalse(CustomerRegister.objects.exists())
+
+    def test_id_tokens_are_refused_without_client_ids(self):
+        """Test an unset GOOGLE_CLIENT_IDS does not let every Google client's token in"""
+        with override_settings(GOOGLE_CLIENT_IDS=[]):
+            response = self.login(id_token=self.id_token(aud='someone-else'))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('GOOGLE_CLIENT_IDS', response.data['error'])
+        self.assertFalse(CustomerRegister.objects.exists())
+
+    def test_access_token_uses_userinfo_endpoint(self):
+        """Test access tokens are sent as a bearer header to userinfo"""
+        response = self.login(access_token='good-access-token')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['user']['email'], 'access@example.com')
+
+        response = self.login(access_token='bad-access-token')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['message'], 'Invalid Google token')
+
+    def test_unreachable_google_is_a_clean_error(self):
+        """Test a failed key fetch is reported rather than raised"""
+        with override_settings(GOOGLE_CERTS_URL='http://127.0.0.1:9/certs', GOOGLE_HTTP_TIMEOUT=(0.5, 0.5)):
+            response = self.login(id_token=self.id_token())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('signing keys', response.data['error'])
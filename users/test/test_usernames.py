@@ -0,0 +1,91 @@
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from ..models import CustomerRegister, free_username
+from ..serializers import MAX_AVAILABILITY_BATCH
+
+
+def make_user(email, username):
+    return CustomerRegister.objects.create_user(
+        email=email, username=username, password='testpass123', height=170.0, weight=65.0
+    )
+
+
+class NormalizedLoginTest(TestCase):
+    def test_normalized_columns_follow_saves(self):
+        """Test the lowercase copies are written on create and on partial saves"""
+        user = make_user('Mixed@Example.com', 'MixedCase')
+        self.assertEqual((user.email_normalized, user.username_normalized), ('mixed@example.com', 'mixedcase'))
+
+        user.username = 'Renamed'
+        user.save(update_fields=['username'])
+        user.refresh_from_db()
+        self.assertEqual(user.username_normalized, 'renamed')
+
+    def test_case_variants_are_not_unique(self):
+        """Test the database rejects an email or username differing only in case"""
+        make_user('taken@example.com', 'taken')
+        for email, username in [('TAKEN@example.com', 'other'), ('other@example.com', 'Taken')]:
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                make_user(email, username)
+
+    def test_free_username_is_one_query(self):
+        """Test suffix allocation reads the taken names once, however many collide"""
+        make_user('a@example.com', 'runner')
+        for i in range(1, 6):
+            make_user(f'a{i}@example.com', f'Runner{i}')
+        make_user('b@example.com', 'runnerbean')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(free_username('runner'), 'runner6')
+        with self.assertNumQueries(1):
+            self.assertEqual(free_username('walker'), 'walker')
+
+    def test_free_username_fills_gaps(self):
+        """Test the smallest free suffix is used"""
+        make_user('a@example.com', 'runner')
+        make_user('b@example.com', 'runner2')
+        self.assertEqual(free_username('runner'), 'runner1')
+
+
+class AvailabilityAPITest(APITestCase):
+    def setUp(self):
+        make_user('existing@example.com', 'ExistingUser')
+        self.url = reverse('check-availability')
+        self.batch_url = reverse('check-availability-batch')
+
+    def test_single_check_ignores_case(self):
+        """Test a case variant of a taken name is reported as taken"""
+        response = self.client.post(self.url, {'email': 'Existing@Example.com', 'username': 'existinguser'}, format='json')
+        self.assertFalse(response.data['email_available'])
+        self.assertFalse(response.data['username_available'])
+
+    def test_batch_check_is_one_query(self):
+        """Test many candidates are answered by a single lookup"""
+        data = {
+            'emails': ['existing@example.com', 'new@example.com'],
+            'usernames': ['EXISTINGUSER', 'fresh', 'fresh2'],
+        }
+        with self.assertNumQueries(1):
+            response = self.client.post(self.batch_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['emails'], {'existing@example.com': False, 'new@example.com': True})
+        self.assertEqual(response.data['usernames'], {'EXISTINGUSER': False, 'fresh': True, 'fresh2': True})
+
+    def test_batch_check_validation(self):
+        """Test empty and oversized batches are rejected"""
+        self.assertEqual(self.client.post(self.batch_url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        too_many = {'usernames': [f'user{i}' for i in range(MAX_AVAILABILITY_BATCH + 1)]}
+        self.assertEqual(self.client.post(self.batch_url, too_many, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_registration_rejects_case_variants(self):
+        """Test registering a case variant of a taken username is a validation error, not a crash"""
+        response = self.client.post(reverse('register'), {
+            'email': 'new@example.com', 'username': 'existinguser', 'password': 'testpass123',
+            'password2': 'testpass123', 'height': 170.0, 'weight': 65.0,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data['errors'])
@@ -127,6 +127,21 @@ class AuthenticationAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['user']['email'], 'existing@example.com')
 
+    def test_get_user_profile_conditional(self):
+        """Test a matching If-None-Match gets 304 until the profile changes"""
+        self.client.force_authenticate(self.user)
+        etag = self.client.get(self.profile_url)['ETag']
+
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        self.user.weight = 72.0
+        self.user.save()
+        response = self.client.get(self.profile_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_get_user_profile_unauthenticated(self):
         """Test getting user profile without authentication"""
         response = self.client.get(self.profile_url)
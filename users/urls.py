@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # Availability check
     path('check-availability/', views.check_availability, name='check-availability'),
+    path('check-availability/batch/', views.check_availability_batch, name='check-availability-batch'),
     
     # Authentication endpoints
     path('register/', views.register_user, name='register'),
@@ -5,11 +5,14 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.db.models import Q
-import requests
-from .models import CustomerRegister
+from django.views.decorators.http import condition
+import hashlib
+from . import google
+from .models import CustomerRegister, free_username, normalize_login
 from .serializers import (
     UserRegistrationSerializer, UserLoginSerializer, UserProfile,
-    GoogleAuthSerializer, AvailabilityCheckSerializer, UserProfile as UserProfileSerializer
+    GoogleAuthSerializer, AvailabilityCheckSerializer, BatchAvailabilityCheckSerializer,
+    UserProfile as UserProfileSerializer
 )
 
 @api_view(['POST'])
@@ -23,11 +26,11 @@ def check_availability(request):
 
         response_data = {}
         if email:
-            email_exist = CustomerRegister.objects.filter(email__iexact=email).exists()
+            email_exist = CustomerRegister.objects.filter(email_normalized=normalize_login(email)).exists()
             response_data['email_available'] = not email_exist
             response_data['email'] = email
         if username:
-            username_exists = CustomerRegister.objects.filter(username__iexact=username).exists()
+            username_exists = CustomerRegister.objects.filter(username_normalized=normalize_login(username)).exists()
             response_data['username_available'] = not username_exists
             response_data['username'] = username
         return Response(response_data)
@@ -38,6 +41,41 @@ def check_availability(request):
     }, status=status.HTTP_400_BAD_REQUEST)
 @api_view(['POST'])
 @permission_classes([AllowAny])
+def check_availability_batch(request):
+    """
+    Check many candidates in one request and one query
+    Expected JSON: {"emails": [...], "usernames": [...]} (either list may be omitted)
+    """
+    serializer = BatchAvailabilityCheckSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'message': 'validation failed',
+            'error': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    emails = serializer.validated_data.get('emails', [])
+    usernames = serializer.validated_data.get('usernames', [])
+    wanted_emails = {normalize_login(email) for email in emails}
+    wanted_usernames = {normalize_login(username) for username in usernames}
+
+    taken_emails, taken_usernames = set(), set()
+    rows = CustomerRegister.objects.filter(
+        Q(email_normalized__in=wanted_emails) | Q(username_normalized__in=wanted_usernames)
+    ).values_list('email_normalized', 'username_normalized')
+    for email, username in rows:
+        taken_emails.add(email)
+        taken_usernames.add(username)
+
+    response_data = {}
+    if emails:
+        response_data['emails'] = {email: normalize_login(email) not in taken_emails for email in emails}
+    if usernames:
+        response_data['usernames'] = {
+            username: normalize_login(username) not in taken_usernames for username in usernames
+        }
+    return Response(response_data)
+@api_view(['POST'])
+@permission_classes([AllowAny])
 def register_user(request):
     serializer = UserRegistrationSerializer(data=request.data)
     if serializer.is_valid():
@@ -77,8 +115,14 @@ def login_user(request):
         'message': 'Login failed',
         'errors': serializer.errors
     }, status=status.HTTP_400_BAD_REQUEST)
+def user_profile_etag(request):
+    # the payload is just the authenticated user's own columns, already loaded, so hash those
+    user = request.user
+    values = '|'.join(str(getattr(user, field)) for field in UserProfileSerializer.Meta.fields)
+    return hashlib.sha1(values.encode()).hexdigest()
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@condition(etag_func=user_profile_etag)
 def get_user_profile(request):
     user = request.user
     serializer = UserProfileSerializer(user)
@@ -130,30 +174,23 @@ def google_login(request):
     id_token = serializer.validated_data.get('id_token')  # Get ID token
     
     try:
-        # Verify Google token and get user info
-        if access_token:
-            # Use access token to get user info from Google
-            user_info = requests.get(
-                'https://www.googleapis.com/oauth2/v1/userinfo',
-                params={'access_token': access_token}
-            ).json()  # Convert response to JSON
-        elif id_token:
-            # Verify ID token with Google
-            user_info = requests.get(
-                'https://www.googleapis.com/oauth2/v3/tokeninfo',
-                params={'id_token': id_token}
-            ).json()
+        # id_tokens are verified locally against Google's cached signing keys;
+        # access tokens still need the userinfo endpoint
+        if id_token:
+            user_info = google.verify_id_token(id_token)
+        elif access_token:
+            user_info = google.fetch_user_info(access_token)
         else:
             return Response({
                 'message': 'Either access_token or id_token is required'
             }, status=status.HTTP_400_BAD_REQUEST)
-        
-        if 'error' in user_info:  # If Google returned an error
-            return Response({
-                'message': 'Invalid Google token',
-                'error': user_info['error']
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
+    except google.GoogleTokenError as e:  # If Google rejected the token
+        return Response({
+            'message': 'Invalid Google token',
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
         # Extract user information from Google response
         google_id = user_info['sub']  # Unique Google user ID
         email = user_info['email']  # User's email
@@ -167,19 +204,14 @@ def google_login(request):
         except CustomerRegister.DoesNotExist:
             # If no Google ID match, check if user exists with this email
             try:
-                user = CustomerRegister.objects.get(email=email)  # Find by email
+                user = CustomerRegister.objects.get(email_normalized=normalize_login(email))  # Find by email
                 user.google_id = google_id  # Link Google account to existing user
                 user.picture_url = picture_url  # Update profile picture
                 user.save()
             except CustomerRegister.DoesNotExist:
                 # Create new user since no existing account found
-                username = email.split('@')[0]  # Use email prefix as base username
-                # Ensure username is unique
-                base_username = username
-                counter = 1
-                while CustomerRegister.objects.filter(username=username).exists():
-                    username = f"{base_username}{counter}"  # Append number if exists
-                    counter += 1
+                # Email prefix as username, with the first free numeric suffix if it is taken
+                username = free_username(email.split('@')[0])
                 
                 # Create new user with Google data
                 user = CustomerRegister.objects.create(